@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+from __future__ import division
+from __future__ import print_function
+
+
+import timeit
+from collections import OrderedDict
+
+
+import blosc
+
+
+from bloscpack.checksums import CHECKSUMS_AVAIL
+from bloscpack.headers import (BloscpackHeader,
+                               MetadataHeader,
+                               decode_blosc_header,
+                               decode_blosc_sizes,
+                               decode_options,
+                               decode_bitfield,
+                               decode_uint8,
+                               decode_uint32,
+                               decode_int32,
+                               decode_int64,
+                               decode_magic_string,
+                               )
+from bloscpack.metacodecs import CODECS_AVAIL
+
+
+# field by field reference decoders, validating everything in the
+# constructor, as the header objects did before the struct based codec
+
+
+def reference_decode_bloscpack_header(buffer_):
+    options = decode_options(decode_bitfield(buffer_[5]))
+    return BloscpackHeader(
+        format_version=decode_uint8(buffer_[4]),
+        offsets=options['offsets'],
+        metadata=options['metadata'],
+        checksum=CHECKSUMS_AVAIL[decode_uint8(buffer_[6])],
+        typesize=decode_uint8(buffer_[7]),
+        chunk_size=decode_int32(buffer_[8:12]),
+        last_chunk=decode_int32(buffer_[12:16]),
+        nchunks=decode_int64(buffer_[16:24]),
+        max_app_chunks=decode_int64(buffer_[24:32]))
+
+
+def reference_decode_metadata_header(buffer_):
+    return MetadataHeader(
+        magic_format=decode_magic_string(buffer_[:8]),
+        meta_options=decode_bitfield(buffer_[8]),
+        meta_checksum=CHECKSUMS_AVAIL[decode_uint8(buffer_[9])],
+        meta_codec=CODECS_AVAIL[decode_uint8(buffer_[10])],
+        meta_level=decode_uint8(buffer_[11]),
+        meta_size=decode_uint32(buffer_[12:16]),
+        max_meta_size=decode_uint32(buffer_[16:20]),
+        meta_comp_size=decode_uint32(buffer_[20:24]),
+        user_codec=decode_magic_string(buffer_[24:32]))
+
+
+def reference_decode_blosc_header(buffer_):
+    buffer_ = memoryview(buffer_)
+    return OrderedDict((('version', decode_uint8(buffer_[0])),
+                        ('versionlz', decode_uint8(buffer_[1])),
+                        ('flags', decode_uint8(buffer_[2])),
+                        ('typesize', decode_uint8(buffer_[3])),
+                        ('nbytes', decode_uint32(buffer_[4:8])),
+                        ('blocksize', decode_uint32(buffer_[8:12])),
+                        ('ctbytes', decode_uint32(buffer_[12:16]))))
+
+
+def best_of(func, arg, number=100000, repeat=5):
+    """ Best time per call in microseconds. """
+    return min(timeit.repeat(lambda: func(arg),
+                             number=number, repeat=repeat)) / number * 1e6
+
+
+raw_bloscpack_header = BloscpackHeader(offsets=True,
+                                       metadata=True,
+                                       checksum='adler32',
+                                       typesize=8,
+                                       chunk_size=2**20,
+                                       last_chunk=2**10,
+                                       nchunks=100,
+                                       max_app_chunks=1000).encode()
+raw_metadata_header = MetadataHeader(magic_format=b'JSON',
+                                     meta_checksum='adler32',
+                                     meta_codec='zlib',
+                                     meta_level=6,
+                                     meta_size=60,
+                                     max_meta_size=600,
+                                     meta_comp_size=50).encode()
+raw_blosc_header = blosc.compress(b'0123456789' * 1000, typesize=1)[:16]
+
+assert reference_decode_bloscpack_header(raw_bloscpack_header) == \
+    BloscpackHeader.decode(raw_bloscpack_header)
+assert reference_decode_metadata_header(raw_metadata_header) == \
+    MetadataHeader.decode(raw_metadata_header)
+assert reference_decode_blosc_header(raw_blosc_header) == \
+    decode_blosc_header(raw_blosc_header)
+
+print("%s\t%s\t%s\t%s" %
+      ("header".ljust(11), "reference", "struct", "speedup"))
+for name, reference, current, raw in (
+        ('bloscpack', reference_decode_bloscpack_header,
+         BloscpackHeader.decode, raw_bloscpack_header),
+        ('metadata', reference_decode_metadata_header,
+         MetadataHeader.decode, raw_metadata_header),
+        ('blosc', reference_decode_blosc_header,
+         decode_blosc_header, raw_blosc_header),
+        # only the sizes, as needed when reading chunk after chunk
+        ('blosc sizes', reference_decode_blosc_header,
+         decode_blosc_sizes, raw_blosc_header),
+        ):
+    reference_time = best_of(reference, raw)
+    current_time = best_of(current, raw)
+    print("%s\t%.2fus\t\t%.2fus\t%.1fx" %
+          (name.ljust(11), reference_time, current_time,
+           reference_time / current_time))
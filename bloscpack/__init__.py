@@ -16,6 +16,9 @@ from .file_io import (pack_file_to_file,
                       unpack_bytes_from_file,
                       pack_bytes_to_bytes,
                       unpack_bytes_from_bytes,
+                      pack_stream_to_file,
+                      unpack_stream_from_file,
+                      peek_file,
                       )
 # deprecated
 from .file_io import (pack_file,
@@ -27,7 +30,32 @@ from .numpy_io import (pack_ndarray_to_file,
                        unpack_ndarray_from_file,
                        pack_ndarray_to_bytes,
                        unpack_ndarray_from_bytes,
+                       open_ndarray_from_file,
+                       peek_ndarray_from_file,
+                       LazyNdarray,
                        )
+from .reader import (BloscpackReader,
+                     )
+from .cache import (ChunkCache,
+                    HeaderCache,
+                    enable_header_cache,
+                    disable_header_cache,
+                    invalidate_header_cache,
+                    )
+from .index import (write_index,
+                    read_index,
+                    add_offsets,
+                    )
+from .tune import (autotune,
+                   )
+from .stats import (Stats,
+                    )
+from .verify import (verify_file,
+                     )
+from .trace import (Tracer,
+                    enable_tracing,
+                    disable_tracing,
+                    )
 # deprecated
 from .numpy_io import (pack_ndarray_file,
                        unpack_ndarray_file,
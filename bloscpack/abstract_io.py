@@ -4,9 +4,12 @@
 
 
 import abc
+import collections
+import hashlib
 
 
 import blosc
+import numpy
 
 
 from .args import (BloscArgs,
@@ -15,11 +18,23 @@ from .args import (BloscArgs,
                    _handle_max_apps
                    )
 from .headers import (BloscpackHeader,
+                      decode_blosc_sizes,
                       )
 from .exceptions import (ChecksumMismatch,
                          )
+from .parallel import (check_workers,
+                       ordered_map,
+                       released_gil,
+                       )
 from .pretty import (double_pretty_size,
                      )
+from .stats import (clock,
+                    stats_or_stand_in,
+                    timed,
+                    )
+from .tune import (AdaptiveCompressor,
+                   _compress_func,
+                   )
 from . import log
 
 
@@ -40,6 +55,19 @@ class PlainSource(object):
     def compress_func(self):
         return _compress_chunk_str
 
+    def chunk_buffer(self, chunk):
+        """ The contents of a chunk, as an object supporting the buffer
+        protocol.
+        """
+        return chunk
+
+    def release(self, chunk):
+        """ Called by 'pack' once a chunk has been compressed and written.
+
+        Sources that recycle their buffers can take them back here.
+        """
+        pass
+
     @abc.abstractmethod
     def __iter__(self):
         pass
@@ -58,10 +86,40 @@ class PlainSink(object):
 
     _metaclass__ = abc.ABCMeta
 
+    def configure(self, chunk_size, last_chunk, nchunks):
+        self.chunk_size = chunk_size
+        self.last_chunk = last_chunk
+        self.nchunks = nchunks
+
     @abc.abstractmethod
     def put(self, chunk):
         pass
 
+    def decompress(self, i, compressed):
+        """ Decompress chunk 'i', may be called from a worker thread.
+
+        The default does nothing and leaves the work to 'put' via 'write', so
+        that sinks which only implement 'put' remain correct.
+        """
+        return compressed
+
+    def write(self, i, decompressed):
+        """ Handle the result of 'decompress' for chunk 'i', in order. """
+        return self.put(decompressed)
+
+    def put_zeros(self, i, nbytes):
+        """ Handle chunk 'i' of 'nbytes' zeros, which was not stored, in order.
+
+        The default compresses the zeros and hands them on like any other
+        chunk, sinks that can skip over them cheaply override this.
+        """
+        return self.write(i, self.decompress(
+            i, blosc.compress(b'\x00' * nbytes, typesize=1)))
+
+    def finalize(self):
+        """ Called by 'unpack' once all chunks have been handled. """
+        pass
+
 
 class CompressedSink(object):
 
@@ -72,6 +130,7 @@ class CompressedSink(object):
         self.bloscpack_header = bloscpack_header
         self.checksum_impl = bloscpack_header.checksum_impl
         self.offsets = bloscpack_header.offsets
+        self.trailer = bloscpack_header.trailer
 
     @abc.abstractmethod
     def write_bloscpack_header(self):
@@ -90,9 +149,22 @@ class CompressedSink(object):
         pass
 
     @abc.abstractmethod
-    def put(self, i, compressed):
+    def put(self, i, compressed, digest=None):
         pass
 
+    def put_duplicate(self, i, original):
+        """ Store chunk 'i' as a duplicate of the earlier chunk 'original'.
+        """
+        raise NotImplementedError(
+            "'%s' does not support deduplication" % type(self).__name__)
+
+    def put_zeros(self, i):
+        """ Store chunk 'i', which consists entirely of zeros, without any
+        data.
+        """
+        raise NotImplementedError(
+            "'%s' does not support sparse output" % type(self).__name__)
+
     def do_checksum(self, compressed):
         if self.checksum_impl.size > 0:
             # compute the checksum on the compressed data
@@ -110,13 +182,81 @@ def pack(source, sink,
          metadata=None,
          blosc_args=None,
          bloscpack_args=None,
-         metadata_args=None):
-    """ Core packing function.  """
+         metadata_args=None,
+         workers=1,
+         max_inflight=None,
+         stats=None):
+    """ Core packing function.
+
+    Parameters
+    ----------
+    source : PlainSource
+        the source to read chunks from
+    sink : CompressedSink
+        the sink to write compressed chunks to
+    nchunks : int
+        the number of chunks, '-1' if unknown
+    chunk_size : int
+        the size of a regular chunk
+    last_chunk : int
+        the size of the last chunk, '-1' if unknown
+    metadata : dict
+        the metadata dict
+    blosc_args : BloscArgs
+        blosc args
+    bloscpack_args : BloscpackArgs
+        bloscpack args
+    metadata_args : MetadataArgs
+        metadata args
+    workers : int
+        the number of threads used to compress and checksum chunks
+    max_inflight : int
+        the maximum number of chunks being compressed at any one time, by
+        default twice the number of workers
+    stats : Stats
+        if given, filled in with the timings and sizes
+
+    Notes
+    -----
+    With 'workers' larger than one, chunks are compressed and checksummed on a
+    thread pool but still handed to the sink in order. Each worker may use
+    Blosc's own internal threads too, so you may wish to reduce those with
+    ``blosc.set_nthreads``.
+
+    If 'nchunks' is '-1', the source must find out the number of chunks and
+    the size of the last one while being read, see 'PlainStreamSource'. They
+    are then set in the header before the sink is finalized, such that the
+    sink can patch them in, if it is able to. Since the space for the offsets
+    can not be reserved up front, the 'trailer' option is switched on in this
+    case, unless the offsets, deduplication and sparse chunks are all off.
+
+    With the 'dedup' option of the 'bloscpack_args' each chunk is hashed
+    before compression. A chunk with the same contents as an earlier one is
+    neither compressed nor written, the sink points its offset at the earlier
+    chunk instead, see 'put_duplicate'. Deduplication implies offsets.
+
+    With the 'sparse' option of the 'bloscpack_args' chunks that consist
+    entirely of zeros are neither compressed nor written, the sink marks their
+    offset instead, see 'put_zeros'. Like deduplication this implies offsets.
+
+    With the 'trailer' option of the 'bloscpack_args' the header is written
+    with 'nchunks' and 'last_chunk' set to '-1' and without any space for
+    offsets. Instead, the sink writes the offsets and the counts after the
+    last chunk, such that the file is produced in a single forward pass and
+    may have offsets even if 'nchunks' is '-1'.
+
+    With the codec 'adaptive' in the 'blosc_args' the codec and level are
+    picked for each chunk, see 'AdaptiveCompressor'.
+
+    """
 
     if not isinstance(source, PlainSource):
         raise TypeError
     if not isinstance(sink, CompressedSink):
         raise TypeError
+    max_inflight = check_workers(workers, max_inflight)
+    stats = stats_or_stand_in(stats)
+    stats.start('pack')
 
     blosc_args = blosc_args or BloscArgs()
     log.debug(blosc_args.pformat())
@@ -127,20 +267,41 @@ def pack(source, sink,
         log.debug(metadata_args.pformat())
     elif metadata_args is not None:
         log.debug('metadata_args will be silently ignored')
-
-    max_app_chunks = _handle_max_apps(bloscpack_args.offsets,
-            nchunks,
-            bloscpack_args.max_app_chunks)
+    offsets = bloscpack_args.offsets
+    trailer = bloscpack_args.trailer
+    dedup = bloscpack_args.dedup
+    sparse = bloscpack_args.sparse
+    if nchunks == -1 and (offsets or dedup or sparse) and not trailer:
+        # the space for the offsets can't be reserved up front
+        log.verbose('input of unknown length, writing the offsets to a '
+                    'trailer')
+        trailer = True
+    if trailer:
+        # the counts and the offsets go into the trailer
+        offsets = True
+        header_nchunks, header_last_chunk = -1, -1
+    else:
+        header_nchunks, header_last_chunk = nchunks, last_chunk
+    # duplicates and zeros are located via the offsets
+    offsets = offsets or dedup or sparse
+
+    max_app_chunks = _handle_max_apps(offsets,
+            header_nchunks,
+            # files with shared or omitted chunks can not be appended to
+            0 if dedup or sparse else bloscpack_args.max_app_chunks)
     # create the bloscpack header
     bloscpack_header = BloscpackHeader(
-            offsets=bloscpack_args.offsets,
+            offsets=offsets,
             metadata=metadata is not None,
             checksum=bloscpack_args.checksum,
             typesize=blosc_args.typesize,
             chunk_size=chunk_size,
-            last_chunk=last_chunk,
-            nchunks=nchunks,
-            max_app_chunks=max_app_chunks
+            last_chunk=header_last_chunk,
+            nchunks=header_nchunks,
+            max_app_chunks=max_app_chunks,
+            trailer=trailer,
+            dedup=dedup,
+            sparse=sparse,
             )
     log.debug(bloscpack_header.pformat())
 
@@ -151,46 +312,307 @@ def pack(source, sink,
         sink.write_metadata(metadata, metadata_args)
     sink.init_offsets()
 
-    compress_func = source.compress_func
-    # read-compress-write loop
+    compress_func = _compress_func(source.compress_func, blosc_args)
+    chunks = timed(_classify(source, dedup, sparse) if dedup or sparse else
+                   ((i, chunk, i) for i, chunk in enumerate(source)),
+                   stats, 'read')
+    omitted = collections.Counter()
+    if workers > 1:
+        _pack_parallel(source, sink, nchunks, chunks, omitted,
+                       compress_func, blosc_args, workers, max_inflight,
+                       stats)
+    else:
+        # read-compress-write loop
+        for i, chunk, original in chunks:
+            if original != i:
+                start = clock()
+                omitted[_put_omitted(sink, i, original)] += 1
+                stats.add('write', start, i)
+                source.release(chunk)
+                continue
+            if log.LEVEL == log.DEBUG:
+                log.debug("Handle chunk '%d'%s" %
+                        (i, ' (last)' if i == nchunks - 1 else ''))
+            start = clock()
+            compressed = compress_func(chunk, blosc_args)
+            start = stats.add('compress', start, i)
+            digest = sink.do_checksum(compressed)
+            start = stats.add('checksum', start, i)
+            sink.put(i, compressed, digest)
+            stats.add('write', start, i)
+            _count_packed(stats, compressed, digest)
+            if log.LEVEL == log.DEBUG:
+                log.debug("chunk handled, in: %s out: %s" %
+                        (double_pretty_size(len(chunk)),
+                        double_pretty_size(len(compressed))))
+            source.release(chunk)
+    if dedup:
+        log.verbose("deduplicated '%d' chunks" % omitted['duplicate'])
+    if sparse:
+        log.verbose("omitted '%d' chunks of zeros" % omitted['zeros'])
+    if isinstance(compress_func, AdaptiveCompressor):
+        log.verbose('codecs chosen: %s' % compress_func.summary())
+    if bloscpack_header.nchunks == -1:
+        # the source found out while being read, if it wasn't known
+        bloscpack_header.nchunks = source.nchunks
+        bloscpack_header.last_chunk = source.last_chunk
+    start = clock()
+    sink.finalize()
+    stats.add('write', start)
+    stats.nchunks = source.nchunks
+    stats.bytes_in = (source.nchunks - 1) * chunk_size + source.last_chunk
+    stats.stop()
+
+
+def _count_packed(stats, compressed, digest):
+    """ Count a stored chunk in the stats. """
+    nbytes, ctbytes = decode_blosc_sizes(compressed)
+    stats.bytes_out += ctbytes + len(digest)
+    stats.add_ratio(nbytes, ctbytes)
+
+
+_ZEROS_BLOCK = 2**18
+
+
+def _is_zeros(buffer_):
+    """ Check if a buffer consists entirely of zero bytes.
+
+    The buffer is scanned without copying, in blocks of 256K as 64 bit words,
+    such that most chunks that aren't zeros are rejected after the first
+    block.
+
+    """
+    array = numpy.frombuffer(buffer_, dtype=numpy.uint8)
+    nwords = len(array) - len(array) % 8
+    for start in range(0, nwords, _ZEROS_BLOCK):
+        block = array[start:min(start + _ZEROS_BLOCK, nwords)]
+        if block.view(numpy.uint64).max():
+            return False
+    return not array[nwords:].any()
+
+
+def _classify(source, dedup, sparse):
+    """ Yield '(i, chunk, original)' for every chunk of the source.
+
+    'original' is None for chunks of zeros if 'sparse' is set. Otherwise, if
+    'dedup' is set, it is the index of the first chunk with the same contents,
+    chunks are identified by a 128 bit BLAKE2b digest of their contents. For
+    anything else it is 'i' itself.
+
+    """
+    seen = {}
     for i, chunk in enumerate(source):
+        buffer_ = source.chunk_buffer(chunk)
+        if sparse and _is_zeros(buffer_):
+            yield i, chunk, None
+        elif dedup:
+            digest = hashlib.blake2b(buffer_, digest_size=16).digest()
+            yield i, chunk, seen.setdefault(digest, i)
+        else:
+            yield i, chunk, i
+
+
+def _put_omitted(sink, i, original):
+    """ Hand a chunk that is not stored to the sink.
+
+    Returns the kind of chunk, 'zeros' or 'duplicate'.
+
+    """
+    if original is None:
+        sink.put_zeros(i)
         if log.LEVEL == log.DEBUG:
-            log.debug("Handle chunk '%d'%s" %
-                    (i, ' (last)' if i == nchunks - 1 else ''))
-        compressed = compress_func(chunk, blosc_args)
-        sink.put(i, compressed)
-        if log.LEVEL == log.DEBUG:
-            log.debug("chunk handled, in: %s out: %s" %
-                    (double_pretty_size(len(chunk)),
-                    double_pretty_size(len(compressed))))
-    sink.finalize()
+            log.debug("chunk '%d' consists of zeros" % i)
+        return 'zeros'
+    sink.put_duplicate(i, original)
+    if log.LEVEL == log.DEBUG:
+        log.debug("chunk '%d' is a duplicate of chunk '%d'" % (i, original))
+    return 'duplicate'
+
+
+def _pack_parallel(source, sink, nchunks, chunks, omitted, compress_func,
+                   blosc_args, workers, max_inflight, stats):
+    """ Compress and checksum on a thread pool, write in order.
 
+    Chunks which are not stored are counted by kind in 'omitted'.
 
-def unpack(source, sink):
+    """
+
+    def compress_and_checksum(i, chunk, original):
+        if original != i:
+            return None, None
+        start = clock()
+        compressed = compress_func(chunk, blosc_args)
+        start = stats.add('compress', start, i)
+        digest = sink.do_checksum(compressed)
+        stats.add('checksum', start, i)
+        return compressed, digest
+
+    log.verbose('compressing with %d workers, at most %d chunks in flight' %
+                (workers, max_inflight))
+    with released_gil():
+        for (i, chunk, original), (compressed, digest) in ordered_map(
+                compress_and_checksum, chunks,
+                workers, max_inflight):
+            start = clock()
+            if original != i:
+                omitted[_put_omitted(sink, i, original)] += 1
+                stats.add('write', start, i)
+                source.release(chunk)
+                continue
+            sink.put(i, compressed, digest)
+            stats.add('write', start, i)
+            _count_packed(stats, compressed, digest)
+            if log.LEVEL == log.DEBUG:
+                log.debug("chunk '%d'%s handled, in: %s out: %s" %
+                        (i, ' (last)' if i == nchunks - 1 else '',
+                         double_pretty_size(len(chunk)),
+                         double_pretty_size(len(compressed))))
+            source.release(chunk)
+
+
+def _check_digest(checksum_impl, compressed, digest):
+    if digest:
+        computed_digest = checksum_impl(compressed)
+        if digest != computed_digest:
+            raise ChecksumMismatch(
+                    "Checksum mismatch detected in chunk, "
+                    "expected: '%s', received: '%s'" %
+                    (repr(digest), repr(computed_digest)))
+        else:
+            if log.LEVEL == log.DEBUG:
+                log.debug('checksum OK (%s): %s' %
+                        (checksum_impl.name, repr(digest)))
+
+
+def unpack(source, sink, workers=1, max_inflight=None, stats=None):
+    """ Core unpacking function.
+
+    Parameters
+    ----------
+    source : CompressedSource
+        the source to read compressed chunks from
+    sink : PlainSink
+        the sink to write decompressed chunks to
+    workers : int
+        the number of threads used to check and decompress chunks
+    max_inflight : int
+        the maximum number of chunks being decompressed at any one time, by
+        default twice the number of workers
+    stats : Stats
+        if given, filled in with the timings and sizes
+
+    Raises
+    ------
+    ChecksumMismatch
+        if any of the chunks fail to produce the correct checksum
+
+    Notes
+    -----
+    The source must provide 'chunk_size', 'last_chunk' and 'nchunks', which
+    are passed on to ``sink.configure``. With 'workers' larger than one,
+    chunks are checked and decompressed on a thread pool using
+    ``sink.decompress`` and handed to ``sink.write`` in order.
+
+    Sources yield '(None, None)' for chunks of zeros which were not stored,
+    see the 'sparse' option of 'pack', these are handed to ``sink.put_zeros``.
+
+    """
     if not isinstance(source, CompressedSource):
         raise TypeError
     if not isinstance(sink, PlainSink):
         raise TypeError
-    # read, decompress, write loop
-    for i, (compressed, digest) in enumerate(source):
-        if log.LEVEL == log.DEBUG:
-            log.debug("decompressing chunk '%d'%s" %
-                    (i, ' (last)' if source.nchunks is not None
-                    and i == source.nchunks - 1 else ''))
-        if digest:
-            computed_digest = source.checksum_impl(compressed)
-            if digest != computed_digest:
-                raise ChecksumMismatch(
-                        "Checksum mismatch detected in chunk, "
-                        "expected: '%s', received: '%s'" %
-                        (repr(digest), repr(computed_digest)))
-            else:
-                if log.LEVEL == log.DEBUG:
-                    log.debug('checksum OK (%s): %s' %
-                            (source.checksum_impl.name, repr(digest)))
-
-        len_decompressed = sink.put(compressed)
-        if log.LEVEL == log.DEBUG:
-            log.debug("chunk handled, in: %s out: %s" %
-                    (double_pretty_size(len(compressed)),
-                    double_pretty_size(len_decompressed)))
+    max_inflight = check_workers(workers, max_inflight)
+    stats = stats_or_stand_in(stats)
+    stats.start('unpack')
+    sink.configure(source.chunk_size, source.last_chunk, source.nchunks)
+    chunks = enumerate(timed(source, stats, 'read'))
+    if workers > 1:
+        _unpack_parallel(source, sink, chunks, workers, max_inflight, stats)
+    else:
+        # read, decompress, write loop
+        for i, (compressed, digest) in chunks:
+            if compressed is None:
+                _put_zeros(source, sink, i, stats)
+                continue
+            if log.LEVEL == log.DEBUG:
+                log.debug("decompressing chunk '%d'%s" %
+                        (i, ' (last)' if source.nchunks is not None
+                        and i == source.nchunks - 1 else ''))
+            start = clock()
+            _check_digest(source.checksum_impl, compressed, digest)
+            start = stats.add('checksum', start, i)
+            decompressed = sink.decompress(i, compressed)
+            start = stats.add('decompress', start, i)
+            len_decompressed = sink.write(i, decompressed)
+            stats.add('write', start, i)
+            _count_unpacked(stats, compressed, digest, len_decompressed)
+            if log.LEVEL == log.DEBUG:
+                log.debug("chunk handled, in: %s out: %s" %
+                        (double_pretty_size(len(compressed)),
+                        double_pretty_size(len_decompressed)))
+    start = clock()
+    sink.finalize()
+    stats.add('write', start)
+    stats.stop()
+
+
+def _put_zeros(source, sink, i, stats):
+    """ Hand chunk 'i', which consists of zeros, to the sink. """
+    start = clock()
+    nbytes = _zeros_nbytes(source, i)
+    sink.put_zeros(i, nbytes)
+    stats.add('write', start, i)
+    stats.nchunks += 1
+    stats.bytes_out += nbytes
+
+
+def _count_unpacked(stats, compressed, digest, nbytes):
+    """ Count a stored chunk in the stats. """
+    stats.nchunks += 1
+    stats.bytes_in += len(compressed) + (len(digest) if digest else 0)
+    stats.bytes_out += nbytes
+    stats.add_ratio(nbytes, len(compressed))
+
+
+def _zeros_nbytes(source, i):
+    """ The size of chunk 'i' of the source, which consists of zeros. """
+    nbytes = source.chunk_size if i != source.nchunks - 1 \
+        else source.last_chunk
+    if log.LEVEL == log.DEBUG:
+        log.debug("chunk '%d' consists of zeros, size: %s" %
+                  (i, double_pretty_size(nbytes)))
+    return nbytes
+
+
+def _unpack_parallel(source, sink, chunks, workers, max_inflight, stats):
+    """ Check and decompress on a thread pool, write in order. """
+    checksum_impl = source.checksum_impl
+
+    def check_and_decompress(i, compressed, digest):
+        if compressed is None:
+            return None
+        start = clock()
+        _check_digest(checksum_impl, compressed, digest)
+        start = stats.add('checksum', start, i)
+        decompressed = sink.decompress(i, compressed)
+        stats.add('decompress', start, i)
+        return decompressed
+
+    log.verbose('decompressing with %d workers, at most %d chunks in flight' %
+                (workers, max_inflight))
+    with released_gil():
+        for (i, compressed, digest), decompressed in ordered_map(
+                check_and_decompress,
+                ((i, c, d) for i, (c, d) in chunks),
+                workers, max_inflight):
+            if compressed is None:
+                _put_zeros(source, sink, i, stats)
+                continue
+            start = clock()
+            len_decompressed = sink.write(i, decompressed)
+            stats.add('write', start, i)
+            _count_unpacked(stats, compressed, digest, len_decompressed)
+            if log.LEVEL == log.DEBUG:
+                log.debug("chunk '%d' handled, in: %s out: %s" %
+                        (i, double_pretty_size(len(compressed)),
+                         double_pretty_size(len_decompressed)))
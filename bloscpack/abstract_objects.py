@@ -15,6 +15,9 @@ from .pretty import (double_pretty_size,
 
 class MutableMappingObject(collections.abc.MutableMapping):
 
+    # allow subclasses to use __slots__
+    __slots__ = ()
+
     _metaclass__ = abc.ABCMeta
 
     @abc.abstractproperty
@@ -7,14 +7,18 @@ from __future__ import division
 
 
 import os.path as path
-import itertools
 
 
 import blosc
+import numpy
 
 
 from .abstract_io import (_compress_chunk_str,
                           )
+from .cache import (invalidate_header_cache,
+                    )
+from .tune import (_compress_func,
+                   )
 from .args import (BLOSC_ARGS,
                    MetadataArgs,
                    calculate_nchunks,
@@ -29,6 +33,7 @@ from .checksums import (check_valid_checksum,
 from .constants import (BLOSCPACK_HEADER_LENGTH,
                         METADATA_HEADER_LENGTH,
                         MAX_CLEVEL,
+                        OFFSETS_DTYPE,
                         )
 from .defaults import (DEFAULT_CLEVEL,
                        DEFAULT_SHUFFLE,
@@ -83,13 +88,21 @@ def append_fp(original_fp, new_content_fp, new_size, blosc_args=None):
     The blosc_args argument can be supplied if different blosc arguments are
     desired.
 
+    Files with the 'trailer' option need no space reserved for appending,
+    their offsets and trailer are simply written anew after the last chunk.
+
     """
     bloscpack_header, metadata, metadata_header, offsets = \
         _read_beginning(original_fp)
     checksum_impl = bloscpack_header.checksum_impl
-    if not offsets:
+    if len(offsets) == 0:
         raise RuntimeError('Appending to a file without offsets '
                            'is not yet supported')
+    if bloscpack_header.dedup or bloscpack_header.sparse:
+        # the last chunk may be shared or omitted, it can not be rewritten in
+        # place
+        raise RuntimeError('Appending to a deduplicated or sparse file '
+                           'is not supported')
     if blosc_args is None:
         blosc_args = dict(zip(BLOSC_ARGS, [None] * len(BLOSC_ARGS)))
     # handle blosc_args
@@ -108,6 +121,10 @@ def append_fp(original_fp, new_content_fp, new_size, blosc_args=None):
     if blosc_args['cname'] is None:
         blosc_args['cname'] = DEFAULT_CNAME
     _check_blosc_args(blosc_args)
+    compress = _compress_func(_compress_chunk_str, blosc_args)
+    if bloscpack_header.trailer:
+        return _append_trailer_fp(original_fp, new_content_fp, new_size,
+                                  blosc_args, bloscpack_header, offsets)
     offsets_pos = (BLOSCPACK_HEADER_LENGTH +
                   (METADATA_HEADER_LENGTH + metadata_header['max_meta_size'] +
                       CHECKSUMS_LOOKUP[metadata_header['meta_checksum']].size
@@ -129,7 +146,7 @@ def append_fp(original_fp, new_content_fp, new_size, blosc_args=None):
         # seek back to the position of the original last chunk
         original_fp.seek(offsets[-1], 0)
         # write the chunk that has been filled up
-        compressed = _compress_chunk_str(decompressed + fill_up, blosc_args)
+        compressed = compress(decompressed + fill_up, blosc_args)
         digest = checksum_impl(compressed)
         _write_compressed_chunk(original_fp, compressed, digest)
         # return 0 to indicate that no new chunks have been written
@@ -139,6 +156,7 @@ def append_fp(original_fp, new_content_fp, new_size, blosc_args=None):
         raw_bloscpack_header = bloscpack_header.encode()
         original_fp.seek(0)
         original_fp.write(raw_bloscpack_header)
+        invalidate_header_cache(original_fp)
         return 0
 
     # figure out what is left over
@@ -155,7 +173,7 @@ def append_fp(original_fp, new_content_fp, new_size, blosc_args=None):
     # seek back to the position of the original last chunk
     original_fp.seek(offsets[-1], 0)
     # write the chunk that has been filled up
-    compressed = _compress_chunk_str(decompressed + fill_up, blosc_args)
+    compressed = compress(decompressed + fill_up, blosc_args)
     digest = checksum_impl(compressed)
     _write_compressed_chunk(original_fp, compressed, digest)
     # append to the original file, again original_fp should be adequately
@@ -163,7 +181,7 @@ def append_fp(original_fp, new_content_fp, new_size, blosc_args=None):
     sink = CompressedFPSink(original_fp)
     sink.configure(blosc_args, bloscpack_header)
     # allocate new offsets
-    sink.offset_storage = list(itertools.repeat(-1, nchunks))
+    sink.offset_storage = numpy.full(nchunks, -1, dtype=OFFSETS_DTYPE)
     # read from the new input file, new_content_fp should be adequately
     # positioned
     source = PlainFPSource(new_content_fp)
@@ -173,7 +191,7 @@ def append_fp(original_fp, new_content_fp, new_size, blosc_args=None):
         log.debug("Handle chunk '%d' %s" % (i,'(last)' if i == nchunks -1
             else ''))
 
-        compressed = _compress_chunk_str(chunk, blosc_args)
+        compressed = compress(chunk, blosc_args)
         sink.put(i, compressed)
 
     # build the new header
@@ -185,9 +203,64 @@ def append_fp(original_fp, new_content_fp, new_size, blosc_args=None):
     original_fp.seek(0)
     original_fp.write(raw_bloscpack_header)
     # write the new offsets, but only those that changed
-    original_fp.seek(offsets_pos)
-    # FIXME: write only those that changed
-    _write_offsets(sink.output_fp, offsets + sink.offset_storage)
+    original_fp.seek(offsets_pos + 8 * len(offsets))
+    _write_offsets(sink.output_fp, sink.offset_storage)
+    invalidate_header_cache(original_fp)
+    return nchunks
+
+
+def _append_trailer_fp(original_fp, new_content_fp, new_size,
+                       blosc_args, bloscpack_header, offsets):
+    """ Append to a file with the 'trailer' option.
+
+    The last chunk is filled up and rewritten in place, followed by the new
+    chunks, all of the offsets and a new trailer. Since the offsets and the
+    trailer are always located right after the last chunk, this leaves no
+    unused space behind.
+
+    Returns
+    -------
+    nchunks_written : int
+        the total number of new chunks written to the file
+
+    """
+    checksum_impl = bloscpack_header.checksum_impl
+    compress = _compress_func(_compress_chunk_str, blosc_args)
+    # decompress the last chunk
+    original_fp.seek(offsets[-1], 0)
+    compressed, blosc_header, digest = _read_compressed_chunk_fp(original_fp,
+                                                         checksum_impl)
+    decompressed = blosc.decompress(compressed)
+    bytes_to_read = bloscpack_header.chunk_size - len(decompressed)
+    fill_up = new_content_fp.read(min(new_size, bytes_to_read))
+    new_new_size = new_size - len(fill_up)
+    # overwrite from the original last chunk onwards
+    original_fp.seek(offsets[-1], 0)
+    sink = CompressedFPSink(original_fp)
+    sink.configure(blosc_args, bloscpack_header)
+    sink.offset_storage = offsets[:-1].tolist()
+    sink.put(len(offsets) - 1,
+             compress(decompressed + fill_up, blosc_args))
+    nchunks = 0
+    if new_new_size > 0:
+        nchunks, chunk_size, last_chunk_size = \
+                calculate_nchunks(new_new_size,
+                    chunk_size=bloscpack_header.chunk_size)
+        source = PlainFPSource(new_content_fp)
+        source.configure(chunk_size, last_chunk_size, nchunks)
+        for i, chunk in enumerate(source):
+            log.debug("Handle chunk '%d' %s" % (i,'(last)' if i == nchunks -1
+                else ''))
+            sink.put(len(offsets) + i, compress(chunk, blosc_args))
+        bloscpack_header.last_chunk = last_chunk_size
+    else:
+        bloscpack_header.last_chunk += len(fill_up)
+    bloscpack_header.nchunks += nchunks
+    # write the offsets and the trailer
+    sink.finalize()
+    # the file shrinks if the last chunk compressed better than before
+    original_fp.truncate()
+    invalidate_header_cache(original_fp)
     return nchunks
 
 
@@ -279,6 +352,7 @@ def _rewrite_metadata_fp(target_fp, new_metadata,
     target_fp.seek(current_pos, 0)
     # and re-write it
     _write_metadata(target_fp, new_metadata, new_metadata_args)
+    invalidate_header_cache(target_fp)
 
 
 def _recreate_metadata(old_metadata_header, new_metadata,
@@ -19,6 +19,9 @@ from .defaults import (DEFAULT_TYPESIZE,
                        DEFAULT_CHECKSUM,
                        DEFAULT_MAX_APP_CHUNKS,
                        DEFAULT_OFFSETS,
+                       DEFAULT_TRAILER,
+                       DEFAULT_DEDUP,
+                       DEFAULT_SPARSE,
                        DEFAULT_MAGIC_FORMAT,
                        DEFAULT_META_CHECKSUM,
                        DEFAULT_META_CODEC,
@@ -38,10 +41,12 @@ from .pretty import (double_pretty_size,
 from . import log
 
 # Bloscpack args
-BLOSCPACK_ARGS = ('offsets', 'checksum', 'max_app_chunks')
+BLOSCPACK_ARGS = ('offsets', 'checksum', 'max_app_chunks', 'trailer',
+                  'dedup', 'sparse')
 _BLOSCPACK_ARGS_SET = set(BLOSCPACK_ARGS)  # cached
 DEFAULT_BLOSCPACK_ARGS = dict(zip(BLOSCPACK_ARGS,
-    (DEFAULT_OFFSETS, DEFAULT_CHECKSUM, DEFAULT_MAX_APP_CHUNKS)))
+    (DEFAULT_OFFSETS, DEFAULT_CHECKSUM, DEFAULT_MAX_APP_CHUNKS,
+     DEFAULT_TRAILER, DEFAULT_DEDUP, DEFAULT_SPARSE)))
 
 
 # Blosc args
@@ -345,20 +350,39 @@ class BloscpackArgs(MutableMappingObject):
         Name of the checksum to use or None/'None'
     max_app_chunks : int or callable on number of chunks
         How much space to reserve in the offsets for chunks to be appended.
+    trailer : boolean
+        Whether to put the offsets and the number of chunks in a trailer at
+        the end of the file, implies offsets and makes 'max_app_chunks'
+        superfluous
+    dedup : boolean
+        Whether to store chunks with identical contents only once, implies
+        offsets and makes 'max_app_chunks' superfluous
+    sparse : boolean
+        Whether to omit chunks consisting entirely of zeros, implies offsets
+        and makes 'max_app_chunks' superfluous
 
     """
     def __init__(self,
                  offsets=DEFAULT_OFFSETS,
                  checksum=DEFAULT_CHECKSUM,
-                 max_app_chunks=DEFAULT_MAX_APP_CHUNKS):
+                 max_app_chunks=DEFAULT_MAX_APP_CHUNKS,
+                 trailer=DEFAULT_TRAILER,
+                 dedup=DEFAULT_DEDUP,
+                 sparse=DEFAULT_SPARSE):
         self.offsets = offsets
         # Special hack, accept Pythonic None as 'None'.
         self.checksum = 'None' if checksum is None else checksum
         self.max_app_chunks = max_app_chunks
+        self.trailer = trailer
+        self.dedup = dedup
+        self.sparse = sparse
 
         self._attrs = ['offsets',
                        'checksum',
                        'max_app_chunks',
+                       'trailer',
+                       'dedup',
+                       'sparse',
                        ]
 
     @property
@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim :set ft=py:
+
+
+from __future__ import division
+
+
+import collections
+import csv
+import itertools
+import json
+import os
+import os.path as path
+import shutil
+import tempfile
+import time
+
+
+import blosc
+import numpy
+import six
+
+
+from .args import (BloscArgs,
+                   BloscpackArgs,
+                   )
+from .defaults import (DEFAULT_CNAME,
+                       DEFAULT_CLEVEL,
+                       DEFAULT_CHUNK_SIZE,
+                       DEFAULT_CHECKSUM,
+                       DEFAULT_TYPESIZE,
+                       DEFAULT_BENCH_SIZE,
+                       DEFAULT_BENCH_REPEATS,
+                       DEFAULT_BENCH_FORMAT,
+                       )
+from .file_io import (pack_file_to_file,
+                      unpack_file_from_file,
+                      )
+from .pretty import (pretty_size,
+                     reverse_pretty,
+                     )
+from . import sysutil
+from . import log
+
+
+BENCH_FORMATS = ('table', 'csv', 'json')
+# the columns of the results, the parameters first
+BENCH_COLUMNS = ('cname', 'clevel', 'chunk_size', 'checksum', 'nthreads',
+                 'workers', 'ratio', 'pack', 'unpack', 'peak_rss')
+
+
+def _size(size):
+    return reverse_pretty(size) if isinstance(size, six.string_types) \
+        else size
+
+
+def create_synthetic(filename, size):
+    """ Write 'size' bytes of evenly spaced float64 numbers to a file.
+
+    The data is the same as that of 'testutil.create_array', which is highly
+    compressible.
+
+    """
+    size = _size(size)
+    block = 2 ** 21
+    with open(filename, 'wb') as fp:
+        i = 0
+        while size > 0:
+            bytes_ = numpy.linspace(i, i + 1, block).tobytes()[:size]
+            fp.write(bytes_)
+            size -= len(bytes_)
+            i += 1
+
+
+def _timed(func, drop_caches, *args, **kwargs):
+    """ The wall time of a call, optionally starting with cold caches. """
+    if drop_caches:
+        sysutil.sync()
+        sysutil.drop_caches()
+    # the messages of every run would drown those of the benchmark
+    level, log.LEVEL = log.LEVEL, log.NORMAL
+    try:
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        if drop_caches:
+            # include writing back to disk
+            sysutil.sync()
+        return time.perf_counter() - start
+    finally:
+        log.LEVEL = level
+
+
+def bench(in_file=None,
+          size=DEFAULT_BENCH_SIZE,
+          cnames=(DEFAULT_CNAME,),
+          clevels=(DEFAULT_CLEVEL,),
+          chunk_sizes=(DEFAULT_CHUNK_SIZE,),
+          checksums=(DEFAULT_CHECKSUM,),
+          nthreads=None,
+          workers=(1,),
+          repeats=DEFAULT_BENCH_REPEATS,
+          typesize=DEFAULT_TYPESIZE,
+          drop_caches=False):
+    """ Measure packing and unpacking a file over a grid of settings.
+
+    Parameters
+    ----------
+    in_file : str or None
+        the file to pack, by default a synthetic dataset
+    size : int or str
+        the size of the synthetic dataset
+    cnames : sequence of str
+        the codecs, including 'adaptive'
+    clevels : sequence of int
+        the compression levels
+    chunk_sizes : sequence of int or str
+        the chunk sizes
+    checksums : sequence of str
+        the checksums
+    nthreads : sequence of int or None
+        the numbers of Blosc threads, by default the current one
+    workers : sequence of int
+        the numbers of threads compressing and decompressing chunks
+    repeats : int
+        the number of times each setting is run
+    typesize : int
+        the typesize
+    drop_caches : bool
+        drop the page cache before each run, which needs root permissions
+
+    Returns
+    -------
+    results : list of OrderedDict
+        one per setting, with the columns of 'BENCH_COLUMNS': the settings,
+        the compression ratio, the median throughput of 'pack' and 'unpack'
+        in uncompressed bytes per second and the peak resident set size in
+        bytes, None if unknown
+
+    Raises
+    ------
+    ValueError
+        if 'repeats' is less than one
+    RuntimeError
+        if 'drop_caches' is set without root permissions
+
+    Notes
+    -----
+    The compressed and decompressed files go into a temporary directory,
+    next to the synthetic dataset. Where supported, i.e. on Linux, the peak
+    resident set size is reset for each setting, elsewhere it is the peak of
+    the whole process so far.
+
+    """
+    if repeats < 1:
+        raise ValueError("repeats must be at least one, not: '%d'" % repeats)
+    previous_nthreads = blosc.nthreads
+    if nthreads is None:
+        nthreads = (previous_nthreads,)
+    tdir = tempfile.mkdtemp(prefix='bloscpack-bench-')
+    try:
+        if in_file is None:
+            in_file = path.join(tdir, 'synthetic.dat')
+            log.verbose('creating a synthetic dataset of %s' %
+                        pretty_size(_size(size)))
+            create_synthetic(in_file, size)
+        out_file = path.join(tdir, 'bench.blp')
+        dcmp_file = path.join(tdir, 'bench.dcmp')
+        nbytes = path.getsize(in_file)
+        results = []
+        for cname, clevel, chunk_size, checksum, nthreads_, workers_ in \
+                itertools.product(cnames, clevels, chunk_sizes, checksums,
+                                  nthreads, workers):
+            chunk_size = _size(chunk_size)
+            blosc.set_nthreads(nthreads_)
+            blosc_args = BloscArgs(typesize=typesize, clevel=clevel,
+                                   cname=cname)
+            bloscpack_args = BloscpackArgs(checksum=checksum)
+            sysutil.reset_peak_rss()
+            pack_times, unpack_times = [], []
+            for _ in range(repeats):
+                pack_times.append(_timed(
+                    pack_file_to_file, drop_caches, in_file, out_file,
+                    chunk_size=chunk_size, blosc_args=blosc_args,
+                    bloscpack_args=bloscpack_args, workers=workers_))
+                unpack_times.append(_timed(
+                    unpack_file_from_file, drop_caches, out_file, dcmp_file,
+                    workers=workers_))
+            result = collections.OrderedDict(zip(BENCH_COLUMNS, (
+                cname, clevel, chunk_size, checksum, nthreads_, workers_,
+                nbytes / path.getsize(out_file),
+                nbytes / max(numpy.median(pack_times), 1e-9),
+                nbytes / max(numpy.median(unpack_times), 1e-9),
+                sysutil.peak_rss())))
+            log.verbose(', '.join('%s: %s' % item
+                                  for item in _pretty(result).items()))
+            results.append(result)
+        return results
+    finally:
+        blosc.set_nthreads(previous_nthreads)
+        shutil.rmtree(tdir)
+
+
+def _pretty(result):
+    """ A result with its sizes and throughputs made human readable. """
+    pretty = collections.OrderedDict(result)
+    pretty['chunk_size'] = pretty_size(result['chunk_size'])
+    pretty['ratio'] = '%.2f' % result['ratio']
+    pretty['pack'] = '%s/s' % pretty_size(result['pack'])
+    pretty['unpack'] = '%s/s' % pretty_size(result['unpack'])
+    pretty['peak_rss'] = 'n/a' if result['peak_rss'] is None \
+        else pretty_size(result['peak_rss'])
+    return pretty
+
+
+def format_results(results, format_=DEFAULT_BENCH_FORMAT):
+    """ Format the results of 'bench'.
+
+    Parameters
+    ----------
+    results : list of OrderedDict
+        as returned by 'bench'
+    format_ : str
+        'table' for aligned columns with human readable sizes, 'csv' or
+        'json' for the raw numbers
+
+    Returns
+    -------
+    formatted : str
+
+    Raises
+    ------
+    ValueError
+        if the format is unknown
+
+    """
+    if format_ == 'json':
+        return json.dumps(results, indent=2)
+    elif format_ == 'csv':
+        output = six.StringIO()
+        writer = csv.writer(output, lineterminator=os.linesep)
+        writer.writerow(BENCH_COLUMNS)
+        for result in results:
+            writer.writerow(['' if result[column] is None else result[column]
+                             for column in BENCH_COLUMNS])
+        return output.getvalue().rstrip(os.linesep)
+    elif format_ == 'table':
+        rows = [BENCH_COLUMNS] + \
+            [[str(value) for value in _pretty(result).values()]
+             for result in results]
+        widths = [max(len(row[i]) for row in rows)
+                  for i in range(len(BENCH_COLUMNS))]
+        return '\n'.join('  '.join(value.rjust(width)
+                                   for value, width in zip(row, widths))
+                         .rstrip()
+                         for row in rows)
+    raise ValueError("unknown format '%s', must be one of: '%s'" %
+                     (format_, "', '".join(BENCH_FORMATS)))
@@ -0,0 +1,335 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim :set ft=py:
+
+
+import copy
+import os
+import threading
+
+
+import six
+
+
+from .compat_util import OrderedDict
+from .defaults import (DEFAULT_CACHE_SIZE,
+                       DEFAULT_HEADER_CACHE_SIZE,
+                       )
+from .pretty import (double_pretty_size,
+                     reverse_pretty,
+                     )
+from . import log
+
+
+def stat_identity(fp):
+    """ Identify the real file behind a file pointer.
+
+    Parameters
+    ----------
+    fp : file like
+        the file pointer
+
+    Returns
+    -------
+    identity : tuple or None
+        '(st_dev, st_ino, st_mtime_ns, st_size)', such that a modified file
+        gets a new identity, or None if 'fp' is not backed by a real file
+
+    """
+    try:
+        stat = os.fstat(fp.fileno())
+    except (AttributeError, OSError, IOError, ValueError):
+        # StringIO and friends, io.UnsupportedOperation is an OSError and a
+        # ValueError
+        return None
+    return _identity_from_stat(stat)
+
+
+def _identity_from_stat(stat):
+    return stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def file_identity(fp):
+    """ Identify the file behind a file pointer.
+
+    Parameters
+    ----------
+    fp : file like
+        the file pointer
+
+    Returns
+    -------
+    identity : tuple
+        the 'stat_identity' for real files and a new unique token for
+        anything else
+
+    Notes
+    -----
+    The token is an object of its own, rather than 'id(fp)', which Python
+    reuses once 'fp' is gone. Cache keys keep the token alive, so it can't be
+    handed out again while chunks are cached under it. Consequently, in
+    memory files are identified anew on every call.
+
+    """
+    identity = stat_identity(fp)
+    return identity if identity is not None else (object(),)
+
+
+class _LRUCache(object):
+    """ Thread-safe LRU cache with a budget and hit/miss/eviction counters.
+
+    Subclasses define the size of a value via '_sizeof'.
+
+    """
+
+    def __init__(self, max_size):
+        if max_size < 0:
+            raise ValueError("cache size must not be negative: '%d'" %
+                             max_size)
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _sizeof(self, value):
+        raise NotImplementedError
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        """ Get a value, or None if it isn't cached. """
+        with self._lock:
+            try:
+                value = self._entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                return None
+            # re-insert to mark as most recently used
+            self._entries[key] = value
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """ Cache a value, evicting the least recently used as needed. """
+        size = self._sizeof(value)
+        if size > self.max_size:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= self._sizeof(previous)
+            while self.size + size > self.max_size:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= self._sizeof(evicted)
+                self.evictions += 1
+            self._entries[key] = value
+            self.size += size
+
+    def invalidate(self, key):
+        """ Remove a value, if it is cached. """
+        with self._lock:
+            value = self._entries.pop(key, None)
+            if value is not None:
+                self.size -= self._sizeof(value)
+
+    def clear(self):
+        """ Empty the cache, the counters are kept. """
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+class ChunkCache(_LRUCache):
+    """ Size bounded, thread-safe LRU cache of decompressed chunks.
+
+    Parameters
+    ----------
+    max_bytes : int or str
+        the budget in bytes, may be a human readable string such as '256M'
+
+    Notes
+    -----
+    Keys are typically '(file_identity(fp), chunk_index)' tuples, such that
+    several readers of the same file can share a cache. Chunks larger than the
+    whole budget are not cached.
+
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_SIZE):
+        if isinstance(max_bytes, six.string_types):
+            max_bytes = reverse_pretty(max_bytes)
+        super(ChunkCache, self).__init__(max_bytes)
+
+    def _sizeof(self, value):
+        return len(value)
+
+    @property
+    def max_bytes(self):
+        return self.max_size
+
+    @property
+    def nbytes(self):
+        return self.size
+
+    def __repr__(self):
+        return "%s(%s/%s in %d chunks, hits=%d, misses=%d, evictions=%d)" % \
+            (self.__class__.__name__, double_pretty_size(self.nbytes),
+             double_pretty_size(self.max_bytes), len(self), self.hits,
+             self.misses, self.evictions)
+
+    def put(self, key, value):
+        super(ChunkCache, self).put(key, value)
+        if log.LEVEL == log.DEBUG:
+            log.debug("cached chunk '%s' of size: '%d'" %
+                      (repr(key), len(value)))
+
+    @property
+    def stats(self):
+        """ The counters and current size as a dict. """
+        with self._lock:
+            return {'hits': self.hits,
+                    'misses': self.misses,
+                    'evictions': self.evictions,
+                    'nbytes': self.size,
+                    'max_bytes': self.max_size,
+                    'nchunks': len(self._entries),
+                    }
+
+
+class HeaderCache(_LRUCache):
+    """ Bounded, thread-safe LRU cache of parsed file beginnings.
+
+    Caches the '(bloscpack_header, metadata, metadata_header, offsets)' as
+    returned by '_read_beginning', keyed by the 'stat_identity' of the file,
+    together with the position of the first chunk.
+
+    Parameters
+    ----------
+    max_entries : int
+        the maximum number of files to cache
+
+    Notes
+    -----
+    Since the key contains the modification time and the size, a modified file
+    is parsed again. On file systems with coarse timestamps a file rewritten
+    to the same size may keep its key, bloscpack invalidates the entry itself
+    whenever it writes to a file, for anything else use 'invalidate'.
+
+    """
+
+    def __init__(self, max_entries=DEFAULT_HEADER_CACHE_SIZE):
+        super(HeaderCache, self).__init__(max_entries)
+
+    def _sizeof(self, value):
+        return 1
+
+    @property
+    def max_entries(self):
+        return self.max_size
+
+    def __repr__(self):
+        return "%s(%d/%d files, hits=%d, misses=%d, evictions=%d)" % \
+            (self.__class__.__name__, len(self), self.max_entries,
+             self.hits, self.misses, self.evictions)
+
+    def get(self, key):
+        """ Get copies of a cached beginning, or None if it isn't cached. """
+        entry = super(HeaderCache, self).get(key)
+        if entry is None:
+            return None
+        (bloscpack_header, metadata, metadata_header, offsets), position = \
+            entry
+        # callers may modify the headers and the metadata, the offsets are
+        # read-only
+        return ((bloscpack_header.copy(),
+                 copy.deepcopy(metadata),
+                 metadata_header.copy() if metadata_header is not None
+                 else None,
+                 offsets),
+                position)
+
+    @property
+    def stats(self):
+        """ The counters and current size as a dict. """
+        with self._lock:
+            return {'hits': self.hits,
+                    'misses': self.misses,
+                    'evictions': self.evictions,
+                    'nfiles': len(self._entries),
+                    'max_entries': self.max_size,
+                    }
+
+
+_HEADER_CACHE = None
+
+
+def enable_header_cache(max_entries=DEFAULT_HEADER_CACHE_SIZE):
+    """ Enable the process-wide cache of parsed headers.
+
+    Parameters
+    ----------
+    max_entries : int
+        the maximum number of files to cache
+
+    Returns
+    -------
+    header_cache : HeaderCache
+        the newly enabled cache
+
+    """
+    global _HEADER_CACHE
+    _HEADER_CACHE = HeaderCache(max_entries)
+    log.debug("enabled header cache for up to '%d' files" % max_entries)
+    return _HEADER_CACHE
+
+
+def disable_header_cache():
+    """ Disable the process-wide cache of parsed headers. """
+    global _HEADER_CACHE
+    _HEADER_CACHE = None
+
+
+def get_header_cache():
+    """ The process-wide cache of parsed headers, None if disabled. """
+    return _HEADER_CACHE
+
+
+def invalidate_header_cache(fp=None):
+    """ Invalidate the process-wide cache of parsed headers.
+
+    Parameters
+    ----------
+    fp : str, file like or None
+        the file name or pointer of the file to invalidate, None to empty
+        the whole cache
+
+    Notes
+    -----
+    A file pointer is flushed first, such that its identity reflects all
+    writes.
+
+    """
+    header_cache = _HEADER_CACHE
+    if header_cache is None:
+        return
+    if fp is None:
+        header_cache.clear()
+        return
+    if isinstance(fp, six.string_types):
+        try:
+            identity = _identity_from_stat(os.stat(fp))
+        except (OSError, IOError):
+            return
+    else:
+        if hasattr(fp, 'flush'):
+            fp.flush()
+        identity = stat_identity(fp)
+    if identity is not None:
+        header_cache.invalidate(identity)
@@ -7,6 +7,7 @@ import argparse
 from os import path
 import json
 import pprint
+import sys
 
 
 import blosc
@@ -24,9 +25,11 @@ from .checksums import (CHECKSUMS_AVAIL,
                         )
 from .constants import (SUFFIXES,
                         CNAME_AVAIL,
+                        ADAPTIVE_CNAME,
                         EXTENSION,
                         MIN_CLEVEL,
                         MAX_CLEVEL,
+                        ZERO_CHUNK_OFFSET,
                         )
 from .defaults import (DEFAULT_TYPESIZE,
                        DEFAULT_CLEVEL,
@@ -35,26 +38,64 @@ from .defaults import (DEFAULT_TYPESIZE,
                        DEFAULT_CHUNK_SIZE,
                        DEFAULT_CHECKSUM,
                        DEFAULT_OFFSETS,
+                       DEFAULT_TRAILER,
+                       DEFAULT_DEDUP,
+                       DEFAULT_SPARSE,
+                       DEFAULT_PREFETCH,
+                       DEFAULT_TUNE_TARGET,
+                       DEFAULT_TUNE_SAMPLE_SIZE,
+                       DEFAULT_BENCH_SIZE,
+                       DEFAULT_BENCH_REPEATS,
+                       DEFAULT_BENCH_FORMAT,
                        )
 from .exceptions import (FileNotFound,
                          ChunkingException,
                          FormatVersionMismatch,
                          ChecksumMismatch,
+                         CorruptedChunk,
                          )
 from .file_io import (pack_file_to_file,
                       unpack_file_from_file,
-                      _read_beginning,
+                      pack_stream_to_file,
+                      unpack_stream_from_file,
+                      CompressedFPSource,
                       _read_compressed_chunk_fp,
                       )
 from .headers import (decode_blosc_flags,
                       )
-from .pretty import (reverse_pretty,
+from .index import (write_index,
+                    add_offsets,
+                    )
+from .pretty import (double_pretty_size,
+                     reverse_pretty,
                      join_with_eol,
                      )
+from .tune import (TUNE_TARGETS,
+                   autotune,
+                   target_weight,
+                   )
+from .bench import (BENCH_FORMATS,
+                    bench,
+                    format_results,
+                    )
+from .stats import (Stats,
+                    )
+from .trace import (enable_tracing,
+                    )
+from .verify import (verify_file,
+                     )
 from .version import __version__
 from . import log
 
 
+# the file name for stdin and stdout
+STDIO = '-'
+
+
+def _binary(stream):
+    return getattr(stream, 'buffer', stream)
+
+
 def check_files(in_file, out_file, args):
     """ Check files exist/don't exist.
 
@@ -73,9 +114,9 @@ def check_files(in_file, out_file, args):
         in case any of the files isn't found.
 
     """
-    if not path.exists(in_file):
+    if in_file != STDIO and not path.exists(in_file):
         raise FileNotFound("input file '%s' does not exist!" % in_file)
-    if path.exists(out_file):
+    if out_file != STDIO and path.exists(out_file):
         if not args.force:
             raise FileNotFound("output file '%s' exists!" % out_file)
         else:
@@ -110,6 +151,8 @@ def process_compression_args(args):
         typesize, clevel and shuffle
     """
     in_file = args.in_file
+    if in_file == STDIO and args.out_file is None:
+        log.error("reading from stdin requires use of <out_file>")
     out_file = args.out_file or in_file + EXTENSION
     return in_file, out_file, _blosc_args_from_args(args)
 
@@ -173,6 +216,40 @@ def process_nthread_arg(args):
                 (args.nthreads, 's' if args.nthreads > 1 else ''))
 
 
+def _tune_target(value):
+    """ Parse a tuning target, a name or a weight. """
+    try:
+        value = float(value)
+    except ValueError:
+        pass
+    try:
+        target_weight(value)
+    except ValueError as ve:
+        raise argparse.ArgumentTypeError(str(ve))
+    return value
+
+
+def _comma_list(type_, choices=None):
+    """ A parser for a comma separated list of values. """
+    def parse(value):
+        try:
+            values = [type_(item) for item in value.split(',')]
+        except ValueError as ve:
+            raise argparse.ArgumentTypeError(str(ve))
+        for item in values:
+            if choices is not None and item not in choices:
+                raise argparse.ArgumentTypeError(
+                    "invalid choice: '%s' (choose from '%s')" %
+                    (item, "', '".join(str(c) for c in choices)))
+        return values
+    return parse
+
+
+def _verbose_stats():
+    """ A 'Stats' to collect, only if its summary will be printed. """
+    return Stats() if log.LEVEL != log.NORMAL else None
+
+
 def log_metadata(metadata):
     log.normal("Metadata:")
     log.normal(pprint.pformat(metadata, width=90))
@@ -225,11 +302,13 @@ def _inject_blosc_group(parser):
     blosc_group.add_argument('-c', '--codec',
                              metavar='<codec>',
                              type=str,
-                             choices=CNAME_AVAIL,
+                             choices=CNAME_AVAIL + [ADAPTIVE_CNAME],
                              default=DEFAULT_CNAME,
                              dest='cname',
                              help="codec to be used by Blosc: \n%s"
-                                  % join_with_eol(CNAME_AVAIL))
+                                  % join_with_eol(CNAME_AVAIL) +
+                                  "or '%s' to pick one for each chunk\n"
+                                  % ADAPTIVE_CNAME)
 
 
 def create_parser():
@@ -278,6 +357,13 @@ def create_parser():
                               dest='nthreads',
                               help='set number of threads, ' +
                                    '(default: %(default)s (ncores))')
+    global_group.add_argument('--trace',
+                              metavar='<file>',
+                              type=str,
+                              default=None,
+                              help="record the timeline of the chunks, as a "
+                                   "Chrome trace\n" +
+                                   "or as JSON lines if it ends in '.jsonl'")
 
     subparsers = parser.add_subparsers(title='subcommands',
                                        metavar='',
@@ -332,11 +418,33 @@ def create_parser():
                                      default=DEFAULT_OFFSETS,
                                      dest='offsets',
                                      help='deactivate offsets')
+        bloscpack_group.add_argument('-r', '--trailer',
+                                     action='store_true',
+                                     default=DEFAULT_TRAILER,
+                                     dest='trailer',
+                                     help='put the offsets in a trailer at the end of the file')
+        bloscpack_group.add_argument('-u', '--dedup',
+                                     action='store_true',
+                                     default=DEFAULT_DEDUP,
+                                     dest='dedup',
+                                     help='store repeated chunks only once')
+        bloscpack_group.add_argument('-x', '--sparse',
+                                     action='store_true',
+                                     default=DEFAULT_SPARSE,
+                                     dest='sparse',
+                                     help='omit chunks of zeros, decompress to a sparse file')
         bloscpack_group.add_argument('-m', '--metadata',
                                      metavar='<metadata>',
                                      type=str,
                                      dest='metadata',
                                      help="file containing the metadata, must contain valid JSON")
+        io_group = p.add_argument_group(title='i/o settings')
+        io_group.add_argument('-p', '--prefetch',
+                              metavar='<n>',
+                              type=int,
+                              default=DEFAULT_PREFETCH,
+                              dest='prefetch',
+                              help='read up to <n> chunks ahead on a background thread')
 
 
     decompress_parser = subparsers.add_parser('decompress',
@@ -356,17 +464,17 @@ def create_parser():
                        '(requires use of <out_file>)')
 
     for p, help_in, help_out in [(compress_parser,
-                                  'file to be compressed',
+                                  "file to be compressed, '-' for stdin",
                                   'file to compress to'),
                                  (c_parser,
-                                  'file to be compressed',
+                                  "file to be compressed, '-' for stdin",
                                   'file to compress to'),
                                  (decompress_parser,
                                   'file to be decompressed',
-                                  'file to decompress to'),
+                                  "file to decompress to, '-' for stdout"),
                                  (d_parser,
                                   'file to be decompressed',
-                                  'file to decompress to'),
+                                  "file to decompress to, '-' for stdout"),
                                  ]:
         p.add_argument('in_file',
                        metavar='<in_file>',
@@ -424,6 +532,147 @@ def create_parser():
                        type=str,
                        default=None,
                        help="file to show info for")
+
+    index_parser = subparsers.add_parser('index',
+            formatter_class=BloscPackCustomFormatter,
+            help='index a compressed file without offsets')
+    index_parser.add_argument('-r', '--rewrite',
+                              action='store_true',
+                              default=False,
+                              dest='rewrite',
+                              help='rewrite the file with an offsets section\n' +
+                              'instead of writing a sidecar index (*.idx)')
+    index_parser.add_argument('file_',
+                              metavar='<file>',
+                              type=str,
+                              default=None,
+                              help="file to index")
+
+    tune_parser = subparsers.add_parser('tune',
+            formatter_class=BloscPackCustomFormatter,
+            help='find the best compression settings for a file')
+    tune_parser.add_argument('-t', '--typesize',
+                             metavar='<size>',
+                             default=DEFAULT_TYPESIZE,
+                             type=int,
+                             help='typesize for blosc')
+    tune_parser.add_argument('-g', '--target',
+                             metavar='<target>',
+                             type=_tune_target,
+                             default=DEFAULT_TUNE_TARGET,
+                             dest='target',
+                             help="what to optimize for: %s\n" %
+                                  ', '.join(sorted(TUNE_TARGETS)) +
+                                  'or the weight of the ratio versus the '
+                                  'throughput in [0, 1]')
+    tune_parser.add_argument('-S', '--sample-size',
+                             metavar='<size>',
+                             type=reverse_pretty,
+                             default=DEFAULT_TUNE_SAMPLE_SIZE,
+                             dest='sample_size',
+                             help='amount of data to compress per candidate')
+    tune_parser.add_argument('in_file',
+                             metavar='<in_file>',
+                             type=str,
+                             help="file to tune for")
+
+    bench_parser = subparsers.add_parser('bench',
+            formatter_class=BloscPackCustomFormatter,
+            help='measure compression and decompression on this host')
+    bench_parser.add_argument('-S', '--size',
+                              metavar='<size>',
+                              type=reverse_pretty,
+                              default=DEFAULT_BENCH_SIZE,
+                              dest='size',
+                              help='size of the synthetic dataset\n'
+                                   'if no <in_file> is given')
+    bench_parser.add_argument('-c', '--codecs',
+                              metavar='<codecs>',
+                              type=_comma_list(
+                                  str, CNAME_AVAIL + [ADAPTIVE_CNAME]),
+                              default=DEFAULT_CNAME,
+                              dest='cnames',
+                              help='comma separated codecs')
+    bench_parser.add_argument('-l', '--clevels',
+                              metavar='<clevels>',
+                              type=_comma_list(
+                                  int, range(MIN_CLEVEL, MAX_CLEVEL + 1)),
+                              default=str(DEFAULT_CLEVEL),
+                              dest='clevels',
+                              help='comma separated compression levels')
+    bench_parser.add_argument('-z', '--chunk-sizes',
+                              metavar='<sizes>',
+                              type=_comma_list(reverse_pretty),
+                              default=DEFAULT_CHUNK_SIZE,
+                              dest='chunk_sizes',
+                              help='comma separated chunk sizes')
+    bench_parser.add_argument('-k', '--checksums',
+                              metavar='<checksums>',
+                              type=_comma_list(str, CHECKSUMS_AVAIL),
+                              default=DEFAULT_CHECKSUM,
+                              dest='checksums',
+                              help='comma separated checksums')
+    bench_parser.add_argument('-T', '--threads',
+                              metavar='<threads>',
+                              type=_comma_list(
+                                  int, range(1, blosc.BLOSC_MAX_THREADS + 1)),
+                              default=None,
+                              dest='threads',
+                              help='comma separated numbers of Blosc threads\n'
+                                   '(default: --nthreads)')
+    bench_parser.add_argument('-w', '--workers',
+                              metavar='<workers>',
+                              type=_comma_list(int),
+                              default='1',
+                              dest='workers',
+                              help='comma separated numbers of threads\n'
+                                   'working on chunks')
+    bench_parser.add_argument('-r', '--repeats',
+                              metavar='<n>',
+                              type=int,
+                              default=DEFAULT_BENCH_REPEATS,
+                              dest='repeats',
+                              help='runs per setting, the median is reported')
+    bench_parser.add_argument('-o', '--format',
+                              metavar='<format>',
+                              choices=BENCH_FORMATS,
+                              default=DEFAULT_BENCH_FORMAT,
+                              dest='format_',
+                              help='output format: %s' %
+                                   ', '.join(BENCH_FORMATS))
+    bench_parser.add_argument('-D', '--drop-caches',
+                              action='store_true',
+                              default=False,
+                              dest='drop_caches',
+                              help='drop the page cache before every run '
+                                   '(requires root)')
+    bench_parser.add_argument('in_file',
+                              metavar='<in_file>',
+                              nargs='?',
+                              type=str,
+                              default=None,
+                              help="file to benchmark with")
+
+    verify_parser = subparsers.add_parser('verify',
+            formatter_class=BloscPackCustomFormatter,
+            help='check the integrity of a compressed file')
+    verify_parser.add_argument('-D', '--decompress',
+                               action='store_true',
+                               default=False,
+                               dest='decompress',
+                               help='also decompress every chunk, '
+                                    'without writing it')
+    verify_parser.add_argument('-w', '--workers',
+                               metavar='<n>',
+                               type=int,
+                               default=None,
+                               dest='workers',
+                               help='number of threads checking chunks\n'
+                                    '(default: --nthreads)')
+    verify_parser.add_argument('file_',
+                               metavar='<file>',
+                               type=str,
+                               help="file to verify")
     return parser
 
 
@@ -431,6 +680,9 @@ def main():
     parser = create_parser()
     log.set_prefix(parser.prog)
     args = parser.parse_args()
+    if args.subcommand in ('decompress', 'd') and args.out_file == STDIO:
+        # keep stdout for the data
+        log.set_stream(sys.stderr)
     if args.verbose:
         log.LEVEL = log.VERBOSE
     elif args.debug:
@@ -440,6 +692,8 @@ def main():
     for arg, val in sorted(vars(args).items()):
         log.debug('    %s: %s' % (arg, str(val)))
     process_nthread_arg(args)
+    if args.trace:
+        enable_tracing(args.trace)
 
     # compression and decompression handled via subparsers
     if args.subcommand in ['compress', 'c']:
@@ -451,16 +705,33 @@ def main():
             log.error(str(fnf))
         metadata = process_metadata_args(args)
         bloscpack_args = BloscpackArgs(offsets=args.offsets,
-                                       checksum=args.checksum)
+                                       checksum=args.checksum,
+                                       trailer=args.trailer,
+                                       dedup=args.dedup,
+                                       sparse=args.sparse)
+        stats = _verbose_stats()
         try:
-            pack_file_to_file(in_file, out_file,
-                              chunk_size=args.chunk_size,
-                              metadata=metadata,
-                              blosc_args=blosc_args,
-                              bloscpack_args=bloscpack_args,
-                              metadata_args=MetadataArgs())
+            if in_file == STDIO:
+                pack_stream_to_file(_binary(sys.stdin), out_file,
+                                    chunk_size=args.chunk_size,
+                                    metadata=metadata,
+                                    blosc_args=blosc_args,
+                                    bloscpack_args=bloscpack_args,
+                                    metadata_args=MetadataArgs(),
+                                    stats=stats)
+            else:
+                pack_file_to_file(in_file, out_file,
+                                  chunk_size=args.chunk_size,
+                                  metadata=metadata,
+                                  blosc_args=blosc_args,
+                                  bloscpack_args=bloscpack_args,
+                                  metadata_args=MetadataArgs(),
+                                  prefetch=args.prefetch,
+                                  stats=stats)
         except ChunkingException as ce:
             log.error(str(ce))
+        if stats is not None:
+            log.verbose(stats.summary())
     elif args.subcommand in ['decompress', 'd']:
         log.verbose('getting ready for decompression')
         in_file, out_file = process_decompression_args(args)
@@ -468,8 +739,17 @@ def main():
             check_files(in_file, out_file, args)
         except FileNotFound as fnf:
             log.error(str(fnf))
+        stats = _verbose_stats()
         try:
-            metadata = unpack_file_from_file(in_file, out_file)
+            if out_file == STDIO:
+                metadata = unpack_stream_from_file(in_file,
+                                                   _binary(sys.stdout),
+                                                   stats=stats)
+            else:
+                metadata = unpack_file_from_file(in_file, out_file,
+                                                 stats=stats)
+            if stats is not None:
+                log.verbose(stats.summary())
             if metadata:
                 log_metadata(metadata)
         except FormatVersionMismatch as fvm:
@@ -506,26 +786,101 @@ def main():
             log.error(str(fnf))
         try:
             with open(args.file_, 'rb') as fp:
-                bloscpack_header, metadata, metadata_header, offsets = \
-                    _read_beginning(fp)
-                checksum_impl = bloscpack_header.checksum_impl
-                # get the header of the first chunk
-                _, blosc_header, _ = _read_compressed_chunk_fp(
-                    fp, checksum_impl)
+                source = CompressedFPSource(fp)
+                bloscpack_header = source.bloscpack_header
+                # only the offsets that are shown
+                offsets = source.read_offsets(5)
+                metadata = source.metadata
+                metadata_header = source.metadata_header
+                # get the header of the first chunk that is stored
+                blosc_header = None
+                stored = source.offsets[source.offsets != ZERO_CHUNK_OFFSET] \
+                    if bloscpack_header.sparse else [fp.tell()]
+                if len(stored):
+                    fp.seek(stored[0])
+                    _, blosc_header, _ = _read_compressed_chunk_fp(
+                        fp, source.checksum_impl)
         except ValueError as ve:
             log.error(str(ve) + "\n" +
                       "This might not be a bloscpack compressed file.")
         log.normal(bloscpack_header.pformat())
-        if offsets:
+        if len(offsets):
             log.normal("'offsets':")
-            log.normal("[%s,...]" % (",".join(str(o) for o in offsets[:5])))
+            log.normal("[%s,...]" % (",".join(str(o) for o in offsets)))
         if metadata is not None:
             log_metadata(metadata)
             log.normal(metadata_header.pformat())
-        log.normal("First chunk blosc header:")
-        log.normal(str(blosc_header))
-        log.normal("First chunk blosc flags: ")
-        log.normal(str(decode_blosc_flags(blosc_header['flags'])))
+        if blosc_header is None:
+            log.normal("All chunks consist of zeros")
+        else:
+            log.normal("First chunk blosc header:")
+            log.normal(str(blosc_header))
+            log.normal("First chunk blosc flags: ")
+            log.normal(str(decode_blosc_flags(blosc_header['flags'])))
+    elif args.subcommand == 'tune':
+        if not path.exists(args.in_file):
+            log.error("input file '%s' does not exist!" % args.in_file)
+        blosc_args, chunk_size = autotune(args.in_file,
+                                          typesize=args.typesize,
+                                          target=args.target,
+                                          sample_size=args.sample_size)
+        log.normal(blosc_args.pformat())
+        log.normal('chunk_size: %s' % double_pretty_size(chunk_size))
+        log.normal('compress with: %s compress --codec %s --clevel %d%s%s '
+                   '--chunk-size %d' %
+                   (parser.prog, blosc_args.cname, blosc_args.clevel,
+                    '' if blosc_args.shuffle else ' --no-shuffle',
+                    '' if blosc_args.typesize == DEFAULT_TYPESIZE
+                    else ' --typesize %d' % blosc_args.typesize,
+                    chunk_size))
+    elif args.subcommand == 'bench':
+        if args.in_file is not None and not path.exists(args.in_file):
+            log.error("input file '%s' does not exist!" % args.in_file)
+        try:
+            results = bench(args.in_file,
+                            size=args.size,
+                            cnames=args.cnames,
+                            clevels=args.clevels,
+                            chunk_sizes=args.chunk_sizes,
+                            checksums=args.checksums,
+                            nthreads=args.threads,
+                            workers=args.workers,
+                            repeats=args.repeats,
+                            drop_caches=args.drop_caches)
+        except (ValueError, RuntimeError) as e:
+            log.error(str(e))
+        print(format_results(results, args.format_))
+    elif args.subcommand == 'verify':
+        if not path.exists(args.file_):
+            log.error("file '%s' does not exist!" % args.file_)
+        stats = _verbose_stats()
+        try:
+            verify_file(args.file_,
+                        decompress=args.decompress,
+                        workers=args.workers or args.nthreads,
+                        stats=stats)
+        except (ChecksumMismatch, CorruptedChunk) as e:
+            log.error("'%s' is corrupted: %s" % (args.file_, e))
+        except (FormatVersionMismatch, ValueError) as e:
+            log.error(str(e) + "\n" +
+                      "This might not be a bloscpack compressed file.")
+        if stats is not None:
+            log.verbose(stats.summary())
+    elif args.subcommand == 'index':
+        try:
+            if not path.exists(args.file_):
+                raise FileNotFound("file '%s' does not exist!" %
+                                   args.file_)
+        except FileNotFound as fnf:
+            log.error(str(fnf))
+        try:
+            if args.rewrite:
+                add_offsets(args.file_)
+            else:
+                write_index(args.file_)
+        except ValueError as ve:
+            log.error(str(ve) + "\n" +
+                      "This might not be a bloscpack compressed file.")
     else:  # pragma: no cover
         # in Python 3 subcommands are not mandatory by default
         parser.print_usage()
@@ -15,14 +15,32 @@ FORMAT_VERSION = 3
 MAGIC = b'blpk'
 EXTENSION = '.blp'
 
+# sidecar index
+INDEX_MAGIC = b'blpi'
+INDEX_EXTENSION = '.idx'
+INDEX_FORMAT_VERSION = 1
+
+# trailer, for files written in a single forward pass
+TRAILER_MAGIC = b'blpt'
+TRAILER_FORMAT_VERSION = 1
+
+# offset of a chunk of zeros which is not stored, see the 'sparse' option
+ZERO_CHUNK_OFFSET = -2
+
 # header lengths
 BLOSC_HEADER_LENGTH = 16
 BLOSCPACK_HEADER_LENGTH = 32
 METADATA_HEADER_LENGTH = 32
+INDEX_HEADER_LENGTH = 24
+TRAILER_LENGTH = 32
+
+# offsets are stored as little-endian int64
+OFFSETS_DTYPE = '<i8'
 
 # maximum/minimum values
 MAX_FORMAT_VERSION = 255
 MAX_CHUNKS = (2**63)-1
+MAX_POSITION = (2**63)-1  # int64 max val, for byte positions in a file
 MAX_META_SIZE = (2**32-1)  # uint32 max val
 MIN_CLEVEL = 0
 MAX_CLEVEL = 9
@@ -44,3 +62,7 @@ CNAME_MAPPING = {
     3: 'zlib',
     4: 'zstd',
 }
+# flag of the blosc header, set if the chunk was stored as a plain copy
+BLOSC_MEMCPYED = 0x2
+# pseudo codec, to pick a codec for each chunk
+ADAPTIVE_CNAME = 'adaptive'
@@ -12,9 +12,34 @@ DEFAULT_CNAME = 'blosclz'
 DEFAULT_OFFSETS = True
 DEFAULT_CHECKSUM = 'adler32'
 DEFAULT_MAX_APP_CHUNKS = lambda x: 10 * x
+DEFAULT_TRAILER = False
+DEFAULT_DEDUP = False
+DEFAULT_SPARSE = False
 
 DEFAULT_CHUNK_SIZE = '1M'
 
+# autotune settings
+DEFAULT_TUNE_TARGET = 'balanced'
+DEFAULT_TUNE_CLEVELS = (1, 5, 9)
+DEFAULT_TUNE_CHUNK_SIZES = ('256K', '1M', '4M', '16M')
+DEFAULT_TUNE_SAMPLE_SIZE = '2M'
+
+# benchmark settings
+DEFAULT_BENCH_SIZE = '64M'
+DEFAULT_BENCH_REPEATS = 3
+DEFAULT_BENCH_FORMAT = 'table'
+
+# adaptive codec settings
+DEFAULT_ADAPTIVE_CODECS = (('lz4', 5), ('zstd', 5))
+DEFAULT_ADAPTIVE_MIN_RATIO = 1.1
+DEFAULT_ADAPTIVE_MIN_GAIN = 0.05
+DEFAULT_ADAPTIVE_ESCALATE = (1.5, 12.0)
+
+# i/o settings
+DEFAULT_PREFETCH = 0
+DEFAULT_CACHE_SIZE = '256M'
+DEFAULT_HEADER_CACHE_SIZE = 1024
+
 # metadata args
 DEFAULT_MAGIC_FORMAT = b'JSON'
 DEFAULT_META_CHECKSUM = 'adler32'
@@ -31,6 +31,10 @@ class ChecksumMismatch(RuntimeError):
     pass
 
 
+class CorruptedChunk(RuntimeError):
+    pass
+
+
 class FormatVersionMismatch(RuntimeError):
     pass
 
@@ -43,6 +47,14 @@ class NoMetadataFound(RuntimeError):
     pass
 
 
+class NoOffsetsFound(RuntimeError):
+    pass
+
+
+class IndexMismatch(RuntimeError):
+    pass
+
+
 class NoChangeInMetadata(RuntimeError):
     pass
 
@@ -5,15 +5,25 @@
 
 from __future__ import division
 
+import collections
+import copy
 import itertools
+import mmap
+import os
 import os.path as path
+import threading
 
 import blosc
+import numpy
 import six
-from six.moves import xrange
+from six.moves import queue, xrange
 from deprecated import deprecated
 
 
+from .cache import (get_header_cache,
+                    invalidate_header_cache,
+                    stat_identity,
+                    )
 from .args import (calculate_nchunks,
                    _check_metadata_arguments,
                    )
@@ -22,10 +32,15 @@ from .abstract_io import (pack,
                           )
 from .metacodecs import (CODECS_LOOKUP,
                          )
+from .trace import (get_tracer,
+                    )
 from .constants import (METADATA_HEADER_LENGTH,
                         BLOSCPACK_HEADER_LENGTH,
                         BLOSC_HEADER_LENGTH,
                         FORMAT_VERSION,
+                        OFFSETS_DTYPE,
+                        TRAILER_LENGTH,
+                        ZERO_CHUNK_OFFSET,
                         )
 from .compat_util import (StringIO,
                           )
@@ -33,22 +48,29 @@ from .checksums import (CHECKSUMS_AVAIL,
                         CHECKSUMS_LOOKUP,
                         )
 from .defaults import (DEFAULT_CHUNK_SIZE,
+                       DEFAULT_PREFETCH,
                        )
 from .exceptions import (MetadataSectionTooSmall,
                          FormatVersionMismatch,
                          ChecksumMismatch,
                          )
 from .headers import (decode_blosc_header,
+                      decode_blosc_sizes,
                       BloscpackHeader,
                       MetadataHeader,
-                      decode_int64,
+                      decode_trailer,
+                      encode_trailer,
                       encode_int64,
+                      check_range,
                       )
 from .pretty import (double_pretty_size,
                      pretty_size,
+                     reverse_pretty,
                      )
 from .serializers import (SERIALIZERS_LOOKUP,
                           )
+from .tune import (_auto_blosc_args,
+                   )
 from .abstract_io import (PlainSource,
                           PlainSink,
                           CompressedSource,
@@ -198,11 +220,59 @@ def _read_metadata(input_fp):
     The 'input_fp' should point to the position where the metadata starts. The
     number of bytes to read will be determined from the metadata header.
 
+    """
+    metadata_header = _read_metadata_header(input_fp)
+    return _read_metadata_body(input_fp, metadata_header), metadata_header
+
+
+def _read_metadata_header(input_fp):
+    """ Read the metadata header from a file pointer.
+
+    Parameters
+    ----------
+    input_fp : file like
+        a file pointer to read from
+
+    Returns
+    -------
+    metadata_header : MetadataHeader
+        the decoded metadata header
+
     """
     raw_metadata_header = input_fp.read(METADATA_HEADER_LENGTH)
     log.debug("raw metadata header: %s" % repr(raw_metadata_header))
     metadata_header = MetadataHeader.decode(raw_metadata_header)
     log.debug(metadata_header.pformat())
+    return metadata_header
+
+
+def _metadata_section_length(metadata_header):
+    """ The length of the metadata section following the metadata header. """
+    return metadata_header.max_meta_size + \
+        CHECKSUMS_LOOKUP[metadata_header.meta_checksum].size
+
+
+def _read_metadata_body(input_fp, metadata_header):
+    """ Read, check and deserialize the metadata following its header.
+
+    Parameters
+    ----------
+    input_fp : file like
+        a file pointer to read from
+    metadata_header : MetadataHeader
+        the metadata header
+
+    Returns
+    -------
+    metadata : object
+        the metadata
+
+    Notes
+    -----
+    The 'input_fp' should point to the position right after the metadata
+    header.
+
+    """
     metadata = input_fp.read(metadata_header.meta_comp_size)
     prealloc = metadata_header.max_meta_size - metadata_header.meta_comp_size
     input_fp.seek(prealloc, 1)
@@ -230,8 +300,7 @@ def _read_metadata(input_fp):
     serializer_impl = SERIALIZERS_LOOKUP[metadata_header.magic_format]
     if six.PY3 and isinstance(metadata, bytes):
         metadata = metadata.decode()
-    metadata = serializer_impl.loads(metadata)
-    return metadata, metadata_header
+    return serializer_impl.loads(metadata)
 
 
 def _read_offsets(input_fp, bloscpack_header):
@@ -244,25 +313,114 @@ def _read_offsets(input_fp, bloscpack_header):
 
     Returns
     -------
-    offsets : list of int
+    offsets : ndarray of int64
         the offsets
 
     Notes
     -----
     The 'input_fp' should point to the position where the offsets start. Any
-    unused offsets will not be returned.
+    unused offsets will not be read, but skipped such that 'input_fp' points
+    to the first chunk afterwards. The offsets are decoded in bulk and are
+    read-only.
 
     """
     if bloscpack_header.offsets:
-        total_entries = bloscpack_header.total_prospective_chunks
-        offsets_raw = input_fp.read(8 * total_entries)
-        log.debug('Read raw offsets: %s' % repr(offsets_raw))
-        offsets = [decode_int64(offsets_raw[j - 8:j]) for j in
-                   xrange(8, bloscpack_header.nchunks * 8 + 1, 8)]
-        log.debug('Offsets: %s' % offsets)
+        offsets_raw = input_fp.read(8 * bloscpack_header.nchunks)
+        # skip the entries reserved for appending
+        input_fp.seek(8 * bloscpack_header.max_app_chunks, 1)
+        offsets = numpy.frombuffer(offsets_raw, dtype=OFFSETS_DTYPE)
+        if log.LEVEL == log.DEBUG:
+            log.debug('Read raw offsets: %s' % repr(offsets_raw))
+            log.debug('Offsets: %s' % offsets.tolist())
         return offsets
     else:
-        return []
+        return numpy.empty(0, dtype=OFFSETS_DTYPE)
+
+
+def _read_at(input_fp, position, read, *args):
+    """ Call 'read' on 'input_fp' at 'position', restore the position after.
+    """
+    current = input_fp.tell()
+    input_fp.seek(position)
+    try:
+        return read(input_fp, *args)
+    finally:
+        input_fp.seek(current)
+
+
+def _read_trailer(input_fp, bloscpack_header):
+    """ Read the trailer of a file with the 'trailer' option.
+
+    Parameters
+    ----------
+    input_fp : file like
+        a seekable file pointer to read from
+    bloscpack_header : BloscpackHeader
+        the bloscpack header, 'nchunks' and 'last_chunk' are set from the
+        trailer
+
+    Returns
+    -------
+    offsets_position : int
+        the position of the offsets
+
+    Notes
+    -----
+    The position of 'input_fp' is left as is.
+
+    """
+    def read(input_fp):
+        input_fp.seek(-TRAILER_LENGTH, 2)
+        return input_fp.read(TRAILER_LENGTH), input_fp.tell()
+    raw_trailer, file_size = _read_at(input_fp, 0, read)
+    log.debug('raw_trailer: %s' % repr(raw_trailer))
+    bloscpack_header.nchunks, bloscpack_header.last_chunk, offsets_position = \
+        decode_trailer(raw_trailer, file_size)
+    log.debug("trailer: nchunks: '%d', last_chunk: '%d', offsets at: '%d'" %
+              (bloscpack_header.nchunks, bloscpack_header.last_chunk,
+               offsets_position))
+    return offsets_position
+
+
+def _skip_beginning(input_fp):
+    """ Read the headers, but skip the metadata and the offsets.
+
+    Parameters
+    ----------
+    input_fp : file like
+        input file pointer
+
+    Returns
+    -------
+    bloscpack_header : BloscpackHeader
+    metadata_header : MetadataHeader or None
+    metadata_position : int or None
+        the position of the metadata, right after the metadata header
+    offsets_position : int
+        the position of the offsets
+
+    Notes
+    -----
+    Afterwards 'input_fp' points to the first chunk, as with
+    '_read_beginning'. For files with the 'trailer' option, the trailer is read
+    too.
+
+    """
+    bloscpack_header = _read_bloscpack_header(input_fp)
+    metadata_header, metadata_position = None, None
+    if bloscpack_header.metadata:
+        metadata_header = _read_metadata_header(input_fp)
+        metadata_position = input_fp.tell()
+        input_fp.seek(_metadata_section_length(metadata_header), 1)
+    if bloscpack_header.trailer:
+        offsets_position = _read_trailer(input_fp, bloscpack_header)
+    else:
+        offsets_position = input_fp.tell()
+        if bloscpack_header.offsets:
+            input_fp.seek(8 * (bloscpack_header.nchunks +
+                               bloscpack_header.max_app_chunks), 1)
+    return bloscpack_header, metadata_header, metadata_position, \
+        offsets_position
 
 
 def _read_beginning(input_fp):
@@ -278,28 +436,67 @@ def _read_beginning(input_fp):
     bloscpack_header : dict
     metadata : object
     metadata_header : dict
-    offsets : list of ints
+    offsets : ndarray of int64
+
+    Notes
+    -----
+    If the process-wide header cache is enabled, see 'enable_header_cache',
+    and 'input_fp' is a real file positioned at its start, the parsed
+    beginning is looked up in and added to the cache.
+
+    For files with the 'trailer' option, the counts and the offsets are read
+    from the end of the file, while 'input_fp' is left pointing to the first
+    chunk, as usual.
 
     """
+    header_cache = get_header_cache()
+    identity = stat_identity(input_fp) \
+        if header_cache is not None and input_fp.tell() == 0 else None
+    if identity is not None:
+        cached = header_cache.get(identity)
+        if cached is not None:
+            beginning, position = cached
+            input_fp.seek(position)
+            log.debug("using cached header for: '%s'" % repr(identity))
+            return beginning
     bloscpack_header = _read_bloscpack_header(input_fp)
     metadata, metadata_header = _read_metadata(input_fp) \
             if bloscpack_header.metadata\
             else (None, None)
-    offsets = _read_offsets(input_fp, bloscpack_header)
-    return bloscpack_header, metadata, metadata_header, offsets
+    if bloscpack_header.trailer:
+        offsets = _read_at(input_fp,
+                           _read_trailer(input_fp, bloscpack_header),
+                           _read_offsets, bloscpack_header)
+    else:
+        offsets = _read_offsets(input_fp, bloscpack_header)
+    beginning = bloscpack_header, metadata, metadata_header, offsets
+    if identity is not None:
+        # cache copies, the caller may modify what is returned
+        header_cache.put(identity,
+                         ((bloscpack_header.copy(),
+                           copy.deepcopy(metadata),
+                           metadata_header.copy()
+                           if metadata_header is not None else None,
+                           offsets),
+                          input_fp.tell()))
+    return beginning
 
 
 def _write_offsets(output_fp, offsets):
-    log.debug("Writing '%d' offsets: '%s'" %
-              (len(offsets), repr(offsets)))
     # write the offsets encoded into the reserved space in the file
-    encoded_offsets = b"".join([encode_int64(i) for i in offsets])
-    log.debug("Raw offsets: %s" % repr(encoded_offsets))
+    encoded_offsets = numpy.asarray(offsets, dtype=OFFSETS_DTYPE).tobytes()
+    if log.LEVEL == log.DEBUG:
+        log.debug("Writing '%d' offsets: '%s'" %
+                  (len(offsets), repr(list(map(int, offsets)))))
+        log.debug("Raw offsets: %s" % repr(encoded_offsets))
     output_fp.write(encoded_offsets)
 
 
-def _read_compressed_chunk_fp(input_fp, checksum_impl):
-    """ Read a compressed chunk from a file pointer.
+def _read_chunk_fp(input_fp, checksum_impl):
+    """ Read a compressed chunk and its digest from a file pointer.
+
+    Like '_read_compressed_chunk_fp', but only the sizes are decoded from the
+    blosc header, which is all that is needed to read chunk after chunk.
 
     Parameters
     ----------
@@ -312,17 +509,15 @@ def _read_compressed_chunk_fp(input_fp, checksum_impl):
     -------
     compressed : str
         the compressed data
-    blosc_header : dict
-        the blosc header from the chunk
     digest : str
         the checksum of the chunk
     """
     # read blosc header
     blosc_header_raw = input_fp.read(BLOSC_HEADER_LENGTH)
-    blosc_header = decode_blosc_header(blosc_header_raw)
     if log.LEVEL == log.DEBUG:
-        log.debug('blosc_header: %s' % repr(blosc_header))
-    ctbytes = blosc_header['ctbytes']
+        log.debug('blosc_header: %s' %
+                  repr(decode_blosc_header(blosc_header_raw)))
+    ctbytes = decode_blosc_sizes(blosc_header_raw)[1]
     # Seek back BLOSC_HEADER_LENGTH bytes in file relative to current
     # position. Blosc needs the header too and presumably this is
     # better than to read the whole buffer and then concatenate it...
@@ -331,7 +526,30 @@ def _read_compressed_chunk_fp(input_fp, checksum_impl):
     compressed = input_fp.read(ctbytes)
     digest = input_fp.read(checksum_impl.size) \
         if checksum_impl.size > 0 else None
-    return compressed, blosc_header, digest
+    return compressed, digest
+
+
+def _read_compressed_chunk_fp(input_fp, checksum_impl):
+    """ Read a compressed chunk from a file pointer.
+
+    Parameters
+    ----------
+    input_fp : file like
+        the file pointer to read the chunk from
+    checksum_impl : Checksum
+        the checksum that has been used
+
+    Returns
+    -------
+    compressed : str
+        the compressed data
+    blosc_header : dict
+        the blosc header from the chunk
+    digest : str
+        the checksum of the chunk
+    """
+    compressed, digest = _read_chunk_fp(input_fp, checksum_impl)
+    return compressed, decode_blosc_header(compressed), digest
 
 
 def _write_compressed_chunk(output_fp, compressed, digest):
@@ -340,33 +558,502 @@ def _write_compressed_chunk(output_fp, compressed, digest):
         output_fp.write(digest)
 
 
+def _chunk_sizes(chunk_size, last_chunk, nchunks):
+    """ Generate the size of each chunk, without building a list. """
+    # if nchunks == 1 the last_chunk_size is the size of the single chunk
+    return itertools.chain(itertools.repeat(chunk_size, nchunks - 1),
+                           (last_chunk,))
+
+
+def _compress_chunk_buffer(chunk, blosc_args):
+    """ Compress a uint8 ndarray chunk without copying it. """
+    nbytes = chunk.nbytes
+    typesize = blosc_args['typesize']
+    if nbytes % typesize == 0:
+        return blosc.compress_ptr(chunk.__array_interface__['data'][0],
+                                  nbytes // typesize, **blosc_args)
+    else:
+        # a trailing partial item can only be handled via the buffer protocol
+        return blosc.compress(chunk, **blosc_args)
+
+
+def _readinto_full(input_fp, view):
+    """ Fill a buffer from a file pointer, short only at end of file. """
+    total = input_fp.readinto(view) or 0
+    while total < len(view):
+        num_read = input_fp.readinto(view[total:])
+        if not num_read:
+            break
+        total += num_read
+    return total
+
+
 class PlainFPSource(PlainSource):
 
     def __init__(self, input_fp):
         self.input_fp = input_fp
 
     def __iter__(self):
-        # if nchunks == 1 the last_chunk_size is the size of the single chunk
-        for num_bytes in ([self.chunk_size] *
-                          (self.nchunks - 1) +
-                          [self.last_chunk]):
+        for num_bytes in _chunk_sizes(self.chunk_size,
+                                      self.last_chunk,
+                                      self.nchunks):
             yield self.input_fp.read(num_bytes)
 
 
+class PlainFPBufferSource(PlainSource):
+    """ Read chunks into recycled buffers and compress them in place.
+
+    Chunks are read with 'readinto' into chunk sized uint8 ndarrays which are
+    handed to 'blosc.compress_ptr' directly and taken back once 'pack'
+    releases them. The pool grows to the number of chunks in use at any one
+    time, after that no memory is allocated per chunk except for the
+    compressed output.
+
+    Parameters
+    ----------
+    input_fp : file like
+        the file pointer to read from, must support 'readinto'
+
+    """
+
+    def __init__(self, input_fp):
+        self.input_fp = input_fp
+        self._free = collections.deque()
+
+    @property
+    def compress_func(self):
+        return _compress_chunk_buffer
+
+    def _acquire(self):
+        try:
+            return self._free.pop()
+        except IndexError:
+            return numpy.empty(self.chunk_size, dtype=numpy.uint8)
+
+    def release(self, chunk):
+        self._free.append(chunk if chunk.base is None else chunk.base)
+
+    def _read_chunks(self):
+        for num_bytes in _chunk_sizes(self.chunk_size,
+                                      self.last_chunk,
+                                      self.nchunks):
+            buffer_ = self._acquire()
+            view = buffer_ if num_bytes == len(buffer_) \
+                else buffer_[:num_bytes]
+            num_read = _readinto_full(self.input_fp, view)
+            yield view if num_read == num_bytes else view[:num_read]
+
+    def __iter__(self):
+        return self._read_chunks()
+
+
+class PlainFPPrefetchSource(PlainFPBufferSource):
+    """ Read ahead up to 'prefetch' chunks on a background thread.
+
+    Like 'PlainFPBufferSource', but reading from the file overlaps with
+    compression.
+
+    Parameters
+    ----------
+    input_fp : file like
+        the file pointer to read from, must support 'readinto'
+    prefetch : int
+        the maximum number of chunks read but not yet consumed
+
+    """
+
+    _done = object()
+
+    def __init__(self, input_fp, prefetch=2):
+        check_range('prefetch', prefetch, 1, 2**16)
+        super(PlainFPPrefetchSource, self).__init__(input_fp)
+        self.prefetch = prefetch
+
+    def _read_ahead(self, queue_, stop):
+        try:
+            chunks = self._read_chunks()
+            tracer = get_tracer()
+            if tracer is not None:
+                # reading happens here rather than when the chunk is taken
+                chunks = tracer.timed(chunks, 'prefetch')
+            for chunk in chunks:
+                if stop.is_set():
+                    return
+                queue_.put(chunk)
+            queue_.put(self._done)
+        except BaseException as e:
+            queue_.put(e)
+
+    def __iter__(self):
+        queue_ = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+        reader = threading.Thread(target=self._read_ahead,
+                                  args=(queue_, stop))
+        reader.daemon = True
+        reader.start()
+        try:
+            while True:
+                chunk = queue_.get()
+                if chunk is self._done:
+                    break
+                elif isinstance(chunk, BaseException):
+                    raise chunk
+                yield chunk
+        finally:
+            # unblock and wait for the reader, in case we stopped early
+            stop.set()
+            while reader.is_alive():
+                try:
+                    queue_.get(timeout=0.01)
+                except queue.Empty:
+                    pass
+            reader.join()
+
+
+class PlainStreamSource(PlainSource):
+    """ Cut a stream or an iterable of bytes of unknown length into chunks.
+
+    The input is read as it is consumed and cut into 'chunk_size' chunks, so
+    that pipes, sockets and generators can be compressed without knowing
+    their length up front. Once the iteration is exhausted 'nchunks' and
+    'last_chunk' hold the actual values.
+
+    Parameters
+    ----------
+    input_ : file like or iterable of bytes
+        a readable stream, or any iterable of bytes like objects of any size
+
+    Notes
+    -----
+    To be used with 'pack' with 'nchunks' and 'last_chunk' set to '-1'. Like
+    with inputs of known length, empty input results in a single empty chunk.
+
+    """
+
+    def __init__(self, input_):
+        self.input_ = input_
+
+    def _pieces(self):
+        if hasattr(self.input_, 'read'):
+            # a short read doesn't mean the end of a pipe, only b'' does
+            return iter(lambda: self.input_.read(self.chunk_size), b'')
+        else:
+            return iter(self.input_)
+
+    def __iter__(self):
+        self.nchunks, self.last_chunk = 0, 0
+        buffer_ = bytearray()
+        for piece in self._pieces():
+            buffer_ += piece
+            while len(buffer_) >= self.chunk_size:
+                chunk = bytes(buffer_[:self.chunk_size])
+                del buffer_[:self.chunk_size]
+                self.nchunks += 1
+                self.last_chunk = len(chunk)
+                yield chunk
+        if len(buffer_) > 0 or self.nchunks == 0:
+            self.nchunks += 1
+            self.last_chunk = len(buffer_)
+            yield bytes(buffer_)
+        log.verbose("read '%d' chunks from stream, last chunk: %s" %
+                    (self.nchunks, double_pretty_size(self.last_chunk)))
+
+
+def _madvise(map_, option, start=0, length=None):
+    """ Call 'madvise' if both the platform and the Python version allow. """
+    option = getattr(mmap, option, None)
+    if option is not None and hasattr(map_, 'madvise'):
+        if length is None:
+            map_.madvise(option)
+        elif length > 0:
+            map_.madvise(option, start, length)
+
+
+def _close_map(map_):
+    """ Close a memory map, unless slices of it are still in use.
+
+    Returns
+    -------
+    closed : bool
+        False if the map is left to be closed once the last slice is gone
+
+    """
+    try:
+        map_.close()
+        return True
+    except BufferError:
+        log.debug('memory map still in use, closing it once released')
+        return False
+
+
+class PlainMmapSource(PlainSource):
+    """ Compress chunks directly from a memory mapped input file.
+
+    The address of each chunk in the map is handed to 'blosc.compress_ptr',
+    so no data is copied into user space. The kernel is advised that access is
+    sequential and pages of chunks which 'pack' has released are dropped,
+    which keeps the resident set size flat.
+
+    Parameters
+    ----------
+    input_fp : file like
+        the file pointer to map, must be a real file
+
+    Notes
+    -----
+    Use as a context manager, or call 'close', to unmap the file.
+
+    """
+
+    def __init__(self, input_fp):
+        self.input_fp = input_fp
+        if os.fstat(input_fp.fileno()).st_size == 0:
+            # can not map an empty file
+            self.map_ = None
+            self.array = numpy.empty(0, dtype=numpy.uint8)
+        else:
+            self.map_ = mmap.mmap(input_fp.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+            _madvise(self.map_, 'MADV_SEQUENTIAL')
+            self.array = numpy.frombuffer(self.map_, dtype=numpy.uint8)
+        self.base_ptr = self.array.__array_interface__['data'][0]
+        self.released = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.map_ is not None:
+            # the array exports the map, which can't be closed while it lives
+            self.array = numpy.empty(0, dtype=numpy.uint8)
+            _close_map(self.map_)
+            self.map_ = None
+
+    @property
+    def compress_func(self):
+        return _compress_chunk_buffer
+
+    def release(self, chunk):
+        if self.map_ is None:
+            return
+        end = chunk.__array_interface__['data'][0] - self.base_ptr + \
+            chunk.nbytes
+        # only whole pages which have been consumed entirely
+        end -= end % mmap.PAGESIZE
+        if end > self.released:
+            _madvise(self.map_, 'MADV_DONTNEED',
+                     self.released, end - self.released)
+            self.released = end
+
+    def __iter__(self):
+        offset = 0
+        for num_bytes in _chunk_sizes(self.chunk_size,
+                                      self.last_chunk,
+                                      self.nchunks):
+            if self.map_ is not None and offset + num_bytes < len(self.array):
+                # ask the kernel to start reading the next chunk
+                start = offset + num_bytes
+                start -= start % mmap.PAGESIZE
+                _madvise(self.map_, 'MADV_WILLNEED', start,
+                         min(self.chunk_size, len(self.array) - start))
+            yield self.array[offset:offset + num_bytes]
+            offset += num_bytes
+
+
+_NOT_READ = object()
+
+
 class CompressedFPSource(CompressedSource):
+    """ Read compressed chunks from a file pointer.
+
+    Only the headers are read up front, the metadata and the offsets are read
+    when first accessed, such that callers pay only for what they use.
+
+    Parameters
+    ----------
+    input_fp : file like
+        the file pointer to read from, must be seekable to access the metadata
+        or the offsets after the chunks have been read
+
+    Notes
+    -----
+    If the process-wide header cache is enabled, everything is read up front
+    via '_read_beginning' instead, since the cache makes that cheap.
+
+    """
 
     def __init__(self, input_fp):
 
         self.input_fp = input_fp
-        self.bloscpack_header, self.metadata, self.metadata_header, \
-                self.offsets = _read_beginning(input_fp)
+        if get_header_cache() is not None:
+            self.bloscpack_header, self._metadata, self.metadata_header, \
+                self._offsets = _read_beginning(input_fp)
+            self._metadata_position = self._offsets_position = None
+        else:
+            self.bloscpack_header, self.metadata_header, \
+                self._metadata_position, self._offsets_position = \
+                _skip_beginning(input_fp)
+            self._metadata = _NOT_READ \
+                if self.bloscpack_header.metadata else None
+            self._offsets = _NOT_READ
+        self.first_chunk = input_fp.tell()
         self.checksum_impl = self.bloscpack_header.checksum_impl
         self.nchunks = self.bloscpack_header.nchunks
+        self.chunk_size = self.bloscpack_header.chunk_size
+        self.last_chunk = self.bloscpack_header.last_chunk
+
+    def _read_at(self, position, read, *args):
+        # read from elsewhere in the file, but leave 'input_fp' untouched
+        return _read_at(self.input_fp, position, read, *args)
+
+    @property
+    def metadata(self):
+        if self._metadata is _NOT_READ:
+            self._metadata = self._read_at(self._metadata_position,
+                                           _read_metadata_body,
+                                           self.metadata_header)
+        return self._metadata
+
+    @property
+    def offsets(self):
+        if self._offsets is _NOT_READ:
+            self._offsets = self._read_at(self._offsets_position,
+                                          _read_offsets,
+                                          self.bloscpack_header)
+        return self._offsets
+
+    def read_offsets(self, count=None):
+        """ Read only the first offsets.
+
+        Parameters
+        ----------
+        count : int or None
+            the number of offsets to read, None for all of them
+
+        Returns
+        -------
+        offsets : ndarray of int64
+            the offsets, empty if the file has none
+
+        """
+        if self._offsets is not _NOT_READ or count is None:
+            return self.offsets[:count]
+        header = self.bloscpack_header.copy()
+        header.nchunks = min(count, header.nchunks)
+        return self._read_at(self._offsets_position, _read_offsets, header)
+
+    def __iter__(self):
+        if self.nchunks == -1:
+            # unknown number of chunks, read until the end of the file
+            chunks = itertools.takewhile(lambda _: self._more(),
+                                         itertools.count())
+        else:
+            chunks = xrange(self.nchunks)
+        # chunks may be shared or omitted, follow the offsets
+        offsets = self.offsets if self.bloscpack_header.dedup or \
+            self.bloscpack_header.sparse else None
+        for i in chunks:
+            if offsets is not None:
+                if offsets[i] == ZERO_CHUNK_OFFSET:
+                    yield None, None
+                    continue
+                self.input_fp.seek(offsets[i])
+            yield _read_chunk_fp(self.input_fp, self.checksum_impl)
+
+    def _more(self):
+        if self.input_fp.read(1):
+            self.input_fp.seek(-1, 1)
+            return True
+        return False
+
+
+class CompressedMmapSource(CompressedFPSource):
+    """ Read compressed chunks from a memory mapped file.
+
+    Chunks and digests are yielded as memoryview slices of the map, located
+    via the offsets if present, so that reading from the page cache costs
+    neither system calls nor copies.
+
+    Parameters
+    ----------
+    input_fp : file like
+        the file pointer to map, must be a real file
+
+    Notes
+    -----
+    Use as a context manager, or call 'close', to unmap the file.
+
+    """
+
+    def __init__(self, input_fp):
+        super(CompressedMmapSource, self).__init__(input_fp)
+        self.map_ = mmap.mmap(input_fp.fileno(), 0, access=mmap.ACCESS_READ)
+        _madvise(self.map_, 'MADV_SEQUENTIAL')
+        self.view = memoryview(self.map_)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.map_ is not None:
+            self.view.release()
+            _close_map(self.map_)
+            self.map_ = None
 
     def __iter__(self):
-        for i in xrange(self.nchunks):
-            compressed, header, digest = _read_compressed_chunk_fp(self.input_fp, self.checksum_impl)
-            yield compressed, digest
+        digest_size = self.checksum_impl.size
+        position = self.first_chunk
+        # with an unknown number of chunks, read until the end of the map
+        chunks = xrange(self.nchunks) if self.nchunks != -1 else \
+            itertools.takewhile(lambda _: position < len(self.view),
+                                itertools.count())
+        for i in chunks:
+            if self.nchunks != -1 and len(self.offsets):
+                position = self.offsets[i]
+                if position == ZERO_CHUNK_OFFSET:
+                    yield None, None
+                    continue
+            ctbytes = decode_blosc_sizes(self.view[position:position +
+                                                   BLOSC_HEADER_LENGTH])[1]
+            end = position + ctbytes
+            digest = self.view[end:end + digest_size] \
+                if digest_size > 0 else None
+            yield self.view[position:end], digest
+            position = end + digest_size
+
+
+def _skip_zeros(output_fp, nbytes):
+    """ Skip over zeros, such that they become a hole in a sparse file.
+
+    If the file is not seekable, e.g. a pipe, the zeros are written.
+
+    """
+    if output_fp.seekable():
+        output_fp.seek(nbytes, 1)
+    else:
+        output_fp.write(b'\x00' * nbytes)
+    return nbytes
+
+
+def _close_hole(output_fp):
+    """ Extend the file up to the current position, if it ends in a hole.
+    """
+    if not output_fp.seekable():
+        return
+    position = output_fp.tell()
+    output_fp.seek(0, 2)
+    if output_fp.tell() < position:
+        # writing the last byte makes the file system allocate the hole
+        output_fp.seek(position - 1)
+        output_fp.write(b'\x00')
+    else:
+        output_fp.seek(position)
 
 
 class PlainFPSink(PlainSink):
@@ -374,55 +1061,271 @@ class PlainFPSink(PlainSink):
     def __init__(self, output_fp, nchunks=None):
         self.output_fp = output_fp
         self.nchunks = nchunks
+        self.holes = False
 
     def put(self, compressed):
-        decompressed = blosc.decompress(compressed)
+        return self.write(None, blosc.decompress(compressed))
+
+    def decompress(self, i, compressed):
+        return blosc.decompress(compressed)
+
+    def write(self, i, decompressed):
         self.output_fp.write(decompressed)
         return len(decompressed)
 
+    def put_zeros(self, i, nbytes):
+        self.holes = True
+        return _skip_zeros(self.output_fp, nbytes)
+
+    def finalize(self):
+        if self.holes:
+            _close_hole(self.output_fp)
+
+
+class PlainFPBufferSink(PlainSink):
+    """ Decompress chunks into reusable buffers and write them out.
+
+    Parameters
+    ----------
+    output_fp : file like
+        the file pointer to write to
+
+    Notes
+    -----
+    A buffer is handed back for reuse once its chunk has been written, such
+    that there are only as many buffers as chunks in flight, a single one when
+    chunks are decompressed in order.
+
+    Chunks of zeros which were not stored are skipped over, such that they
+    become holes in a sparse output file.
+
+    """
+
+    def __init__(self, output_fp, nchunks=None):
+        self.output_fp = output_fp
+        self.nchunks = nchunks
+        # the buffers not in use, 'list.pop' and 'list.append' are atomic
+        self.buffers = []
+        self.holes = False
+
+    def put(self, compressed):
+        return self.write(None, self.decompress(None, compressed))
+
+    def decompress(self, i, compressed):
+        nbytes = decode_blosc_sizes(compressed)[0]
+        try:
+            buffer_ = self.buffers.pop()
+        except IndexError:
+            buffer_ = numpy.empty(nbytes, dtype=numpy.uint8)
+        if nbytes > len(buffer_):
+            buffer_ = numpy.empty(nbytes, dtype=numpy.uint8)
+        bwritten = blosc.decompress_ptr(
+            compressed, buffer_.__array_interface__['data'][0])
+        return buffer_, bwritten
+
+    def write(self, i, decompressed):
+        buffer_, bwritten = decompressed
+        self.output_fp.write(buffer_ if bwritten == len(buffer_)
+                             else buffer_[:bwritten])
+        self.buffers.append(buffer_)
+        return bwritten
+
+    def put_zeros(self, i, nbytes):
+        self.holes = True
+        return _skip_zeros(self.output_fp, nbytes)
+
+    def finalize(self):
+        if self.holes:
+            _close_hole(self.output_fp)
+
+
+class PlainMmapSink(PlainSink):
+    """ Decompress directly into a memory mapped output file.
+
+    The output file is extended to its final size up front and every chunk
+    is decompressed straight to its position in the map, so that no
+    intermediate buffer is needed and chunks may be decompressed in parallel.
+
+    Parameters
+    ----------
+    output_fp : file like
+        the file pointer to write to, must be a real file opened for reading
+        and writing
+
+    Notes
+    -----
+    The total size of the output must be known, i.e. 'nchunks' must not be
+    '-1'.
+
+    """
+
+    def __init__(self, output_fp):
+        self.output_fp = output_fp
+        self.map_ = None
+
+    def configure(self, chunk_size, last_chunk, nchunks):
+        super(PlainMmapSink, self).configure(chunk_size, last_chunk, nchunks)
+        if nchunks < 0:
+            raise ValueError('can not memory map output of unknown size')
+        self.size = chunk_size * (nchunks - 1) + last_chunk
+        self.output_fp.truncate(self.size)
+        self.ptr = 0
+        if self.size > 0:
+            self.map_ = mmap.mmap(self.output_fp.fileno(), self.size,
+                                  access=mmap.ACCESS_WRITE)
+            self.base_ptr = numpy.frombuffer(
+                self.map_, dtype=numpy.uint8).__array_interface__['data'][0]
+
+    def _check_fits(self, offset, compressed):
+        if offset + decode_blosc_sizes(compressed)[0] > self.size:
+            raise ValueError('chunk does not fit into the output file')
+
+    def put(self, compressed):
+        return self.write(None, self.decompress(None, compressed))
+
+    def decompress(self, i, compressed):
+        offset = self.ptr if i is None else i * self.chunk_size
+        self._check_fits(offset, compressed)
+        return blosc.decompress_ptr(compressed, self.base_ptr + offset) \
+            if self.map_ is not None else 0
+
+    def write(self, i, bwritten):
+        self.ptr += bwritten
+        return bwritten
+
+    def put_zeros(self, i, nbytes):
+        # the file was extended with zeros up front
+        self.ptr += nbytes
+        return nbytes
+
+    def finalize(self):
+        if self.map_ is not None:
+            self.map_.flush()
+            self.map_.close()
+            self.map_ = None
+        self.output_fp.seek(self.ptr)
+
 
 class CompressedFPSink(CompressedSink):
+    """ Write compressed chunks to a file pointer.
+
+    Parameters
+    ----------
+    output_fp : file like
+        the file pointer to write to, need not be seekable with the 'trailer'
+        option
+
+    Notes
+    -----
+    The position is tracked while writing, rather than asked for, such that
+    with the 'trailer' option the file is written in a single forward pass.
+
+    """
 
     def __init__(self, output_fp):
         self.output_fp = output_fp
         self.meta_total = 0
+        self.position = output_fp.tell() if output_fp.seekable() else 0
 
     def write_bloscpack_header(self):
         raw_bloscpack_header = self.bloscpack_header.encode()
         self.output_fp.write(raw_bloscpack_header)
+        self.position += len(raw_bloscpack_header)
+        self.written_bloscpack_header = self.bloscpack_header.copy()
+
+    def _patch_bloscpack_header(self):
+        # e.g. 'nchunks' and 'last_chunk' of an input of unknown length, with
+        # the 'trailer' option they stay '-1' in the header
+        if self.trailer or \
+                self.bloscpack_header == self.written_bloscpack_header:
+            return
+        if not self.output_fp.seekable():
+            log.verbose("output is not seekable, leaving header as is")
+            return
+        end = self.output_fp.tell()
+        self.output_fp.seek(0)
+        self.output_fp.write(self.bloscpack_header.encode())
+        self.output_fp.seek(end)
+        self.written_bloscpack_header = self.bloscpack_header.copy()
 
     def write_metadata(self, metadata, metadata_args):
-        self.meta_total += _write_metadata(self.output_fp,
-                                           metadata,
-                                           metadata_args)
+        metadata_total = _write_metadata(self.output_fp,
+                                         metadata,
+                                         metadata_args)
+        self.meta_total += metadata_total
+        self.position += metadata_total
 
     def init_offsets(self):
-        if self.offsets:
+        if self.trailer:
+            # collected while writing, the number of chunks may be unknown
+            self.offset_storage = []
+        elif self.offsets:
             total_entries = self.bloscpack_header.total_prospective_chunks
-            self.offset_storage = list(itertools.repeat(-1,
-                                       self.bloscpack_header.nchunks))
+            self.offset_storage = numpy.full(self.bloscpack_header.nchunks,
+                                             -1, dtype=OFFSETS_DTYPE)
             self.output_fp.write(encode_int64(-1) * total_entries)
+            self.position += 8 * total_entries
+
+    def _write_trailer(self):
+        offsets_position = self.position
+        _write_offsets(self.output_fp, self.offset_storage)
+        raw_trailer = encode_trailer(self.bloscpack_header.nchunks,
+                                     self.bloscpack_header.last_chunk,
+                                     offsets_position)
+        log.debug('raw_trailer: %s' % repr(raw_trailer))
+        self.output_fp.write(raw_trailer)
+        self.position += 8 * len(self.offset_storage) + len(raw_trailer)
 
     def finalize(self):
-        if self.offsets:
-            self.output_fp.seek(BLOSCPACK_HEADER_LENGTH + self.meta_total, 0)
-            _write_offsets(self.output_fp, self.offset_storage)
-
-    def put(self, i, compressed):
-        offset = self.output_fp.tell()
-        digest = self.do_checksum(compressed)
+        if self.trailer:
+            self._write_trailer()
+        else:
+            self._patch_bloscpack_header()
+            if self.offsets:
+                self.output_fp.seek(BLOSCPACK_HEADER_LENGTH + self.meta_total,
+                                    0)
+                _write_offsets(self.output_fp, self.offset_storage)
+        invalidate_header_cache(self.output_fp)
+
+    def put(self, i, compressed, digest=None):
+        offset = self.position
+        if digest is None:
+            digest = self.do_checksum(compressed)
         _write_compressed_chunk(self.output_fp, compressed, digest)
-        if self.offsets:
+        self.position += len(compressed) + len(digest)
+        if self.trailer:
+            self.offset_storage.append(offset)
+        elif self.offsets:
             self.offset_storage[i] = offset
         return offset, compressed, digest
 
+    def put_duplicate(self, i, original):
+        offset = self.offset_storage[original]
+        if self.trailer:
+            self.offset_storage.append(offset)
+        else:
+            self.offset_storage[i] = offset
+        return offset
+
+    def put_zeros(self, i):
+        if self.trailer:
+            self.offset_storage.append(ZERO_CHUNK_OFFSET)
+        else:
+            self.offset_storage[i] = ZERO_CHUNK_OFFSET
+        return ZERO_CHUNK_OFFSET
+
 
 def pack_file_to_file(in_file, out_file,
                       chunk_size=DEFAULT_CHUNK_SIZE,
                       metadata=None,
                       blosc_args=None,
                       bloscpack_args=None,
-                      metadata_args=None):
+                      metadata_args=None,
+                      workers=1,
+                      max_inflight=None,
+                      prefetch=DEFAULT_PREFETCH,
+                      use_mmap=False,
+                      stats=None):
     """ Compress a file to a file.
 
     Parameters
@@ -435,12 +1338,24 @@ def pack_file_to_file(in_file, out_file,
         the desired chunk size in bytes
     metadata : dict
         the metadata dict
-    blosc_args : BloscArgs
-        blosc args
+    blosc_args : BloscArgs or 'auto'
+        blosc args, 'auto' to pick them for the input with 'autotune'
     bloscpack_args : BloscpackArgs
         bloscpack args
     metadata_args : MetadataArgs
         metadata args
+    workers : int
+        the number of threads used to compress chunks
+    max_inflight : int
+        the maximum number of chunks being compressed at any one time
+    prefetch : int
+        if larger than zero, read up to this many chunks ahead on a
+        background thread
+    use_mmap : bool
+        compress directly from the memory mapped input file, 'prefetch' is
+        ignored in this case
+    stats : Stats
+        if given, filled in with the timings and sizes
 
     Raises
     ------
@@ -456,15 +1371,29 @@ def pack_file_to_file(in_file, out_file,
     # calculate chunk sizes
     nchunks, chunk_size, last_chunk_size = \
             calculate_nchunks(in_file_size, chunk_size)
+    blosc_args = _auto_blosc_args(blosc_args, in_file, chunk_size)
     with open(in_file, 'rb') as input_fp, open(out_file, 'wb') as output_fp:
-        source = PlainFPSource(input_fp)
+        if use_mmap:
+            source = PlainMmapSource(input_fp)
+        elif prefetch > 0:
+            log.verbose('reading up to %d chunks ahead' % prefetch)
+            source = PlainFPPrefetchSource(input_fp, prefetch=prefetch)
+        else:
+            source = PlainFPBufferSource(input_fp)
         sink = CompressedFPSink(output_fp)
-        pack(source, sink,
-                nchunks, chunk_size, last_chunk_size,
-                metadata=metadata,
-                blosc_args=blosc_args,
-                bloscpack_args=bloscpack_args,
-                metadata_args=metadata_args)
+        try:
+            pack(source, sink,
+                    nchunks, chunk_size, last_chunk_size,
+                    metadata=metadata,
+                    blosc_args=blosc_args,
+                    bloscpack_args=bloscpack_args,
+                    metadata_args=metadata_args,
+                    workers=workers,
+                    max_inflight=max_inflight,
+                    stats=stats)
+        finally:
+            if use_mmap:
+                source.close()
     out_file_size = path.getsize(out_file)
     log.verbose('output file size: %s' % double_pretty_size(out_file_size))
     log.verbose('compression ratio: %f' % (in_file_size/out_file_size))
@@ -475,7 +1404,8 @@ pack_file = deprecated(pack_file_to_file,
                        reason="Use 'pack_file_to_file' instead")
 
 
-def unpack_file_from_file(in_file, out_file):
+def unpack_file_from_file(in_file, out_file, workers=1, max_inflight=None,
+                          use_mmap=False, stats=None):
     """ Uncompress a file from a file.
 
     Parameters
@@ -484,6 +1414,14 @@ def unpack_file_from_file(in_file, out_file):
         the name of the input file
     out_file : str
         the name of the output file
+    workers : int
+        the number of threads used to decompress chunks
+    max_inflight : int
+        the maximum number of chunks being decompressed at any one time
+    use_mmap : bool
+        memory map both the input and the output file
+    stats : Stats
+        if given, filled in with the timings and sizes
 
     Returns
     -------
@@ -500,14 +1438,25 @@ def unpack_file_from_file(in_file, out_file):
     """
     in_file_size = path.getsize(in_file)
     log.verbose('input file size: %s' % pretty_size(in_file_size))
-    with open(in_file, 'rb') as input_fp, open(out_file, 'wb') as output_fp:
-        source = CompressedFPSource(input_fp)
-        sink = PlainFPSink(output_fp, source.nchunks)
-        unpack(source, sink)
+    with open(in_file, 'rb') as input_fp, \
+            open(out_file, 'w+b' if use_mmap else 'wb') as output_fp:
+        if use_mmap:
+            source = CompressedMmapSource(input_fp)
+            sink = PlainMmapSink(output_fp)
+        else:
+            source = CompressedFPSource(input_fp)
+            sink = PlainFPBufferSink(output_fp, source.nchunks)
+        try:
+            metadata = source.metadata
+            unpack(source, sink, workers=workers, max_inflight=max_inflight,
+                   stats=stats)
+        finally:
+            if use_mmap:
+                source.close()
     out_file_size = path.getsize(out_file)
     log.verbose('output file size: %s' % pretty_size(out_file_size))
     log.verbose('decompression ratio: %f' % (out_file_size / in_file_size))
-    return source.metadata
+    return metadata
 
 
 unpack_file = deprecated(unpack_file_from_file,
@@ -515,12 +1464,117 @@ unpack_file = deprecated(unpack_file_from_file,
                          reason="Use 'unpack_file_from_file' instead")
 
 
+def pack_stream_to_file(input_, out_file,
+                        chunk_size=DEFAULT_CHUNK_SIZE,
+                        metadata=None,
+                        blosc_args=None,
+                        bloscpack_args=None,
+                        metadata_args=None,
+                        workers=1,
+                        max_inflight=None,
+                        stats=None):
+    """ Compress a stream or an iterable of bytes of unknown length to a file.
+
+    Parameters
+    ----------
+    input_ : file like or iterable of bytes
+        a readable stream such as 'sys.stdin.buffer', a pipe or a socket
+        file, or any iterable of bytes like objects
+    out_file : str
+        the name of the output file
+    chunk_size : int
+        the desired chunk size in bytes
+    metadata : dict
+        the metadata dict
+    blosc_args : BloscArgs
+        blosc args
+    bloscpack_args : BloscpackArgs
+        bloscpack args
+    metadata_args : MetadataArgs
+        metadata args
+    workers : int
+        the number of threads used to compress chunks
+    max_inflight : int
+        the maximum number of chunks being compressed at any one time
+    stats : Stats
+        if given, filled in with the timings and sizes
+
+    Notes
+    -----
+    Since the space for the offsets can not be reserved up front, the offsets,
+    the number of chunks and the size of the last chunk are written to a
+    trailer, i.e. the 'trailer' option is switched on. Only with the offsets,
+    deduplication and sparse chunks all off, the counts are patched into the
+    header at the end instead.
+
+    """
+    if isinstance(chunk_size, six.string_types):
+        chunk_size = reverse_pretty(chunk_size)
+    check_range('chunk_size', chunk_size, 1, blosc.BLOSC_MAX_BUFFERSIZE)
+    with open(out_file, 'wb') as output_fp:
+        source = PlainStreamSource(input_)
+        sink = CompressedFPSink(output_fp)
+        pack(source, sink,
+             -1, chunk_size, -1,
+             metadata=metadata,
+             blosc_args=blosc_args,
+             bloscpack_args=bloscpack_args,
+             metadata_args=metadata_args,
+             workers=workers,
+             max_inflight=max_inflight,
+             stats=stats)
+    out_file_size = path.getsize(out_file)
+    log.verbose('output file size: %s' % double_pretty_size(out_file_size))
+
+
+def unpack_stream_from_file(in_file, output_fp, workers=1,
+                            max_inflight=None, stats=None):
+    """ Uncompress a file to a stream.
+
+    Parameters
+    ----------
+    in_file : str
+        the name of the input file
+    output_fp : file like
+        a writable stream such as 'sys.stdout.buffer' or a pipe, need not be
+        seekable
+    workers : int
+        the number of threads used to decompress chunks
+    max_inflight : int
+        the maximum number of chunks being decompressed at any one time
+    stats : Stats
+        if given, filled in with the timings and sizes
+
+    Returns
+    -------
+    metadata : bytes
+        the metadata contained in the file if present
+
+    Raises
+    ------
+
+    FormatVersionMismatch
+        if the file has an unmatching format version number
+    ChecksumMismatch
+        if any of the chunks fail to produce the correct checksum
+    """
+    with open(in_file, 'rb') as input_fp:
+        source = CompressedFPSource(input_fp)
+        sink = PlainFPBufferSink(output_fp, source.nchunks)
+        metadata = source.metadata
+        unpack(source, sink, workers=workers, max_inflight=max_inflight,
+               stats=stats)
+    output_fp.flush()
+    return metadata
+
+
 def pack_bytes_to_file(bytes_, out_file,
                        chunk_size=DEFAULT_CHUNK_SIZE,
                        metadata=None,
                        blosc_args=None,
                        bloscpack_args=None,
-                       metadata_args=None):
+                       metadata_args=None,
+                       stats=None):
     """ Compress bytes to file.
 
     Parameters
@@ -533,12 +1587,14 @@ def pack_bytes_to_file(bytes_, out_file,
         the desired chunk size in bytes
     metadata : dict
         the metadata dict
-    blosc_args : BloscArgs
-        blosc args
+    blosc_args : BloscArgs or 'auto'
+        blosc args, 'auto' to pick them for the input with 'autotune'
     bloscpack_args : BloscpackArgs
         bloscpack args
     metadata_args : MetadataArgs
         metadata args
+    stats : Stats
+        if given, filled in with the timings and sizes
 
     Raises
     ------
@@ -551,6 +1607,7 @@ def pack_bytes_to_file(bytes_, out_file,
     # calculate chunk sizes
     nchunks, chunk_size, last_chunk_size = \
             calculate_nchunks(bytes_size, chunk_size)
+    blosc_args = _auto_blosc_args(blosc_args, bytes_, chunk_size)
     with open(out_file, 'wb') as output_fp:
         source = PlainFPSource(StringIO(bytes_))
         sink = CompressedFPSink(output_fp)
@@ -559,7 +1616,8 @@ def pack_bytes_to_file(bytes_, out_file,
              metadata=metadata,
              blosc_args=blosc_args,
              bloscpack_args=bloscpack_args,
-             metadata_args=metadata_args)
+             metadata_args=metadata_args,
+             stats=stats)
     out_file_size = path.getsize(out_file)
     log.verbose('output file size: %s' % double_pretty_size(out_file_size))
     log.verbose('compression ratio: %f' % (bytes_size/out_file_size))
@@ -570,13 +1628,15 @@ pack_bytes_file = deprecated(pack_bytes_to_file,
                              reason="Use 'pack_bytes_to_file' instead")
 
 
-def unpack_bytes_from_file(compressed_file):
+def unpack_bytes_from_file(compressed_file, stats=None):
     """ Uncompress bytes from a file.
 
     Parameters
     ----------
     compressed_file : str
         the name of the input file
+    stats : Stats
+        if given, filled in with the timings and sizes
 
     Returns
     -------
@@ -597,7 +1657,7 @@ def unpack_bytes_from_file(compressed_file):
     sink = PlainFPSink(sio)
     with open(compressed_file, 'rb') as fp:
         source = CompressedFPSource(fp)
-        unpack(source, sink)
+        unpack(source, sink, stats=stats)
         return sio.getvalue(), source.metadata
 
 
@@ -612,6 +1672,7 @@ def pack_bytes_to_bytes(bytes_,
                         blosc_args=None,
                         bloscpack_args=None,
                         metadata_args=None,
+                        stats=None,
                         ):
 
     """ Compress bytes to bytes_
@@ -626,12 +1687,14 @@ def pack_bytes_to_bytes(bytes_,
         the desired chunk size in bytes
     metadata : dict
         the metadata dict
-    blosc_args : BloscArgs
-        blosc args
+    blosc_args : BloscArgs or 'auto'
+        blosc args, 'auto' to pick them for the input with 'autotune'
     bloscpack_args : BloscpackArgs
         bloscpack args
     metadata_args : MetadataArgs
         metadata args
+    stats : Stats
+        if given, filled in with the timings and sizes
 
     Returns
     -------
@@ -648,6 +1711,7 @@ def pack_bytes_to_bytes(bytes_,
     log.verbose('input bytes size: %s' % double_pretty_size(bytes_size))
     nchunks, chunk_size, last_chunk_size = \
             calculate_nchunks(bytes_size, chunk_size)
+    blosc_args = _auto_blosc_args(blosc_args, bytes_, chunk_size)
     source = PlainFPSource(StringIO(bytes_))
     sio = StringIO()
     sink = CompressedFPSink(sio)
@@ -656,20 +1720,23 @@ def pack_bytes_to_bytes(bytes_,
          metadata=metadata,
          blosc_args=blosc_args,
          bloscpack_args=bloscpack_args,
-         metadata_args=metadata_args)
+         metadata_args=metadata_args,
+         stats=stats)
     out_bytes_size = sio.tell()
     log.verbose('output bytes size: %s' % double_pretty_size(out_bytes_size))
     log.verbose('compression ratio: %f' % (bytes_size/out_bytes_size))
     return sio.getvalue()
 
 
-def unpack_bytes_from_bytes(bytes_):
+def unpack_bytes_from_bytes(bytes_, stats=None):
     """ Uncompress bytes from bytes
 
     Parameters
     ----------
     bytes_: bytes
         input bytes
+    stats : Stats
+        if given, filled in with the timings and sizes
 
     Returns
     -------
@@ -689,5 +1756,32 @@ def unpack_bytes_from_bytes(bytes_):
     source = CompressedFPSource(StringIO(bytes_))
     sio = StringIO()
     sink = PlainFPSink(sio)
-    unpack(source, sink)
+    unpack(source, sink, stats=stats)
     return sio.getvalue(), source.metadata
+
+
+def peek_file(filename):
+    """ Read the headers and the metadata of a file, but nothing else.
+
+    Neither the offsets nor any of the chunks are read, which makes this cheap
+    even for large files.
+
+    Parameters
+    ----------
+    filename : str
+        the name of the file to peek into
+
+    Returns
+    -------
+    bloscpack_header : BloscpackHeader
+        the bloscpack header
+    metadata : object
+        the metadata, None if the file has no metadata
+    metadata_header : MetadataHeader
+        the metadata header, None if the file has no metadata
+
+    """
+    with open(filename, 'rb') as input_fp:
+        source = CompressedFPSource(input_fp)
+        return source.bloscpack_header, source.metadata, \
+            source.metadata_header
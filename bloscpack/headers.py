@@ -24,21 +24,38 @@ from .constants import (MAGIC,
                         FORMAT_VERSION,
                         MAX_FORMAT_VERSION,
                         MAX_CHUNKS,
+                        MAX_POSITION,
                         MAX_CLEVEL,
                         BLOSCPACK_HEADER_LENGTH,
                         MAX_META_SIZE,
                         CNAME_MAPPING,
+                        TRAILER_MAGIC,
+                        TRAILER_FORMAT_VERSION,
+                        TRAILER_LENGTH,
                         )
 from .defaults import (DEFAULT_OFFSETS,
                        )
 from .metacodecs import (CODECS_AVAIL,
                          check_valid_codec,
                          )
-from .util import (memoryview,
-                   )
 from . import log
 
 
+# precompiled codecs for the fixed size headers, all little-endian
+BLOSCPACK_HEADER_STRUCT = struct.Struct('<4sBBBBiiqq')
+METADATA_HEADER_STRUCT = struct.Struct('<8sBBBBIII8s')
+BLOSC_HEADER_STRUCT = struct.Struct('<BBBBIII')
+TRAILER_STRUCT = struct.Struct('<4sB3xi4xqq')
+BLOSC_HEADER_FIELDS = ('version',
+                       'versionlz',
+                       'flags',
+                       'typesize',
+                       'nbytes',
+                       'blocksize',
+                       'ctbytes',
+                       )
+
+
 def check_range(name, value, min_, max_):
     """ Check that a variable is in range. """
     if not isinstance(value, integer_types):
@@ -57,19 +74,6 @@ def _check_str(name, value, max_len):
                          (name, max_len, len(value)))
 
 
-def _pad_with_nulls(data, len_):
-    """ Pad string with null bytes.
-
-    Parameters
-    ----------
-    data : str/bytes
-        the string/bytes to pad
-    len_ : int
-        the final desired length
-    """
-    return data + (b'\x00' * (len_ - len(data)))
-
-
 def check_options(options):
     """ Check the options bitfield.
 
@@ -149,16 +153,20 @@ def encode_int64(eightbyte):
     return struct.pack('<q', eightbyte)
 
 
-def create_options(offsets=DEFAULT_OFFSETS, metadata=False):
+def create_options(offsets=DEFAULT_OFFSETS, metadata=False, trailer=False,
+                   dedup=False, sparse=False):
     """ Create the options bitfield.
 
     Parameters
     ----------
     offsets : bool
     metadata : bool
+    trailer : bool
+    dedup : bool
+    sparse : bool
     """
     return "".join([str(int(i)) for i in
-        [False, False, False, False, False, False, metadata, offsets]])
+        [False, False, False, sparse, dedup, trailer, metadata, offsets]])
 
 
 def decode_options(options):
@@ -175,9 +183,12 @@ def decode_options(options):
     """
 
     check_options(options)
-    check_options_zero(options, range(6))
+    check_options_zero(options, range(3))
     return {'offsets': bool(int(options[7])),
             'metadata': bool(int(options[6])),
+            'trailer': bool(int(options[5])),
+            'dedup': bool(int(options[4])),
+            'sparse': bool(int(options[3])),
             }
 
 
@@ -211,14 +222,26 @@ def decode_blosc_header(buffer_):
     format.
 
     """
-    buffer_ = memoryview(buffer_)
-    return OrderedDict((('version', decode_uint8(buffer_[0])),
-                        ('versionlz', decode_uint8(buffer_[1])),
-                        ('flags', decode_uint8(buffer_[2])),
-                        ('typesize', decode_uint8(buffer_[3])),
-                        ('nbytes', decode_uint32(buffer_[4:8])),
-                        ('blocksize', decode_uint32(buffer_[8:12])),
-                        ('ctbytes', decode_uint32(buffer_[12:16]))))
+    return OrderedDict(zip(BLOSC_HEADER_FIELDS,
+                           BLOSC_HEADER_STRUCT.unpack_from(buffer_)))
+
+
+def decode_blosc_sizes(buffer_):
+    """ Decode only 'nbytes' and 'ctbytes' from a compressed Blosc buffer.
+
+    Parameters
+    ----------
+    buffer_ : bytes like
+        the compressed buffer, or at least its header
+
+    Returns
+    -------
+    nbytes, ctbytes : tuple of int
+        the uncompressed and the compressed size
+
+    """
+    _, _, _, _, nbytes, _, ctbytes = BLOSC_HEADER_STRUCT.unpack_from(buffer_)
+    return nbytes, ctbytes
 
 
 def decode_blosc_flags(byte_):
@@ -230,6 +253,76 @@ def decode_blosc_flags(byte_):
                         ))
 
 
+def encode_trailer(nchunks, last_chunk, offsets_position):
+    """ Encode the trailer of a file with the 'trailer' option.
+
+    Parameters
+    ----------
+    nchunks : int
+        the number of chunks
+    last_chunk : int
+        the size of the last chunk
+    offsets_position : int
+        the position of the offsets, which precede the trailer
+
+    Returns
+    -------
+    raw_trailer : bytes
+        the trailer, 'TRAILER_LENGTH' bytes
+
+    Notes
+    -----
+    The trailer consists of the magic string 'blpt', the format version as a
+    single byte, three reserved bytes, 'last_chunk' as int32, four reserved
+    bytes and 'nchunks' and 'offsets_position' as int64, all little-endian.
+
+    """
+    return TRAILER_STRUCT.pack(TRAILER_MAGIC, TRAILER_FORMAT_VERSION,
+                               last_chunk, nchunks, offsets_position)
+
+
+def decode_trailer(buffer_, file_size=None):
+    """ Decode the trailer of a file with the 'trailer' option.
+
+    Parameters
+    ----------
+    buffer_ : bytes
+        the last 'TRAILER_LENGTH' bytes of the file
+    file_size : int or None
+        if given, the size of the file, the offsets must precede the trailer
+
+    Returns
+    -------
+    nchunks, last_chunk, offsets_position : tuple of int
+        see 'encode_trailer'
+
+    Raises
+    ------
+    ValueError
+        if the buffer is not a valid trailer
+
+    """
+    if len(buffer_) != TRAILER_LENGTH:
+        raise ValueError(
+            "attempting to decode a trailer of length '%d', not '%d'" %
+            (len(buffer_), TRAILER_LENGTH))
+    magic, format_version, last_chunk, nchunks, offsets_position = \
+        TRAILER_STRUCT.unpack(buffer_)
+    if magic != TRAILER_MAGIC:
+        raise ValueError(
+            "the magic marker %r is missing from the trailer, " %
+            TRAILER_MAGIC + "instead we found: %r" % magic)
+    if format_version != TRAILER_FORMAT_VERSION:
+        raise ValueError("trailer format version is '%d', expected '%d'" %
+                         (format_version, TRAILER_FORMAT_VERSION))
+    check_range('nchunks', nchunks, 0, MAX_CHUNKS)
+    check_range('last_chunk', last_chunk, 0, blosc.BLOSC_MAX_BUFFERSIZE)
+    check_range('offsets_position', offsets_position, 0,
+                MAX_POSITION if file_size is None
+                else file_size - TRAILER_LENGTH)
+    return nchunks, last_chunk, offsets_position
+
+
 class BloscpackHeader(MutableMappingObject):
     """ The Bloscpack header.
 
@@ -253,6 +346,14 @@ class BloscpackHeader(MutableMappingObject):
         the number of chunks
     max_app_chunks : int
         the total number of possible append chunks
+    trailer : bool
+        if the offsets and the chunk counts are in a trailer at the end of the
+        file, see 'encode_trailer'
+    dedup : bool
+        if chunks may be shared by several offsets, such that the chunks must
+        be located via the offsets
+    sparse : bool
+        if chunks of zeros may be omitted, their offset is 'ZERO_CHUNK_OFFSET'
 
     Notes
     -----
@@ -265,6 +366,25 @@ class BloscpackHeader(MutableMappingObject):
     TypeError
         if any of the arguments have the wrong type
     """
+    __slots__ = ('format_version',
+                 'offsets',
+                 'metadata',
+                 'checksum',
+                 'typesize',
+                 'chunk_size',
+                 'last_chunk',
+                 'nchunks',
+                 'max_app_chunks',
+                 'trailer',
+                 'dedup',
+                 'sparse',
+                 )
+
+    _attrs = __slots__
+    _bytes_attrs = ('chunk_size',
+                    'last_chunk',
+                    )
+
     def __init__(self,
                  format_version=FORMAT_VERSION,
                  offsets=False,
@@ -274,11 +394,31 @@ class BloscpackHeader(MutableMappingObject):
                  chunk_size=-1,
                  last_chunk=-1,
                  nchunks=-1,
-                 max_app_chunks=0):
+                 max_app_chunks=0,
+                 trailer=False,
+                 dedup=False,
+                 sparse=False):
 
         check_range('format_version', format_version, 0, MAX_FORMAT_VERSION)
         check_valid_checksum(checksum)
         check_range('typesize',   typesize,    0, blosc.BLOSC_MAX_TYPESIZE)
+        self._check_sizes(chunk_size, last_chunk, nchunks, max_app_chunks)
+
+        self.format_version  = format_version
+        self.offsets         = offsets
+        self.metadata        = metadata
+        self.checksum        = checksum
+        self.typesize        = typesize
+        self.chunk_size      = chunk_size
+        self.last_chunk      = last_chunk
+        self.nchunks         = nchunks
+        self.max_app_chunks  = max_app_chunks
+        self.trailer         = trailer
+        self.dedup           = dedup
+        self.sparse          = sparse
+
+    @staticmethod
+    def _check_sizes(chunk_size, last_chunk, nchunks, max_app_chunks):
         check_range('chunk_size', chunk_size, -1, blosc.BLOSC_MAX_BUFFERSIZE)
         check_range('last_chunk', last_chunk, -1, blosc.BLOSC_MAX_BUFFERSIZE)
         check_range('nchunks',    nchunks,    -1, MAX_CHUNKS)
@@ -294,27 +434,25 @@ class BloscpackHeader(MutableMappingObject):
                 "'last_chunk' (%d) is larger than 'chunk_size' (%d)"
                 % (last_chunk, chunk_size))
 
-        self._attrs = ['format_version',
-                       'offsets',
-                       'metadata',
-                       'checksum',
-                       'typesize',
-                       'chunk_size',
-                       'last_chunk',
-                       'nchunks',
-                       'max_app_chunks']
-        self._bytes_attrs = ['chunk_size',
-                             'last_chunk']
-
-        self.format_version  = format_version
-        self.offsets         = offsets
-        self.metadata        = metadata
-        self.checksum        = checksum
-        self.typesize        = typesize
-        self.chunk_size      = chunk_size
-        self.last_chunk      = last_chunk
-        self.nchunks         = nchunks
-        self.max_app_chunks  = max_app_chunks
+    @classmethod
+    def _trusted(cls, format_version, offsets, metadata, checksum, typesize,
+                 chunk_size, last_chunk, nchunks, max_app_chunks, trailer,
+                 dedup, sparse):
+        """ Construct without validation, for values known to be valid. """
+        self = cls.__new__(cls)
+        self.format_version = format_version
+        self.offsets = offsets
+        self.metadata = metadata
+        self.checksum = checksum
+        self.typesize = typesize
+        self.chunk_size = chunk_size
+        self.last_chunk = last_chunk
+        self.nchunks = nchunks
+        self.max_app_chunks = max_app_chunks
+        self.trailer = trailer
+        self.dedup = dedup
+        self.sparse = sparse
+        return self
 
     @property
     def attributes(self):
@@ -342,21 +480,21 @@ class BloscpackHeader(MutableMappingObject):
         raw_bloscpack_header : string
             the header as string of bytes
         """
-        format_version = encode_uint8(self.format_version)
-        options = encode_uint8(int(
-            create_options(offsets=self.offsets, metadata=self.metadata),
-            2))
-        checksum = encode_uint8(CHECKSUMS_AVAIL.index(self.checksum))
-        typesize = encode_uint8(self.typesize)
-        chunk_size = encode_int32(self.chunk_size)
-        last_chunk = encode_int32(self.last_chunk)
-        nchunks = encode_int64(self.nchunks)
-        max_app_chunks = encode_int64(self.max_app_chunks)
-
-        raw_bloscpack_header = (MAGIC + format_version + options + checksum +
-                                typesize + chunk_size + last_chunk + nchunks +
-                                max_app_chunks)
-        log.debug('raw_bloscpack_header: %s' % repr(raw_bloscpack_header))
+        raw_bloscpack_header = BLOSCPACK_HEADER_STRUCT.pack(
+            MAGIC,
+            self.format_version,
+            int(self.offsets) | int(self.metadata) << 1 |
+            int(self.trailer) << 2 | int(self.dedup) << 3 |
+            int(self.sparse) << 4,
+            CHECKSUMS_AVAIL.index(self.checksum),
+            self.typesize,
+            self.chunk_size,
+            self.last_chunk,
+            self.nchunks,
+            self.max_app_chunks)
+        if log.LEVEL == log.DEBUG:
+            log.debug('raw_bloscpack_header: %s' %
+                      repr(raw_bloscpack_header))
         return raw_bloscpack_header
 
     @staticmethod
@@ -387,21 +525,51 @@ class BloscpackHeader(MutableMappingObject):
             raise ValueError(
                 "the magic marker %r is missing from the bloscpack " % MAGIC +
                 "header, instead we found: %r" % buffer_[0:4])
-        options = decode_options(decode_bitfield(buffer_[5]))
-        return BloscpackHeader(
-            format_version=decode_uint8(buffer_[4]),
-            offsets=options['offsets'],
-            metadata=options['metadata'],
-            checksum=CHECKSUMS_AVAIL[decode_uint8(buffer_[6])],
-            typesize=decode_uint8(buffer_[7]),
-            chunk_size=decode_int32(buffer_[8:12]),
-            last_chunk=decode_int32(buffer_[12:16]),
-            nchunks=decode_int64(buffer_[16:24]),
-            max_app_chunks=decode_int64(buffer_[24:32]))
+        _, format_version, options, checksum, typesize, chunk_size, \
+            last_chunk, nchunks, max_app_chunks = \
+            BLOSCPACK_HEADER_STRUCT.unpack(buffer_)
+        if options & 0b11100000:
+            raise ValueError(
+                "unknown bits set in the bloscpack header options: '%s'" %
+                decode_bitfield(options))
+        # the single byte fields are in range by construction and the
+        # checksum is valid if it can be looked up, so only check the sizes
+        checksum = CHECKSUMS_AVAIL[checksum]
+        BloscpackHeader._check_sizes(chunk_size, last_chunk, nchunks,
+                                     max_app_chunks)
+        return BloscpackHeader._trusted(format_version,
+                                        bool(options & 1),
+                                        bool(options & 2),
+                                        checksum,
+                                        typesize,
+                                        chunk_size,
+                                        last_chunk,
+                                        nchunks,
+                                        max_app_chunks,
+                                        bool(options & 4),
+                                        bool(options & 8),
+                                        bool(options & 16))
 
 
 class MetadataHeader(MutableMappingObject):
 
+    __slots__ = ('magic_format',
+                 'meta_options',
+                 'meta_checksum',
+                 'meta_codec',
+                 'meta_level',
+                 'meta_size',
+                 'max_meta_size',
+                 'meta_comp_size',
+                 'user_codec',
+                 )
+
+    _attrs = __slots__
+    _bytes_attrs = ('meta_size',
+                    'max_meta_size',
+                    'meta_comp_size',
+                    )
+
     def __init__(self,
                  magic_format=b'',
                  meta_options="00000000",
@@ -433,21 +601,22 @@ class MetadataHeader(MutableMappingObject):
         self.meta_comp_size = meta_comp_size
         self.user_codec = user_codec
 
-        self._attrs = ['magic_format',
-                       'meta_options',
-                       'meta_checksum',
-                       'meta_codec',
-                       'meta_level',
-                       'meta_size',
-                       'max_meta_size',
-                       'meta_comp_size',
-                       'user_codec',
-                       ]
-
-        self._bytes_attrs = ['meta_size',
-                             'max_meta_size',
-                             'meta_comp_size',
-                             ]
+    @classmethod
+    def _trusted(cls, magic_format, meta_options, meta_checksum, meta_codec,
+                 meta_level, meta_size, max_meta_size, meta_comp_size,
+                 user_codec):
+        """ Construct without validation, for values known to be valid. """
+        self = cls.__new__(cls)
+        self.magic_format = magic_format
+        self.meta_options = meta_options
+        self.meta_checksum = meta_checksum
+        self.meta_codec = meta_codec
+        self.meta_level = meta_level
+        self.meta_size = meta_size
+        self.max_meta_size = max_meta_size
+        self.meta_comp_size = meta_comp_size
+        self.user_codec = user_codec
+        return self
 
     @property
     def attributes(self):
@@ -458,20 +627,17 @@ class MetadataHeader(MutableMappingObject):
         return self._bytes_attrs
 
     def encode(self):
-
-        magic_format = _pad_with_nulls(self.magic_format, 8)
-        meta_options = encode_uint8(int(self.meta_options, 2))
-        meta_checksum = encode_uint8(CHECKSUMS_AVAIL.index(self.meta_checksum))
-        meta_codec = encode_uint8(CODECS_AVAIL.index(self.meta_codec))
-        meta_level = encode_uint8(self.meta_level)
-        meta_size = encode_uint32(self.meta_size)
-        max_meta_size = encode_uint32(self.max_meta_size)
-        meta_comp_size = encode_uint32(self.meta_comp_size)
-        user_codec = _pad_with_nulls(self.user_codec, 8)
-
-        return magic_format + meta_options + meta_checksum + meta_codec + \
-                meta_level + meta_size + max_meta_size + meta_comp_size + \
-                user_codec
+        # the struct pads the strings with null bytes
+        return METADATA_HEADER_STRUCT.pack(
+            self.magic_format,
+            int(self.meta_options, 2),
+            CHECKSUMS_AVAIL.index(self.meta_checksum),
+            CODECS_AVAIL.index(self.meta_codec),
+            self.meta_level,
+            self.meta_size,
+            self.max_meta_size,
+            self.meta_comp_size,
+            self.user_codec)
 
     @staticmethod
     def decode(buffer_):
@@ -479,14 +645,19 @@ class MetadataHeader(MutableMappingObject):
             raise ValueError(
                 "attempting to decode a bloscpack metadata header of length '%d', not '32'"
                 % len(buffer_))
-        decoded= {'magic_format':        decode_magic_string(buffer_[:8]),
-                  'meta_options':        decode_bitfield(buffer_[8]),
-                  'meta_checksum':       CHECKSUMS_AVAIL[decode_uint8(buffer_[9])],
-                  'meta_codec':          CODECS_AVAIL[decode_uint8(buffer_[10])],
-                  'meta_level':          decode_uint8(buffer_[11]),
-                  'meta_size':           decode_uint32(buffer_[12:16]),
-                  'max_meta_size':       decode_uint32(buffer_[16:20]),
-                  'meta_comp_size':      decode_uint32(buffer_[20:24]),
-                  'user_codec':          decode_magic_string(buffer_[24:32])
-                  }
-        return MetadataHeader(**decoded)
+        magic_format, meta_options, meta_checksum, meta_codec, meta_level, \
+            meta_size, max_meta_size, meta_comp_size, user_codec = \
+            METADATA_HEADER_STRUCT.unpack(buffer_)
+        # the sizes are in range by construction, the checksum and codec are
+        # valid if they can be looked up, only the level needs checking
+        check_range('meta_level', meta_level, 0, MAX_CLEVEL)
+        return MetadataHeader._trusted(
+            magic_format.strip(b'\x00'),
+            decode_bitfield(meta_options),
+            CHECKSUMS_AVAIL[meta_checksum],
+            CODECS_AVAIL[meta_codec],
+            meta_level,
+            meta_size,
+            max_meta_size,
+            meta_comp_size,
+            user_codec.strip(b'\x00'))
@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim :set ft=py:
+
+
+import itertools
+import os
+import os.path as path
+import shutil
+import tempfile
+
+
+import numpy
+from six.moves import xrange
+
+
+from .args import (_handle_max_apps,
+                   )
+from .constants import (BLOSC_HEADER_LENGTH,
+                        BLOSCPACK_HEADER_LENGTH,
+                        INDEX_MAGIC,
+                        INDEX_EXTENSION,
+                        INDEX_FORMAT_VERSION,
+                        INDEX_HEADER_LENGTH,
+                        OFFSETS_DTYPE,
+                        )
+from .defaults import (DEFAULT_MAX_APP_CHUNKS,
+                       )
+from .exceptions import (IndexMismatch,
+                         )
+from .file_io import (_read_beginning,
+                      _write_offsets,
+                      )
+from .headers import (decode_blosc_sizes,
+                      decode_int64,
+                      decode_uint8,
+                      encode_int64,
+                      encode_uint8,
+                      )
+from .pretty import (double_pretty_size,
+                     )
+from . import log
+
+
+def index_filename(filename):
+    """ The name of the sidecar index for a file. """
+    return filename + INDEX_EXTENSION
+
+
+def reconstruct_offsets(input_fp, bloscpack_header):
+    """ Reconstruct the offsets by walking the chunks.
+
+    Parameters
+    ----------
+    input_fp : file like
+        the file pointer, must point to the start of the first chunk
+    bloscpack_header : BloscpackHeader
+        the header of the file
+
+    Returns
+    -------
+    offsets : ndarray of int64
+        the offsets
+
+    Notes
+    -----
+    Only the 16 byte Blosc header of each chunk is read, the chunks themselves
+    are skipped. If the number of chunks is unknown, i.e. '-1', the chunks are
+    walked until the end of the file.
+
+    """
+    digest_size = bloscpack_header.checksum_impl.size
+    offset = input_fp.tell()
+    if bloscpack_header.nchunks == -1:
+        end = input_fp.seek(0, 2)
+        indices = itertools.takewhile(lambda _: offset < end,
+                                      itertools.count())
+    else:
+        indices = xrange(bloscpack_header.nchunks)
+    offsets = []
+    for i in indices:
+        offsets.append(offset)
+        input_fp.seek(offset)
+        blosc_header_raw = input_fp.read(BLOSC_HEADER_LENGTH)
+        if len(blosc_header_raw) != BLOSC_HEADER_LENGTH:
+            raise IndexMismatch("file ends prematurely at chunk: '%d'" % i)
+        offset += decode_blosc_sizes(blosc_header_raw)[1] + digest_size
+    offsets = numpy.array(offsets, dtype=OFFSETS_DTYPE)
+    log.debug("reconstructed '%d' offsets" % len(offsets))
+    return offsets
+
+
+def chunk_nbytes(input_fp, offset):
+    """ The decompressed size of the chunk at 'offset'. """
+    input_fp.seek(offset)
+    return decode_blosc_sizes(input_fp.read(BLOSC_HEADER_LENGTH))[0]
+
+
+def _file_offsets(filename):
+    """ Offsets of a file, reconstructed if necessary, and its size. """
+    with open(filename, 'rb') as fp:
+        bloscpack_header, _, _, offsets = _read_beginning(fp)
+        if len(offsets) == 0:
+            offsets = reconstruct_offsets(fp, bloscpack_header)
+        return offsets, os.fstat(fp.fileno()).st_size
+
+
+def write_index(filename, index_file=None):
+    """ Write a sidecar index for a file.
+
+    Parameters
+    ----------
+    filename : str
+        the bloscpack file to index
+    index_file : str or None
+        the file to write the index to, by default the name of the file with
+        '.idx' appended, where readers will find it automatically
+
+    Returns
+    -------
+    offsets : ndarray of int64
+        the offsets
+
+    Notes
+    -----
+    The index consists of the magic string 'blpi', the format version as a
+    single byte, three reserved bytes, the size of the indexed file and the
+    number of chunks as int64 followed by the int64 offsets. Everything is
+    little-endian.
+
+    """
+    if index_file is None:
+        index_file = index_filename(filename)
+    offsets, file_size = _file_offsets(filename)
+    with open(index_file, 'wb') as fp:
+        fp.write(INDEX_MAGIC)
+        fp.write(encode_uint8(INDEX_FORMAT_VERSION))
+        fp.write(b'\x00' * 3)
+        fp.write(encode_int64(file_size))
+        fp.write(encode_int64(len(offsets)))
+        _write_offsets(fp, offsets)
+    log.verbose("wrote index with '%d' offsets to: '%s'" %
+                (len(offsets), index_file))
+    return offsets
+
+
+def read_index(filename, index_file=None):
+    """ Read the sidecar index for a file.
+
+    Parameters
+    ----------
+    filename : str
+        the indexed bloscpack file
+    index_file : str or None
+        the file to read the index from, by default the name of the file with
+        '.idx' appended
+
+    Returns
+    -------
+    offsets : ndarray of int64 or None
+        the offsets, None if there is no index
+
+    Raises
+    ------
+    IndexMismatch
+        if the index is corrupt or doesn't belong to the file in its
+        current state
+
+    """
+    if index_file is None:
+        index_file = index_filename(filename)
+    if not path.exists(index_file):
+        return None
+    with open(index_file, 'rb') as fp:
+        raw_header = fp.read(INDEX_HEADER_LENGTH)
+        if len(raw_header) != INDEX_HEADER_LENGTH or \
+                raw_header[:4] != INDEX_MAGIC:
+            raise IndexMismatch("'%s' is not an index file" % index_file)
+        format_version = decode_uint8(raw_header[4])
+        if format_version != INDEX_FORMAT_VERSION:
+            raise IndexMismatch(
+                "index format version of '%s' is '%d', expected '%d'" %
+                (index_file, format_version, INDEX_FORMAT_VERSION))
+        file_size = decode_int64(raw_header[8:16])
+        nchunks = decode_int64(raw_header[16:24])
+        if file_size != path.getsize(filename):
+            raise IndexMismatch("index '%s' does not match the size of '%s', "
+                                "re-create it" % (index_file, filename))
+        raw_offsets = fp.read(8 * nchunks)
+        if len(raw_offsets) != 8 * nchunks:
+            raise IndexMismatch("index '%s' is truncated" % index_file)
+    offsets = numpy.frombuffer(raw_offsets, dtype=OFFSETS_DTYPE)
+    log.debug("read '%d' offsets from index: '%s'" % (nchunks, index_file))
+    return offsets
+
+
+def add_offsets(filename, max_app_chunks=DEFAULT_MAX_APP_CHUNKS):
+    """ Rewrite a file without offsets such that it contains offsets.
+
+    Parameters
+    ----------
+    filename : str
+        the file to rewrite, in place
+    max_app_chunks : int or callable on number of chunks
+        how much space to reserve in the offsets for chunks to be appended
+
+    Returns
+    -------
+    offsets : ndarray of int64
+        the new offsets
+
+    Notes
+    -----
+    The chunks are copied as they are, nothing is recompressed. The new file
+    is written next to the original and then moved into place. If the file
+    already has offsets it is left untouched. An unknown number of chunks and
+    size of the last chunk, as left by streaming to an output that is not
+    seekable, are filled in as well.
+
+    """
+    with open(filename, 'rb') as input_fp:
+        bloscpack_header, _, _, offsets = _read_beginning(input_fp)
+        if bloscpack_header.offsets:
+            log.verbose("'%s' already has offsets" % filename)
+            return offsets
+        first_chunk = input_fp.tell()
+        offsets = reconstruct_offsets(input_fp, bloscpack_header)
+        if bloscpack_header.nchunks == -1:
+            # streamed to an output that was not seekable
+            bloscpack_header.nchunks = len(offsets)
+            bloscpack_header.last_chunk = chunk_nbytes(input_fp, offsets[-1])
+        bloscpack_header.offsets = True
+        bloscpack_header.max_app_chunks = _handle_max_apps(
+            True, bloscpack_header.nchunks, max_app_chunks)
+        offsets += 8 * bloscpack_header.total_prospective_chunks
+        output_fd, output_file = tempfile.mkstemp(
+            dir=path.dirname(path.abspath(filename)))
+        try:
+            with os.fdopen(output_fd, 'wb') as output_fp:
+                output_fp.write(bloscpack_header.encode())
+                input_fp.seek(BLOSCPACK_HEADER_LENGTH)
+                # the metadata section, if any, is copied verbatim
+                output_fp.write(
+                    input_fp.read(first_chunk - BLOSCPACK_HEADER_LENGTH))
+                _write_offsets(output_fp, offsets)
+                output_fp.write(encode_int64(-1) *
+                                bloscpack_header.max_app_chunks)
+                shutil.copyfileobj(input_fp, output_fp)
+            shutil.copymode(filename, output_file)
+        except Exception:
+            os.remove(output_file)
+            raise
+    os.replace(output_file, filename)
+    log.verbose("rewrote '%s' with '%d' offsets, new size: %s" %
+                (filename, len(offsets),
+                 double_pretty_size(path.getsize(filename))))
+    return offsets
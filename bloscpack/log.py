@@ -3,6 +3,9 @@
 # vim :set ft=py:
 
 
+from __future__ import print_function
+
+
 import sys
 
 
@@ -13,6 +16,8 @@ VERBOSITY_LEVELS = (NORMAL, VERBOSE, DEBUG)
 
 LEVEL = NORMAL
 PREFIX = "bloscpack.py"
+# None means 'sys.stdout', looked up when printing
+STREAM = None
 
 
 def set_prefix(prefix):
@@ -20,6 +25,12 @@ def set_prefix(prefix):
     PREFIX = prefix
 
 
+def set_stream(stream):
+    """ Print messages to 'stream', e.g. 'sys.stderr', None for stdout. """
+    global STREAM
+    STREAM = stream
+
+
 def set_level(level):
     if level not in VERBOSITY_LEVELS:
         raise ValueError('Log level must be one of: %s, not %s' %
@@ -33,7 +44,7 @@ def verbose(message, level=VERBOSE):
                         str(VERBOSITY_LEVELS)))
     if VERBOSITY_LEVELS.index(level) <= VERBOSITY_LEVELS.index(LEVEL):
         for line in [l for l in message.split('\n') if l != '']:
-            print('%s: %s' % (PREFIX, line))
+            print('%s: %s' % (PREFIX, line), file=STREAM or sys.stdout)
 
 
 def debug(message):
@@ -49,5 +60,5 @@ def normal(message):
 def error(message, exit_code=1):
     """ Print message and exit with desired code. """
     for line in [l for l in message.split('\n') if l != '']:
-        print('%s: error: %s' % (PREFIX, line))
+        print('%s: error: %s' % (PREFIX, line), file=STREAM or sys.stdout)
     sys.exit(exit_code)
@@ -33,6 +33,8 @@ class CompressedMemorySource(CompressedSource):
         self.checksum_impl = compressed_memory_sink.checksum_impl
         self.checksum = compressed_memory_sink.checksum
         self.nchunks = compressed_memory_sink.nchunks
+        self.chunk_size = compressed_memory_sink.bloscpack_header.chunk_size
+        self.last_chunk = compressed_memory_sink.bloscpack_header.last_chunk
 
         self.chunks = compressed_memory_sink.chunks
         if self.checksum:
@@ -57,7 +59,12 @@ class PlainMemorySink(PlainSink):
             self.chunks = []
 
     def put(self, compressed):
-        chunk = blosc.decompress(compressed)
+        return self.write(None, blosc.decompress(compressed))
+
+    def decompress(self, i, compressed):
+        return blosc.decompress(compressed)
+
+    def write(self, i, chunk):
         if self.have_chunks:
             self.chunks[self.i] = chunk
             self.i += 1
@@ -65,6 +72,9 @@ class PlainMemorySink(PlainSink):
             self.chunks.append(chunk)
         return len(chunk)
 
+    def put_zeros(self, i, nbytes):
+        return self.write(i, b'\x00' * nbytes)
+
 
 class CompressedMemorySink(CompressedSink):
 
@@ -74,6 +84,10 @@ class CompressedMemorySink(CompressedSink):
         self.checksum_impl = bloscpack_header.checksum_impl
         self.checksum = bloscpack_header.checksum
         self.nchunks = bloscpack_header.nchunks
+        if self.nchunks == -1:
+            # e.g. with the 'trailer' option
+            raise ValueError('the memory sink requires a known number '
+                             'of chunks')
 
         self.chunks = [None] * self.bloscpack_header.nchunks
         if self.checksum:
@@ -94,7 +108,19 @@ class CompressedMemorySink(CompressedSink):
         # no op
         pass
 
-    def put(self, i, compressed):
+    def put(self, i, compressed, digest=None):
         self.chunks[i] = compressed
         if self.checksum:
-            self.checksums[i] = self.do_checksum(compressed)
+            self.checksums[i] = digest if digest is not None \
+                else self.do_checksum(compressed)
+
+    def put_duplicate(self, i, original):
+        self.chunks[i] = self.chunks[original]
+        if self.checksum:
+            self.checksums[i] = self.checksums[original]
+
+    def put_zeros(self, i):
+        # 'CompressedMemorySource' yields '(None, None)' for these
+        self.chunks[i] = None
+        if self.checksum:
+            self.checksums[i] = None
@@ -4,6 +4,7 @@
 
 
 import ast
+import ctypes
 
 import blosc
 import numpy
@@ -18,7 +19,10 @@ from .abstract_io import (pack,
 from .compat_util import StringIO
 from .file_io import (CompressedFPSource,
                       CompressedFPSink,
+                      peek_file,
                       )
+from .reader import (BloscpackReader,
+                     )
 from .args import (BloscArgs,
                    calculate_nchunks,
                    )
@@ -31,8 +35,12 @@ from .exceptions import (NotANumpyArray,
                          ObjectNumpyArrayRejection,
                          ChunkSizeTypeSizeMismatch,
                          )
+from .headers import (decode_blosc_sizes,
+                      )
 from .pretty import (double_pretty_size,
                      )
+from .tune import (_auto_blosc_args,
+                   )
 from . import log
 
 
@@ -81,6 +89,11 @@ class PlainNumpySource(PlainSource):
     def compress_func(self):
         return _compress_chunk_ptr
 
+    def chunk_buffer(self, chunk):
+        ptr, nitems = chunk
+        return (ctypes.c_char * (nitems * self.ndarray.itemsize)).from_address(
+            ptr)
+
     def __iter__(self):
         if self.chunk_size % self.ndarray.itemsize != 0:
                 raise ChunkSizeTypeSizeMismatch(
@@ -117,41 +130,167 @@ def _conv(descr):
     return descr
 
 
+def _check_ndarray_meta(metadata):
+    if metadata is None or metadata['container'] != 'numpy':
+        raise NotANumpyArray
+
+
+def _ndarray_dtype(metadata):
+    """ Reconstruct the dtype from the metadata. """
+    # The try except is a backwards compatability hack for the old way of
+    # serializing ndarray dtype which was used prior to 0.7.2. For basic
+    # dtyepes, the dtype 'descr' was serialized directly to json and not
+    # via 'repr'.  As such, it does not need to be evaluated, but instead
+    # is already a string that can be passed to the constructor. It will
+    # raise a SyntaxError in this case. For nested dtypes we have the
+    # problem, that it did compress the files but was unable to decompress
+    # them. In this case, it will raise a TypeError and the _conv function
+    # above is used to convert the dtype accordingly.
+    try:
+        dtype_ = ast.literal_eval(metadata['dtype'])
+    except (ValueError, SyntaxError):
+        dtype_ = _conv(metadata['dtype'])
+    return numpy.dtype(dtype_)
+
+
 class PlainNumpySink(PlainSink):
 
     def __init__(self, metadata):
         self.metadata = metadata
-        if metadata is None or metadata['container'] != 'numpy':
-            raise NotANumpyArray
-        # The try except is a backwards compatability hack for the old way of
-        # serializing ndarray dtype which was used prior to 0.7.2. For basic
-        # dtyepes, the dtype 'descr' was serialized directly to json and not
-        # via 'repr'.  As such, it does not need to be evaluated, but instead
-        # is already a string that can be passed to the constructor. It will
-        # raise a SyntaxError in this case. For nested dtypes we have the
-        # problem, that it did compress the files but was unable to decompress
-        # them. In this case, it will raise a TypeError and the _conv function
-        # above is used to convert the dtype accordingly.
-        try:
-            dtype_ = ast.literal_eval(metadata['dtype'])
-        except (ValueError, SyntaxError):
-            dtype_ = _conv(metadata['dtype'])
-        self.ndarray = numpy.empty(metadata['shape'],
-                                   dtype=numpy.dtype(dtype_),
+        _check_ndarray_meta(metadata)
+        # zeros, such that chunks of zeros which were not stored need not be
+        # written, for large arrays the pages are zeroed lazily by the OS
+        self.ndarray = numpy.zeros(metadata['shape'],
+                                   dtype=_ndarray_dtype(metadata),
                                    order=metadata['order'])
         self.ptr = self.ndarray.__array_interface__['data'][0]
+        self.base_ptr = self.ptr
+
+    def _check_fits(self, offset, compressed, slot):
+        nbytes = decode_blosc_sizes(compressed)[0]
+        if nbytes > slot or offset + nbytes > self.ndarray.nbytes:
+            raise ValueError('chunk does not fit into the array')
 
     def put(self, compressed):
+        offset = self.ptr - self.base_ptr
+        self._check_fits(offset, compressed, self.ndarray.nbytes - offset)
         bwritten = blosc.decompress_ptr(compressed, self.ptr)
         self.ptr += bwritten
         return bwritten
 
+    def decompress(self, i, compressed):
+        # chunk i goes to its own slot, no matter in which order they arrive
+        offset = i * self.chunk_size
+        self._check_fits(offset, compressed, self.chunk_size)
+        return blosc.decompress_ptr(compressed, self.base_ptr + offset)
+
+    def write(self, i, bwritten):
+        self.ptr += bwritten
+        return bwritten
+
+    def put_zeros(self, i, nbytes):
+        self.ptr += nbytes
+        return nbytes
+
+
+class LazyNdarray(object):
+    """ Lazy, sliceable view of a Numpy array in a bloscpack file.
+
+    Nothing but the header, metadata and offsets is read up front. Indexing
+    along the leading axis of a C order array decompresses only the chunks
+    that overlap the requested rows and copies only the bytes needed into
+    the result. Any other indexing decompresses the whole array first.
+
+    Parameters
+    ----------
+    reader : BloscpackReader
+        the reader for the file containing the array
+
+    Raises
+    ------
+    NotANumpyArray
+        if the file doesn't seem to contain a Numpy array
+
+    """
+
+    def __init__(self, reader):
+        _check_ndarray_meta(reader.metadata)
+        self.reader = reader
+        self.metadata = reader.metadata
+        self.shape = tuple(self.metadata['shape'])
+        self.dtype = _ndarray_dtype(self.metadata)
+        self.order = self.metadata['order']
+        self.ndim = len(self.shape)
+        self.size = int(numpy.prod(self.shape))
+        self.nbytes = self.size * self.dtype.itemsize
+        self.row_nbytes = int(numpy.prod(self.shape[1:])) * \
+            self.dtype.itemsize
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.reader.close()
+
+    def __len__(self):
+        if self.ndim == 0:
+            raise TypeError("len() of unsized object")
+        return self.shape[0]
+
+    def __repr__(self):
+        return "%s(shape=%s, dtype=%s, order='%s')" % \
+            (self.__class__.__name__, self.shape, self.dtype, self.order)
+
+    def _read_rows(self, start, stop):
+        """ Read the rows 'start' up to 'stop' of the leading axis. """
+        nrows = stop - start
+        buffer_ = numpy.empty(nrows * self.row_nbytes, dtype=numpy.uint8)
+        self.reader.seek(start * self.row_nbytes)
+        self.reader.readinto(buffer_)
+        return buffer_.view(self.dtype).reshape((nrows,) + self.shape[1:])
+
+    def __getitem__(self, key):
+        rest = ()
+        if isinstance(key, tuple) and len(key) > 0:
+            key, rest = key[0], key[1:]
+        if self.ndim == 0 or self.order != 'C' or \
+                not isinstance(key, (slice, six.integer_types, numpy.integer)):
+            return numpy.asarray(self)[(key,) + rest if rest else key]
+        if isinstance(key, slice):
+            rows = xrange(*key.indices(self.shape[0]))
+            if len(rows) == 0:
+                result = self._read_rows(0, 0)
+            else:
+                start, stop = min(rows), max(rows) + 1
+                result = self._read_rows(start, stop)[
+                    rows.start - start::rows.step]
+            return result[(slice(None),) + rest] if rest else result
+        key = int(key)
+        if key < 0:
+            key += self.shape[0]
+        if not 0 <= key < self.shape[0]:
+            raise IndexError("index '%d' is out of bounds for axis 0 with "
+                             "size '%d'" % (key, self.shape[0]))
+        return self._read_rows(key, key + 1)[0][rest]
+
+    def __array__(self, dtype=None):
+        buffer_ = numpy.empty(self.nbytes, dtype=numpy.uint8)
+        self.reader.seek(0)
+        self.reader.readinto(buffer_)
+        ndarray = buffer_.view(self.dtype).reshape(self.shape,
+                                                    order=self.order)
+        return ndarray if dtype is None else ndarray.astype(dtype)
+
 
 def pack_ndarray(ndarray, sink,
                  chunk_size=DEFAULT_CHUNK_SIZE,
                  blosc_args=None,
                  bloscpack_args=None,
-                 metadata_args=None):
+                 metadata_args=None,
+                 stats=None):
     """ Serialialize a Numpy array.
 
     Parameters
@@ -160,12 +299,14 @@ def pack_ndarray(ndarray, sink,
         the numpy array to serialize
     sink : CompressedSink
         the sink to serialize to
-    blosc_args : BloscArgs
-        blosc args
+    blosc_args : BloscArgs or 'auto'
+        blosc args, 'auto' to pick them for the array with 'autotune'
     bloscpack_args : BloscpackArgs
         bloscpack args
     metadata_args : MetadataArgs
         the args for the metadata
+    stats : Stats
+        if given, filled in with the timings and sizes
 
     Notes
     -----
@@ -176,6 +317,7 @@ def pack_ndarray(ndarray, sink,
     """
     if ndarray.dtype.hasobject:
         raise ObjectNumpyArrayRejection
+    blosc_args = _auto_blosc_args(blosc_args, ndarray, chunk_size)
     if blosc_args is None:
         blosc_args = BloscArgs(typesize=ndarray.dtype.itemsize)
     else:
@@ -189,7 +331,8 @@ def pack_ndarray(ndarray, sink,
          metadata=source.metadata,
          blosc_args=blosc_args,
          bloscpack_args=bloscpack_args,
-         metadata_args=metadata_args)
+         metadata_args=metadata_args,
+         stats=stats)
     #out_file_size = path.getsize(file_pointer)
     #log.verbose('output file size: %s' % double_pretty_size(out_file_size))
     #log.verbose('compression ratio: %f' % (out_file_size/source.size))
@@ -199,7 +342,8 @@ def pack_ndarray_to_file(ndarray, filename,
                          chunk_size=DEFAULT_CHUNK_SIZE,
                          blosc_args=None,
                          bloscpack_args=None,
-                         metadata_args=None):
+                         metadata_args=None,
+                         stats=None):
     """ Serialialize a Numpy array to a file.
 
     Parameters
@@ -208,12 +352,14 @@ def pack_ndarray_to_file(ndarray, filename,
         the numpy array to serialize
     filename : str
         the file to compress to
-    blosc_args : BloscArgs
-        blosc args
+    blosc_args : BloscArgs or 'auto'
+        blosc args, 'auto' to pick them for the array with 'autotune'
     bloscpack_args : BloscpackArgs
         bloscpack args
     metadata_args : MetadataArgs
         the args for the metadata
+    stats : Stats
+        if given, filled in with the timings and sizes
 
     Notes
     -----
@@ -227,7 +373,8 @@ def pack_ndarray_to_file(ndarray, filename,
                      chunk_size=chunk_size,
                      blosc_args=blosc_args,
                      bloscpack_args=bloscpack_args,
-                     metadata_args=metadata_args)
+                     metadata_args=metadata_args,
+                     stats=stats)
 
 
 pack_ndarray_file = deprecated(pack_ndarray_to_file,
@@ -240,7 +387,8 @@ def pack_ndarray_to_bytes(ndarray,
                           chunk_size=DEFAULT_CHUNK_SIZE,
                           blosc_args=None,
                           bloscpack_args=None,
-                          metadata_args=None):
+                          metadata_args=None,
+                          stats=None):
     """ Serialialize a Numpy array to bytes_
 
     Parameters
@@ -249,12 +397,14 @@ def pack_ndarray_to_bytes(ndarray,
         the numpy array to serialize
     filename : str
         the file to compress to
-    blosc_args : BloscArgs
-        blosc args
+    blosc_args : BloscArgs or 'auto'
+        blosc args, 'auto' to pick them for the array with 'autotune'
     bloscpack_args : BloscpackArgs
         bloscpack args
     metadata_args : MetadataArgs
         the args for the metadata
+    stats : Stats
+        if given, filled in with the timings and sizes
 
     Returns
     -------
@@ -273,7 +423,8 @@ def pack_ndarray_to_bytes(ndarray,
                  chunk_size=chunk_size,
                  blosc_args=blosc_args,
                  bloscpack_args=bloscpack_args,
-                 metadata_args=metadata_args)
+                 metadata_args=metadata_args,
+                 stats=stats)
     return sio.getvalue()
 
 
@@ -283,13 +434,19 @@ pack_ndarray_str = deprecated(pack_ndarray_to_bytes,
                               )
 
 
-def unpack_ndarray(source):
+def unpack_ndarray(source, workers=1, max_inflight=None, stats=None):
     """ Deserialize a Numpy array.
 
     Parameters
     ----------
     source : CompressedSource
         the source containing the serialized Numpy array
+    workers : int
+        the number of threads used to decompress chunks
+    max_inflight : int
+        the maximum number of chunks being decompressed at any one time
+    stats : Stats
+        if given, filled in with the timings and sizes
 
     Returns
     -------
@@ -303,17 +460,25 @@ def unpack_ndarray(source):
     """
 
     sink = PlainNumpySink(source.metadata)
-    unpack(source, sink)
+    unpack(source, sink, workers=workers, max_inflight=max_inflight,
+           stats=stats)
     return sink.ndarray
 
 
-def unpack_ndarray_from_file(filename):
+def unpack_ndarray_from_file(filename, workers=1, max_inflight=None,
+                             stats=None):
     """ Deserialize a Numpy array from a file.
 
     Parameters
     ----------
     filename : str
         the file to decompress from
+    workers : int
+        the number of threads used to decompress chunks
+    max_inflight : int
+        the maximum number of chunks being decompressed at any one time
+    stats : Stats
+        if given, filled in with the timings and sizes
 
     Returns
     -------
@@ -325,8 +490,71 @@ def unpack_ndarray_from_file(filename):
     NotANumpyArray
         if the source doesn't seem to contain a Numpy array
     """
-    source = CompressedFPSource(open(filename, 'rb'))
-    return unpack_ndarray(source)
+    with open(filename, 'rb') as fp:
+        source = CompressedFPSource(fp)
+        return unpack_ndarray(source, workers=workers,
+                              max_inflight=max_inflight, stats=stats)
+
+
+def peek_ndarray_from_file(filename):
+    """ Read the shape and dtype of a Numpy array in a file.
+
+    Only the headers and the metadata are read, neither the offsets nor any
+    of the chunks.
+
+    Parameters
+    ----------
+    filename : str
+        the file to peek into
+
+    Returns
+    -------
+    bloscpack_header : BloscpackHeader
+        the bloscpack header
+    shape : tuple
+        the shape of the array
+    dtype : dtype
+        the dtype of the array
+
+    Raises
+    ------
+    NotANumpyArray
+        if the file doesn't seem to contain a Numpy array
+    """
+    bloscpack_header, metadata, _ = peek_file(filename)
+    _check_ndarray_meta(metadata)
+    return bloscpack_header, tuple(metadata['shape']), \
+        _ndarray_dtype(metadata)
+
+
+def open_ndarray_from_file(filename, cache=None):
+    """ Open a Numpy array in a file lazily.
+
+    Parameters
+    ----------
+    filename : str
+        the file to read from, must have offsets or a sidecar index
+    cache : ChunkCache or None
+        a cache of decompressed chunks, possibly shared with other readers
+
+    Returns
+    -------
+    lazy_ndarray : LazyNdarray
+        the lazy array, supports basic indexing and 'numpy.asarray'
+
+    Raises
+    ------
+    NotANumpyArray
+        if the file doesn't seem to contain a Numpy array
+    NoOffsetsFound
+        if the file has neither offsets nor a sidecar index
+    """
+    reader = BloscpackReader(filename, cache=cache)
+    try:
+        return LazyNdarray(reader)
+    except Exception:
+        reader.close()
+        raise
 
 
 unpack_ndarray_file = deprecated(unpack_ndarray_from_file,
@@ -335,13 +563,15 @@ unpack_ndarray_file = deprecated(unpack_ndarray_from_file,
                                  )
 
 
-def unpack_ndarray_from_bytes(bytes_):
+def unpack_ndarray_from_bytes(bytes_, stats=None):
     """ Deserialize a Numpy array from bytes.
 
     Parameters
     ----------
     bytes_ : bytes
         the bytes to decompress from
+    stats : Stats
+        if given, filled in with the timings and sizes
 
     Returns
     -------
@@ -355,7 +585,7 @@ def unpack_ndarray_from_bytes(bytes_):
     """
     sio = StringIO(bytes_)
     source = CompressedFPSource(sio)
-    return unpack_ndarray(source)
+    return unpack_ndarray(source, stats=stats)
 
 
 unpack_ndarray_str = deprecated(unpack_ndarray_from_bytes,
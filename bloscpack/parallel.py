@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim :set ft=py:
+
+
+import collections
+import contextlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+import blosc
+
+
+from .headers import (check_range,
+                      )
+
+
+DEFAULT_INFLIGHT_PER_WORKER = 2
+
+# the blocks currently within 'released_gil' and the state before the first
+_RELEASEGIL_LOCK = threading.Lock()
+_releasegil_users = 0
+_releasegil_previous = None
+
+
+@contextlib.contextmanager
+def released_gil():
+    """ Have python-blosc release the GIL for the duration of the block.
+
+    Notes
+    -----
+    This is a global python-blosc setting. Overlapping blocks, e.g. from
+    concurrent calls on different threads, are counted: the setting is
+    switched on by the first to enter and the previous state is restored only
+    when the last one exits.
+
+    """
+    global _releasegil_users, _releasegil_previous
+    with _RELEASEGIL_LOCK:
+        if _releasegil_users == 0:
+            _releasegil_previous = blosc.set_releasegil(True)
+        _releasegil_users += 1
+    try:
+        yield
+    finally:
+        with _RELEASEGIL_LOCK:
+            _releasegil_users -= 1
+            if _releasegil_users == 0:
+                blosc.set_releasegil(_releasegil_previous)
+
+
+def check_workers(workers, max_inflight):
+    """ Check and normalize the 'workers' and 'max_inflight' arguments.
+
+    Parameters
+    ----------
+    workers : int
+        the number of worker threads
+    max_inflight : int or None
+        the maximum number of items in flight, 'None' means a small multiple of
+        'workers'
+
+    Returns
+    -------
+    max_inflight : int
+        the effective value
+
+    Raises
+    ------
+    ValueError
+        if any of the arguments is out of range
+    TypeError
+        if any of the arguments is not an int
+
+    """
+    check_range('workers', workers, 1, 2**16)
+    if max_inflight is None:
+        max_inflight = DEFAULT_INFLIGHT_PER_WORKER * workers
+    check_range('max_inflight', max_inflight, 1, 2**20)
+    return max_inflight
+
+
+def ordered_map(func, iterable, workers, max_inflight):
+    """ Map a function over an iterable on a thread pool, preserving order.
+
+    Parameters
+    ----------
+    func : callable
+        the function to apply, will be called as ``func(*item)``
+    iterable : iterable of tuples
+        the argument tuples
+    workers : int
+        the number of worker threads
+    max_inflight : int
+        the maximum number of items submitted but not yet yielded
+
+    Yields
+    ------
+    item, result : tuple
+        the argument tuple and the result of applying the function to it, in
+        the same order as the input
+
+    Notes
+    -----
+    The iterable is consumed lazily, at most 'max_inflight' items are held at
+    any one time. Exceptions raised by 'func' are re-raised when the
+    corresponding result is due.
+
+    """
+    pending = collections.deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            for item in iterable:
+                if len(pending) >= max_inflight:
+                    done, future = pending.popleft()
+                    yield done, future.result()
+                pending.append((item, executor.submit(func, *item)))
+            while pending:
+                done, future = pending.popleft()
+                yield done, future.result()
+        finally:
+            for _, future in pending:
+                future.cancel()
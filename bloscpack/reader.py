@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim :set ft=py:
+
+
+from __future__ import division
+
+
+import io
+
+
+import blosc
+import six
+
+
+from .abstract_io import (_check_digest,
+                          )
+from .cache import (file_identity,
+                    )
+from .constants import (ZERO_CHUNK_OFFSET,
+                        )
+from .exceptions import (CorruptedChunk,
+                         NoOffsetsFound,
+                         )
+from .file_io import (_read_beginning,
+                      _read_chunk_fp,
+                      )
+from .headers import (decode_blosc_sizes,
+                      )
+from .index import (chunk_nbytes,
+                    read_index,
+                    )
+from . import log
+
+
+class BloscpackReader(io.RawIOBase):
+    """ Random-access, read-only file object over a bloscpack file.
+
+    The offsets are used to decompress only those chunks that cover the bytes
+    requested, so that reading a small record from a large file costs a
+    single chunk decompression. The most recently decompressed chunk is kept,
+    such that consecutive small reads don't decompress it again.
+
+    Parameters
+    ----------
+    input_fp : str or file like
+        the name of the file to read or a seekable file pointer opened in
+        binary mode, the file is closed with the reader only if it was opened
+        by the reader
+    cache : ChunkCache or None
+        a cache of decompressed chunks, possibly shared with other readers
+
+    Raises
+    ------
+    NoOffsetsFound
+        if the file was created without offsets and there is no sidecar index
+    IndexMismatch
+        if the sidecar index doesn't match the file
+
+    Notes
+    -----
+    Since this is an 'io.RawIOBase' the reader can be wrapped in an
+    'io.BufferedReader' and passed to consumers such as 'pickle.load' or
+    'numpy.load'.
+
+    For files without offsets, the sidecar index written by 'write_index' is
+    loaded automatically, if present.
+
+    """
+
+    def __init__(self, input_fp, cache=None):
+        super(BloscpackReader, self).__init__()
+        if isinstance(input_fp, six.string_types):
+            self.input_fp = open(input_fp, 'rb')
+            self._close_fp = True
+        else:
+            self.input_fp = input_fp
+            self._close_fp = False
+        try:
+            self.bloscpack_header, self.metadata, self.metadata_header, \
+                self.offsets = _read_beginning(self.input_fp)
+            self._check_offsets()
+        except Exception:
+            self.close()
+            raise
+        self.checksum_impl = self.bloscpack_header.checksum_impl
+        self.nchunks = self.bloscpack_header.nchunks
+        self.chunk_size = self.bloscpack_header.chunk_size
+        self.last_chunk = self.bloscpack_header.last_chunk
+        self.size = self.chunk_size * (self.nchunks - 1) + self.last_chunk \
+            if self.nchunks > 0 else 0
+        self.position = 0
+        self._current = None, None
+        self.cache = cache
+        self.identity = file_identity(self.input_fp) \
+            if cache is not None else None
+
+    def _check_offsets(self):
+        if self.bloscpack_header.nchunks != 0 and len(self.offsets) == 0:
+            filename = getattr(self.input_fp, 'name', None)
+            if isinstance(filename, six.string_types):
+                self.offsets = read_index(filename)
+            if self.offsets is None or len(self.offsets) == 0:
+                raise NoOffsetsFound(
+                    "file has no offsets and no index, random access is not "
+                    "possible, create an index with 'blpk index'")
+            if self.bloscpack_header.nchunks == -1:
+                # streamed to an output that was not seekable
+                self.bloscpack_header.nchunks = len(self.offsets)
+                self.bloscpack_header.last_chunk = chunk_nbytes(
+                    self.input_fp, self.offsets[-1])
+
+    def close(self):
+        if not self.closed and self._close_fp:
+            self.input_fp.close()
+        super(BloscpackReader, self).close()
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        self._checkClosed()
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self.position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError("invalid whence: '%s'" % whence)
+        if position < 0:
+            raise ValueError("negative seek position: '%d'" % position)
+        self.position = position
+        return position
+
+    def tell(self):
+        self._checkClosed()
+        return self.position
+
+    def read_compressed_chunk(self, i):
+        """ Read the compressed chunk 'i' and its digest.
+
+        Parameters
+        ----------
+        i : int
+            the index of the chunk
+
+        Returns
+        -------
+        compressed : bytes or None
+            the compressed chunk, None for a chunk of zeros which was not
+            stored
+        digest : bytes or None
+            the digest of the chunk, if any
+
+        """
+        self._checkClosed()
+        if not 0 <= i < self.nchunks:
+            raise IndexError("chunk index out of range: '%d'" % i)
+        if self.offsets[i] == ZERO_CHUNK_OFFSET:
+            return None, None
+        self.input_fp.seek(self.offsets[i])
+        return _read_chunk_fp(self.input_fp, self.checksum_impl)
+
+    def read_chunk(self, i):
+        """ Read, check and decompress chunk 'i'.
+
+        Parameters
+        ----------
+        i : int
+            the index of the chunk
+
+        Returns
+        -------
+        decompressed : bytes
+            the decompressed chunk
+
+        Raises
+        ------
+        IndexError
+            if 'i' is not a valid chunk index
+        ChecksumMismatch
+            if the checksum of the chunk doesn't match
+        CorruptedChunk
+            if the chunk doesn't have the size the header says
+
+        """
+        index, decompressed = self._current
+        if index == i:
+            return decompressed
+        decompressed = self.cache.get((self.identity, i)) \
+            if self.cache is not None else None
+        if decompressed is None:
+            compressed, digest = self.read_compressed_chunk(i)
+            nbytes = self.chunk_size if i != self.nchunks - 1 \
+                else self.last_chunk
+            if compressed is None:
+                decompressed = b'\x00' * nbytes
+                self._current = i, decompressed
+                return decompressed
+            _check_digest(self.checksum_impl, compressed, digest)
+            if decode_blosc_sizes(compressed)[0] != nbytes:
+                raise CorruptedChunk(
+                    "chunk '%d' has '%d' bytes, expected '%d'" %
+                    (i, decode_blosc_sizes(compressed)[0], nbytes))
+            decompressed = blosc.decompress(compressed)
+            if log.LEVEL == log.DEBUG:
+                log.debug("decompressed chunk '%d' of size: '%d'" %
+                          (i, len(decompressed)))
+            if self.cache is not None:
+                self.cache.put((self.identity, i), decompressed)
+        self._current = i, decompressed
+        return decompressed
+
+    def readinto(self, b):
+        self._checkClosed()
+        view = memoryview(b).cast('B')
+        written = 0
+        while written < len(view) and self.position < self.size:
+            i, start = divmod(self.position, self.chunk_size)
+            chunk = self.read_chunk(i)
+            length = min(len(view) - written, len(chunk) - start)
+            view[written:written + length] = \
+                memoryview(chunk)[start:start + length]
+            written += length
+            self.position += length
+        return written
@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim :set ft=py:
+
+
+from __future__ import division
+
+
+import collections
+import threading
+import time
+
+
+from .pretty import (double_pretty_size,
+                     pretty_size,
+                     )
+from .trace import (get_tracer,
+                    )
+
+
+def clock():
+    """ The wall time and the CPU time of the calling thread, in seconds. """
+    return time.perf_counter(), time.thread_time()
+
+
+def timed(iterable, stats, stage):
+    """ Iterate and add the time taken by each step to a stage, the step
+    number is the chunk.
+    """
+    iterator = iter(iterable)
+    i = 0
+    while True:
+        start = clock()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            stats.add(stage, start)
+            return
+        stats.add(stage, start, i)
+        i += 1
+        yield item
+
+
+class Stats(object):
+    """ Timings and sizes collected by 'pack' and 'unpack'.
+
+    Pass an instance to any of the packing or unpacking functions to have it
+    filled in. Collection costs a few clock reads per chunk and stage, which
+    is negligible compared to compressing a chunk.
+
+    Attributes
+    ----------
+    operation : str
+        'pack' or 'unpack'
+    wall : OrderedDict
+        the wall time in seconds per stage, in the order the stages were first
+        seen
+    cpu : OrderedDict
+        the CPU time in seconds per stage
+    nchunks : int
+        the number of chunks, including any which were not stored
+    bytes_in : int
+        the number of bytes read, for 'pack' the input and for 'unpack' the
+        compressed chunks including their checksums
+    bytes_out : int
+        the number of bytes written, for 'pack' the compressed chunks including
+        their checksums and for 'unpack' the output
+    nratios : int
+        the number of chunks that were stored
+    ratio_min, ratio_max : float or None
+        the lowest and the highest compression ratio of those chunks, None if
+        there are none
+    ratio_sum : float
+        the sum of their compression ratios, see also 'ratio_mean'
+    elapsed : float
+        the wall time of the whole operation in seconds
+    elapsed_cpu : float
+        the CPU time of the whole process during the operation in seconds
+
+    Notes
+    -----
+    The stages of 'pack' are 'read', 'compress', 'checksum' and 'write', those
+    of 'unpack' are 'read', 'checksum', 'decompress' and 'write'. Reading
+    includes the detection of duplicates and zeros. For sinks that only
+    implement 'put', decompressing is counted as writing.
+
+    Only aggregates are kept, such that the memory used doesn't grow with
+    the number of chunks.
+
+    The times of a stage are summed over all threads, so with several workers
+    they can add up to more than 'elapsed'. The stage with the most wall time
+    is the bottleneck only if it ran on the calling thread, i.e. 'read' and
+    'write', or if there is a single worker.
+
+    If tracing is enabled, see 'enable_tracing', every timed stage of every
+    chunk and the whole operation are also recorded as events, which shows
+    how the stages overlap on the threads.
+
+    """
+
+    def __init__(self):
+        self.operation = None
+        self.wall = collections.OrderedDict()
+        self.cpu = collections.OrderedDict()
+        self.nchunks = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.nratios = 0
+        self.ratio_min = None
+        self.ratio_max = None
+        self.ratio_sum = 0.0
+        self.elapsed = 0.0
+        self.elapsed_cpu = 0.0
+        # stages may be timed on worker threads
+        self._lock = threading.Lock()
+
+    def start(self, operation):
+        """ Begin the operation, called by 'pack' and 'unpack'. """
+        self.operation = operation
+        self._start = time.perf_counter(), time.process_time()
+
+    def stop(self):
+        """ End the operation, called by 'pack' and 'unpack'. """
+        end = time.perf_counter(), time.process_time()
+        self.elapsed = end[0] - self._start[0]
+        self.elapsed_cpu = end[1] - self._start[1]
+        tracer = get_tracer()
+        if tracer is not None:
+            tracer.event(self.operation, self._start[0], end[0])
+
+    def add(self, stage, start, chunk=None):
+        """ Add the time since 'start' to a stage.
+
+        Parameters
+        ----------
+        stage : str
+            the name of the stage
+        start : tuple of float
+            as returned by 'clock' on the same thread
+        chunk : int or None
+            the index of the chunk, for tracing
+
+        Returns
+        -------
+        end : tuple of float
+            the current 'clock', to time the next stage from
+
+        """
+        end = clock()
+        with self._lock:
+            self.wall[stage] = self.wall.get(stage, 0.0) + end[0] - start[0]
+            self.cpu[stage] = self.cpu.get(stage, 0.0) + end[1] - start[1]
+        tracer = get_tracer()
+        if tracer is not None:
+            tracer.event(stage, start[0], end[0], chunk)
+        return end
+
+    def add_ratio(self, nbytes, cbytes):
+        """ Record the ratio of a chunk of 'nbytes' compressed to 'cbytes'.
+        """
+        ratio = nbytes / cbytes if cbytes else 0.0
+        self.nratios += 1
+        self.ratio_sum += ratio
+        if self.ratio_min is None or ratio < self.ratio_min:
+            self.ratio_min = ratio
+        if self.ratio_max is None or ratio > self.ratio_max:
+            self.ratio_max = ratio
+
+    @property
+    def ratio_mean(self):
+        """ The mean compression ratio of the chunks that were stored. """
+        return self.ratio_sum / self.nratios if self.nratios else 0.0
+
+    @property
+    def nbytes(self):
+        """ The uncompressed size. """
+        return self.bytes_in if self.operation == 'pack' else self.bytes_out
+
+    @property
+    def ratio(self):
+        """ The overall compression ratio. """
+        cbytes = self.bytes_out if self.operation == 'pack' \
+            else self.bytes_in
+        return self.nbytes / cbytes if cbytes else 0.0
+
+    @property
+    def throughput(self):
+        """ The uncompressed bytes per second of wall time. """
+        return self.nbytes / self.elapsed if self.elapsed else 0.0
+
+    def summary(self, indent=4):
+        """ A human readable summary, one item per line. """
+        indent = " " * indent
+        lines = ['%s: %d chunks, in: %s, out: %s, ratio: %.2f' %
+                 (self.operation, self.nchunks,
+                  double_pretty_size(self.bytes_in),
+                  double_pretty_size(self.bytes_out), self.ratio),
+                 'elapsed: %.3fs (cpu: %.3fs), throughput: %s/s' %
+                 (self.elapsed, self.elapsed_cpu,
+                  pretty_size(self.throughput))]
+        if self.nratios:
+            lines.append('chunk ratios: min: %.2f, mean: %.2f, max: %.2f' %
+                         (self.ratio_min, self.ratio_mean, self.ratio_max))
+        for stage, wall in self.wall.items():
+            lines.append('%s: %.3fs (cpu: %.3fs), %.1f%% of elapsed' %
+                         (stage, wall, self.cpu[stage],
+                          100 * wall / self.elapsed if self.elapsed else 0.0))
+        return ('\n' + indent).join(lines)
+
+    def __repr__(self):
+        return "%s(%s, %d chunks, %s in %.3fs)" % \
+            (type(self).__name__, self.operation, self.nchunks,
+             double_pretty_size(self.nbytes), self.elapsed)
+
+
+class _TraceOnlyStats(Stats):
+    """ Stands in for the stats if the caller didn't ask for them.
+
+    Nothing is collected, but the stages are still traced if tracing is
+    enabled.
+
+    """
+
+    def add(self, stage, start, chunk=None):
+        end = clock()
+        tracer = get_tracer()
+        if tracer is not None:
+            tracer.event(stage, start[0], end[0], chunk)
+        return end
+
+    def add_ratio(self, nbytes, cbytes):
+        pass
+
+
+def stats_or_stand_in(stats):
+    """ The stats to fill in, a stand-in that only traces if 'stats' is None.
+    """
+    return stats if stats is not None else _TraceOnlyStats()
@@ -4,6 +4,7 @@
 
 
 import os  # pragma: no cover
+import sys
 
 
 def drop_caches():  # pragma: no cover
@@ -15,3 +16,41 @@ def drop_caches():  # pragma: no cover
 
 def sync():  # pragma: no cover
     os.system('sync')
+
+
+def reset_peak_rss():
+    """ Reset the peak resident set size of this process to the current one.
+
+    Returns
+    -------
+    reset : bool
+        False if not supported, only Linux 4.0 and later are
+
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as fp:
+            fp.write('5')
+        return True
+    except (IOError, OSError):
+        return False
+
+
+def peak_rss():
+    """ The peak resident set size of this process in bytes, or None if
+    unknown.
+    """
+    try:
+        with open('/proc/self/status') as fp:
+            for line in fp:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except (IOError, OSError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        # Windows
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
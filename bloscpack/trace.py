@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim :set ft=py:
+
+
+import atexit
+import json
+import os
+import threading
+import time
+
+
+from . import log
+
+
+# name of the environment variable holding the file to trace to
+TRACE_ENV = 'BLOSCPACK_TRACE'
+TRACE_FORMATS = ('chrome', 'jsonl')
+
+
+class Tracer(object):
+    """ Write timed events to a file.
+
+    Every event is a Chrome trace event of the complete ('X') kind, with the
+    start 'ts' and the duration 'dur' in microseconds since the tracer was
+    created, the process and thread ids and, if known, the index of the chunk
+    in 'args'. Each thread also gets a metadata ('M') event with its name.
+
+    Parameters
+    ----------
+    filename : str
+        the file to write to
+    format_ : str or None
+        'chrome' for a JSON array that can be loaded in 'chrome://tracing' or
+        Perfetto, 'jsonl' for one event per line, by default 'jsonl' if the
+        filename ends in '.jsonl' and 'chrome' otherwise
+
+    Raises
+    ------
+    ValueError
+        if the format is unknown
+
+    """
+
+    def __init__(self, filename, format_=None):
+        if format_ is None:
+            format_ = 'jsonl' if filename.endswith('.jsonl') else 'chrome'
+        if format_ not in TRACE_FORMATS:
+            raise ValueError("unknown trace format '%s', must be one of: '%s'"
+                             % (format_, "', '".join(TRACE_FORMATS)))
+        self.filename = filename
+        self.format_ = format_
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+        self.nevents = 0
+        self._threads = set()
+        self._fp = open(filename, 'w')
+        # events may come from worker threads
+        self._lock = threading.Lock()
+        if format_ == 'chrome':
+            self._fp.write('[')
+
+    def _write(self, event):
+        line = json.dumps(event, sort_keys=True)
+        if self.format_ == 'chrome':
+            line = ('\n' if self.nevents == 0 else ',\n') + line
+        else:
+            line += '\n'
+        self._fp.write(line)
+        self.nevents += 1
+
+    def event(self, name, start, end, chunk=None):
+        """ Record an event.
+
+        Parameters
+        ----------
+        name : str
+            the name of the event, i.e. the stage
+        start : float
+            the start as returned by 'time.perf_counter'
+        end : float
+            the end as returned by 'time.perf_counter'
+        chunk : int or None
+            the index of the chunk, if any
+
+        """
+        tid = threading.current_thread().ident
+        event = {'name': name,
+                 'ph': 'X',
+                 'ts': round((start - self.origin) * 1e6, 3),
+                 'dur': round((end - start) * 1e6, 3),
+                 'pid': self.pid,
+                 'tid': tid,
+                 }
+        if chunk is not None:
+            event['args'] = {'chunk': chunk}
+        with self._lock:
+            if self._fp is None:
+                return
+            if tid not in self._threads:
+                self._threads.add(tid)
+                self._write({'name': 'thread_name',
+                             'ph': 'M',
+                             'pid': self.pid,
+                             'tid': tid,
+                             'args': {'name':
+                                      threading.current_thread().name},
+                             })
+            self._write(event)
+
+    def timed(self, iterable, name):
+        """ Iterate and record an event for each step, with the step number
+        as the chunk.
+        """
+        iterator = iter(iterable)
+        i = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.event(name, start, time.perf_counter(), i)
+            i += 1
+            yield item
+
+    def close(self):
+        """ Finish and close the file, later events are dropped. """
+        with self._lock:
+            if self._fp is None:
+                return
+            if self.format_ == 'chrome':
+                self._fp.write('\n]\n')
+            self._fp.close()
+            self._fp = None
+
+    def __repr__(self):
+        return "%s('%s', %s, %d events)" % \
+            (type(self).__name__, self.filename, self.format_, self.nevents)
+
+
+_TRACER = None
+
+
+def enable_tracing(filename, format_=None):
+    """ Enable the process-wide tracing of packing and unpacking.
+
+    Parameters
+    ----------
+    filename : str
+        the file to write the events to
+    format_ : str or None
+        'chrome' or 'jsonl', see 'Tracer'
+
+    Returns
+    -------
+    tracer : Tracer
+        the newly enabled tracer
+
+    Notes
+    -----
+    A previously enabled tracer is closed. The tracer is closed at exit, if
+    it wasn't disabled before. Tracing can also be enabled by setting the
+    environment variable 'BLOSCPACK_TRACE' to the filename.
+
+    """
+    global _TRACER
+    disable_tracing()
+    _TRACER = Tracer(filename, format_)
+    log.debug("tracing to '%s' (%s)" % (filename, _TRACER.format_))
+    return _TRACER
+
+
+def disable_tracing():
+    """ Disable the process-wide tracing and close the file. """
+    global _TRACER
+    tracer, _TRACER = _TRACER, None
+    if tracer is not None:
+        tracer.close()
+
+
+def get_tracer():
+    """ The process-wide tracer, None if disabled. """
+    return _TRACER
+
+
+atexit.register(disable_tracing)
+if os.environ.get(TRACE_ENV):
+    enable_tracing(os.environ[TRACE_ENV])
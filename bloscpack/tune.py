@@ -0,0 +1,353 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim :set ft=py:
+
+
+from __future__ import division
+
+
+import collections
+import math
+import os
+import threading
+import time
+
+
+import blosc
+import numpy
+import six
+
+
+from .args import (BloscArgs,
+                   )
+from .constants import (ADAPTIVE_CNAME,
+                        BLOSC_MEMCPYED,
+                        CNAME_AVAIL,
+                        )
+from .defaults import (DEFAULT_ADAPTIVE_CODECS,
+                       DEFAULT_ADAPTIVE_MIN_RATIO,
+                       DEFAULT_ADAPTIVE_MIN_GAIN,
+                       DEFAULT_ADAPTIVE_ESCALATE,
+                       DEFAULT_CHUNK_SIZE,
+                       DEFAULT_TYPESIZE,
+                       DEFAULT_TUNE_TARGET,
+                       DEFAULT_TUNE_CLEVELS,
+                       DEFAULT_TUNE_CHUNK_SIZES,
+                       DEFAULT_TUNE_SAMPLE_SIZE,
+                       )
+from .headers import (decode_blosc_sizes,
+                      decode_uint8,
+                      )
+from .pretty import (double_pretty_size,
+                     pretty_size,
+                     reverse_pretty,
+                     )
+from . import log
+
+
+# the weight of the compression ratio versus the throughput
+TUNE_TARGETS = {'speed': 0.0,
+                'balanced': 0.5,
+                'size': 1.0,
+                }
+
+
+def _size(size):
+    return reverse_pretty(size) if isinstance(size, six.string_types) \
+        else size
+
+
+def target_weight(target):
+    """ The weight of the compression ratio for a tuning target.
+
+    Parameters
+    ----------
+    target : str or float
+        one of 'TUNE_TARGETS' or a weight between 0 (throughput only) and 1
+        (compression ratio only)
+
+    Returns
+    -------
+    weight : float
+
+    Raises
+    ------
+    ValueError
+        if the target is unknown or the weight is out of range
+
+    """
+    if isinstance(target, six.string_types):
+        try:
+            return TUNE_TARGETS[target]
+        except KeyError:
+            raise ValueError("unknown target '%s', must be one of: '%s' "
+                             "or a weight between 0 and 1" %
+                             (target, "', '".join(sorted(TUNE_TARGETS))))
+    if not 0 <= target <= 1:
+        raise ValueError("the weight must be between 0 and 1, not: '%s'" %
+                         target)
+    return float(target)
+
+
+def _as_uint8(input_):
+    """ A flat uint8 array of a file name, an ndarray or a bytes like object.
+    """
+    if isinstance(input_, six.string_types):
+        if os.path.getsize(input_) == 0:
+            # can not map an empty file
+            return numpy.empty(0, dtype=numpy.uint8)
+        # only the pages of the samples are read
+        return numpy.memmap(input_, dtype=numpy.uint8, mode='r')
+    elif isinstance(input_, numpy.ndarray):
+        return input_.ravel(order='K').view(numpy.uint8)
+    else:
+        return numpy.frombuffer(input_, dtype=numpy.uint8)
+
+
+def _sample(data, chunk_size, sample_size):
+    """ Evenly spaced chunks of the data, about 'sample_size' bytes in total,
+    but at least one chunk.
+    """
+    nchunks = max(1, -(-len(data) // chunk_size))
+    nsamples = min(nchunks, max(1, sample_size // chunk_size))
+    indices = numpy.unique(
+        numpy.linspace(0, nchunks - 1, nsamples).round().astype(numpy.int64))
+    return [data[i * chunk_size:(i + 1) * chunk_size] for i in indices]
+
+
+def _trial(samples, blosc_args, chunk_size, weight):
+    """ Compress the samples and score the result, higher is better. """
+    nbytes = sum(len(sample) for sample in samples)
+    compressed = 0
+    start = time.perf_counter()
+    for sample in samples:
+        compressed += len(blosc.compress(sample, **blosc_args))
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    ratio = nbytes / max(compressed, 1)
+    throughput = nbytes / elapsed
+    score = (1 - weight) * math.log(throughput) + weight * math.log(ratio)
+    log.verbose("cname: %s, clevel: %d, shuffle: %s, chunk_size: %s, "
+                "ratio: %.2f, throughput: %s/s" %
+                (blosc_args.cname, blosc_args.clevel, blosc_args.shuffle,
+                 pretty_size(chunk_size), ratio, pretty_size(throughput)))
+    return score
+
+
+def autotune(input_,
+             typesize=None,
+             target=DEFAULT_TUNE_TARGET,
+             chunk_size=DEFAULT_CHUNK_SIZE,
+             chunk_sizes=DEFAULT_TUNE_CHUNK_SIZES,
+             cnames=None,
+             clevels=DEFAULT_TUNE_CLEVELS,
+             shuffles=(True, False),
+             sample_size=DEFAULT_TUNE_SAMPLE_SIZE):
+    """ Find the compression parameters that best suit the input.
+
+    Parameters
+    ----------
+    input_ : str, ndarray or bytes like
+        the name of a file, a Numpy array or any object supporting the buffer
+        protocol
+    typesize : int or None
+        the typesize, by default the itemsize of a Numpy array and
+        'DEFAULT_TYPESIZE' for anything else
+    target : str or float
+        'speed', 'size', 'balanced' or the weight of the compression ratio
+        versus the throughput, between 0 and 1
+    chunk_size : int or str
+        the chunk size used to compare the codecs
+    chunk_sizes : sequence of int or str
+        the chunk sizes to compare with the best codec, empty to keep
+        'chunk_size'
+    cnames : sequence of str or None
+        the codecs to compare, by default all those available
+    clevels : sequence of int
+        the compression levels to compare
+    shuffles : sequence of bool
+        the shuffle settings to compare
+    sample_size : int or str
+        the approximate amount of data compressed per candidate
+
+    Returns
+    -------
+    blosc_args : BloscArgs
+        the best blosc args
+    chunk_size : int
+        the best chunk size
+
+    Raises
+    ------
+    ValueError
+        if the target is invalid
+
+    Notes
+    -----
+    The candidates are scored by compressing a sample of evenly spaced chunks
+    of the input. The score is the weighted sum of the logarithms of the
+    compression ratio and the compression throughput, such that with a
+    'balanced' target doubling either counts the same. The codec, level and
+    shuffle are chosen first, then the chunk size for those, which keeps the
+    number of trials low. Timings are taken on this host with the current
+    number of Blosc threads, so the result is specific to both.
+
+    """
+    weight = target_weight(target)
+    data = _as_uint8(input_)
+    if typesize is None:
+        typesize = input_.dtype.itemsize \
+            if isinstance(input_, numpy.ndarray) else DEFAULT_TYPESIZE
+    chunk_size = _size(chunk_size)
+    sample_size = _size(sample_size)
+    if len(data) == 0:
+        log.verbose('nothing to tune for empty input')
+        return BloscArgs(typesize=typesize), chunk_size
+    log.verbose('tuning on a sample of %s of %s' %
+                (pretty_size(sample_size), double_pretty_size(len(data))))
+    compare_size = min(chunk_size, len(data))
+    samples = _sample(data, compare_size, sample_size)
+    best_score, best_args = None, None
+    for cname in cnames or CNAME_AVAIL:
+        for clevel in clevels:
+            for shuffle in shuffles:
+                blosc_args = BloscArgs(typesize=typesize, clevel=clevel,
+                                       shuffle=shuffle, cname=cname)
+                score = _trial(samples, blosc_args, compare_size, weight)
+                if best_score is None or score > best_score:
+                    best_score, best_args = score, blosc_args
+    best_size = compare_size
+    # chunks larger than the input are all the same
+    candidates = sorted(set(min(_size(size), len(data))
+                            for size in chunk_sizes))
+    if candidates:
+        best_score = None
+        for candidate in candidates:
+            score = _trial(_sample(data, candidate, sample_size), best_args,
+                           candidate, weight)
+            if best_score is None or score > best_score:
+                best_score, best_size = score, candidate
+    log.verbose('best: cname: %s, clevel: %d, shuffle: %s, chunk_size: %s' %
+                (best_args.cname, best_args.clevel, best_args.shuffle,
+                 double_pretty_size(best_size)))
+    return best_args, best_size
+
+
+def _auto_blosc_args(blosc_args, input_, chunk_size):
+    """ Tune the blosc args for the input at the given chunk size, if they
+    are 'auto'.
+    """
+    if isinstance(blosc_args, six.string_types):
+        if blosc_args != 'auto':
+            raise ValueError("blosc_args must be a 'BloscArgs' or 'auto', "
+                             "not: '%s'" % blosc_args)
+        blosc_args, _ = autotune(input_, chunk_size=chunk_size,
+                                 chunk_sizes=())
+    return blosc_args
+
+
+class AdaptiveCompressor(object):
+    """ A compression function that picks the codec for each chunk.
+
+    Each chunk is compressed with the first of the 'codecs', which should be
+    cheap. A chunk that doesn't reach 'min_ratio' is considered incompressible
+    and stored with clevel 0, which is a plain copy. Otherwise the next codec
+    is tried only if the ratio so far is within 'escalate', and kept only if
+    it saves at least 'min_gain' of the uncompressed size, and so on. The
+    typesize and the shuffle are taken from the blosc args, the clevel is
+    ignored.
+
+    The band is what keeps the stronger codecs cheap: below it, chunks are
+    close to incompressible and a stronger codec rarely saves enough, above
+    it, there is too little left to save, as 'min_gain' of the uncompressed
+    size would be a large fraction of the compressed one.
+
+    Since every Blosc chunk records its own codec, files packed like this can
+    be read by any reader.
+
+    Parameters
+    ----------
+    compress_func : callable
+        the compression function of the source, see 'PlainSource'
+    codecs : sequence of (str, int)
+        the names and levels of the codecs, from the cheapest to the strongest
+    min_ratio : float
+        the compression ratio below which chunks are stored uncompressed
+    min_gain : float
+        the fraction of the uncompressed size a stronger codec must save
+    escalate : (float, float)
+        the lowest and the highest compression ratio for which the next codec
+        is tried
+
+    Attributes
+    ----------
+    choices : Counter
+        the number of chunks per codec and level chosen so far, 'None' as the
+        codec for stored chunks
+
+    """
+
+    def __init__(self, compress_func,
+                 codecs=DEFAULT_ADAPTIVE_CODECS,
+                 min_ratio=DEFAULT_ADAPTIVE_MIN_RATIO,
+                 min_gain=DEFAULT_ADAPTIVE_MIN_GAIN,
+                 escalate=DEFAULT_ADAPTIVE_ESCALATE):
+        self.compress_func = compress_func
+        self.codecs = codecs
+        self.min_ratio = min_ratio
+        self.min_gain = min_gain
+        # beyond a ratio of '1 / min_gain' not even dropping everything would
+        # save enough
+        self.escalate = escalate[0], min(escalate[1], 1 / min_gain)
+        self.choices = collections.Counter()
+        # chunks may be compressed on a thread pool
+        self._lock = threading.Lock()
+
+    def __call__(self, chunk, blosc_args):
+        trial_args = {'typesize': blosc_args['typesize'],
+                      'shuffle': blosc_args['shuffle'],
+                      }
+        (cname, clevel), others = self.codecs[0], self.codecs[1:]
+        trial_args['cname'], trial_args['clevel'] = cname, clevel
+        best = self.compress_func(chunk, trial_args)
+        nbytes, best_size = decode_blosc_sizes(best)
+        choice = (cname, clevel)
+        if nbytes < self.min_ratio * best_size:
+            # not worth compressing, nor decompressing
+            if not decode_uint8(best[2]) & BLOSC_MEMCPYED:
+                trial_args['clevel'] = 0
+                best = self.compress_func(chunk, trial_args)
+            choice = (None, 0)
+        elif self.escalate[0] * best_size <= nbytes <= \
+                self.escalate[1] * best_size:
+            # outside the band, decided on the ratio alone, before paying for
+            # the stronger codecs
+            for cname, clevel in others:
+                trial_args['cname'], trial_args['clevel'] = cname, clevel
+                compressed = self.compress_func(chunk, trial_args)
+                size = decode_blosc_sizes(compressed)[1]
+                if best_size - size < self.min_gain * nbytes:
+                    break
+                best, best_size, choice = compressed, size, (cname, clevel)
+                if not self.escalate[0] * best_size <= nbytes <= \
+                        self.escalate[1] * best_size:
+                    break
+        with self._lock:
+            self.choices[choice] += 1
+        return best
+
+    def summary(self):
+        """ The choices so far, as a human readable string. """
+        return ', '.join("%s: %d" % ('stored' if cname is None else
+                                     '%s (%d)' % (cname, clevel), count)
+                         for (cname, clevel), count in
+                         sorted(self.choices.items(),
+                                key=lambda item: -item[1]))
+
+
+def _compress_func(compress_func, blosc_args):
+    """ The compression function for the blosc args, an 'AdaptiveCompressor'
+    if the codec is 'adaptive'.
+    """
+    if blosc_args['cname'] == ADAPTIVE_CNAME:
+        return AdaptiveCompressor(compress_func)
+    return compress_func
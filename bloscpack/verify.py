@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim :set ft=py:
+
+
+import collections
+import mmap
+import threading
+
+
+import blosc
+import numpy
+
+
+from .constants import (BLOSC_HEADER_LENGTH,
+                        ZERO_CHUNK_OFFSET,
+                        )
+from .exceptions import (ChecksumMismatch,
+                         CorruptedChunk,
+                         IndexMismatch,
+                         )
+from .file_io import (CompressedFPSource,
+                      _madvise,
+                      )
+from .headers import (decode_blosc_sizes,
+                      )
+from .index import (reconstruct_offsets,
+                    )
+from .parallel import (check_workers,
+                       ordered_map,
+                       released_gil,
+                       )
+from .pretty import (double_pretty_size,
+                     )
+from .stats import (clock,
+                    stats_or_stand_in,
+                    timed,
+                    )
+from . import log
+
+
+def _file_offsets(source):
+    """ The offsets of the chunks, reconstructed from the chunks themselves
+    if the file has none.
+    """
+    offsets = source.offsets
+    if len(offsets) == 0 and source.nchunks != 0:
+        source.input_fp.seek(source.first_chunk)
+        try:
+            offsets = reconstruct_offsets(source.input_fp,
+                                          source.bloscpack_header)
+        except IndexMismatch as im:
+            raise CorruptedChunk(str(im))
+        log.verbose("file has no offsets, reconstructed '%d'" % len(offsets))
+    elif source.nchunks != -1 and len(offsets) != source.nchunks:
+        raise CorruptedChunk("file has '%d' offsets, expected '%d'" %
+                             (len(offsets), source.nchunks))
+    return offsets
+
+
+def _stored_chunks(view, offsets, digest_size, omitted):
+    """ Yield '(i, compressed, digest, nbytes)' for every chunk that is
+    stored, shared chunks only once.
+
+    Chunks which are not stored are counted by kind in 'omitted'.
+
+    """
+    seen = set()
+    for i, position in enumerate(offsets.tolist()):
+        if position == ZERO_CHUNK_OFFSET:
+            omitted['zeros'] += 1
+            continue
+        if position in seen:
+            omitted['duplicate'] += 1
+            continue
+        seen.add(position)
+        if not 0 <= position <= len(view) - BLOSC_HEADER_LENGTH:
+            raise CorruptedChunk("chunk '%d' at '%d' is outside of the file"
+                                 % (i, position))
+        nbytes, ctbytes = decode_blosc_sizes(
+            view[position:position + BLOSC_HEADER_LENGTH])
+        end = position + ctbytes
+        if ctbytes < BLOSC_HEADER_LENGTH or end + digest_size > len(view):
+            raise CorruptedChunk("chunk '%d' at '%d' is truncated" %
+                                 (i, position))
+        yield i, view[position:end], \
+            view[end:end + digest_size] if digest_size > 0 else None, nbytes
+
+
+def verify_file(filename, decompress=False, workers=1, max_inflight=None,
+                stats=None):
+    """ Check the integrity of a compressed file without writing any output.
+
+    Parameters
+    ----------
+    filename : str
+        the name of the file
+    decompress : bool
+        also decompress every chunk, which is slower but catches corruption
+        that the checksums can't, e.g. in files without checksums
+    workers : int
+        the number of threads used to check chunks
+    max_inflight : int
+        the maximum number of chunks being checked at any one time, by
+        default twice the number of workers
+    stats : Stats
+        if given, filled in with the timings and sizes, 'bytes_in' are the
+        compressed chunks including their checksums and 'bytes_out' their
+        uncompressed size
+
+    Returns
+    -------
+    nchunks : int
+        the number of chunks checked, chunks which are shared or not stored
+        are not counted
+
+    Raises
+    ------
+    FormatVersionMismatch
+        if the file has an unmatching format version number
+    ChecksumMismatch
+        if any of the chunks fail to produce the correct checksum
+    CorruptedChunk
+        if any of the chunks is outside of the file, truncated, doesn't have
+        the size the header says, or, with 'decompress', can't be decompressed
+
+    Notes
+    -----
+    The file is memory mapped and the chunks are located via the offsets,
+    which are reconstructed from the chunk headers for files without any.
+    Chunks shared via deduplication are checked once, chunks of zeros that
+    were not stored have nothing to check. With 'workers' larger than one the
+    chunks are checked on a thread pool, since reading them from the map
+    happens there too, the throughput is limited by the disk rather than by a
+    single core.
+
+    """
+    max_inflight = check_workers(workers, max_inflight)
+    stats = stats_or_stand_in(stats)
+    stats.start('verify')
+    with open(filename, 'rb') as input_fp:
+        source = CompressedFPSource(input_fp)
+        offsets = _file_offsets(source)
+        checksum_impl = source.checksum_impl
+        chunk_size = source.chunk_size
+        nchunks = len(offsets)
+        # with an unknown number of chunks the size of the last is unknown
+        last_chunk = source.last_chunk if source.nchunks != -1 else None
+        if checksum_impl.size == 0:
+            log.verbose('file has no checksums%s' %
+                        ('' if decompress else
+                         ', only the structure is checked'))
+        map_ = mmap.mmap(input_fp.fileno(), 0, access=mmap.ACCESS_READ)
+    # decompress into one buffer per thread, rather than allocating
+    local = threading.local()
+
+    def check(i, compressed, digest, nbytes):
+        start = clock()
+        if digest is not None:
+            computed_digest = checksum_impl(compressed)
+            if digest != computed_digest:
+                raise ChecksumMismatch(
+                    "checksum mismatch detected in chunk '%d', expected: "
+                    "'%s', received: '%s'" %
+                    (i, repr(bytes(digest)), repr(computed_digest)))
+        start = stats.add('checksum', start, i)
+        expected = chunk_size if i != nchunks - 1 else last_chunk
+        if nbytes != expected and (expected is not None or
+                                   not 0 < nbytes <= chunk_size):
+            raise CorruptedChunk("chunk '%d' has '%d' bytes, expected '%s'" %
+                                 (i, nbytes, expected))
+        if decompress:
+            buffer_ = getattr(local, 'buffer_', None)
+            if buffer_ is None:
+                buffer_ = local.buffer_ = numpy.empty(chunk_size,
+                                                      dtype=numpy.uint8)
+            try:
+                bwritten = blosc.decompress_ptr(
+                    compressed, buffer_.__array_interface__['data'][0])
+            except Exception as e:
+                raise CorruptedChunk("chunk '%d' can't be decompressed: %s" %
+                                     (i, e))
+            if bwritten != nbytes:
+                raise CorruptedChunk("chunk '%d' decompressed to '%d' bytes, "
+                                     "expected '%d'" % (i, bwritten, nbytes))
+            stats.add('decompress', start, i)
+
+    omitted = collections.Counter()
+    # the map is closed once the last slice of it is gone
+    _madvise(map_, 'MADV_SEQUENTIAL')
+    chunks = timed(_stored_chunks(memoryview(map_), offsets,
+                                  checksum_impl.size, omitted),
+                   stats, 'read')
+    checked = 0
+    if workers > 1:
+        log.verbose('checking with %d workers, at most %d chunks in flight' %
+                    (workers, max_inflight))
+        with released_gil():
+            for (i, compressed, digest, nbytes), _ in ordered_map(
+                    check, chunks, workers, max_inflight):
+                _count_checked(stats, compressed, digest, nbytes)
+                checked += 1
+    else:
+        for i, compressed, digest, nbytes in chunks:
+            check(i, compressed, digest, nbytes)
+            _count_checked(stats, compressed, digest, nbytes)
+            checked += 1
+    stats.nchunks = nchunks
+    stats.stop()
+    if omitted['duplicate']:
+        log.verbose("skipped '%d' duplicate chunks" % omitted['duplicate'])
+    if omitted['zeros']:
+        log.verbose("skipped '%d' chunks of zeros" % omitted['zeros'])
+    log.verbose("checked '%d' chunks, %s" %
+                (checked, double_pretty_size(stats.bytes_in)))
+    return checked
+
+
+def _count_checked(stats, compressed, digest, nbytes):
+    """ Count a checked chunk in the stats. """
+    stats.bytes_in += len(compressed) + (len(digest) if digest else 0)
+    stats.bytes_out += nbytes
+    stats.add_ratio(nbytes, len(compressed))
@@ -122,7 +122,10 @@ def test_append_fp():
             'offsets': True,
             'checksum': 'adler32',
             'typesize': 8,
-            'metadata': False
+            'metadata': False,
+            'trailer': False,
+            'dedup': False,
+            'sparse': False,
     }
     expected_app_offsets = [1440]
     assert expected_app_bloscpack_header == app_bloscpack_header
@@ -270,6 +273,42 @@ def test_append_metadata():
     assert dcmp_str == new_str * 2
 
 
+def test_append_trailer():
+    bloscpack_args = BloscpackArgs(trailer=True, max_app_chunks=0)
+    orig, new, new_size, dcmp = prep_array_for_append(
+        bloscpack_args=bloscpack_args)
+    new_str = new.read()
+    new.seek(0)
+    # no space needs to be reserved
+    assert 15 == reset_append_fp(orig, new, new_size)
+    bloscpack_header, _, _, offsets = reset_read_beginning(orig)
+    assert -1 == BloscpackHeader.decode(orig.read(32)).nchunks
+    orig.seek(0)
+    assert 31 == bloscpack_header.nchunks
+    assert 31 == len(offsets)
+    # the offsets and the trailer follow right after the last chunk
+    size = len(orig.getvalue())
+    orig.seek(offsets[-1])
+    compressed, _, digest = _read_compressed_chunk_fp(
+        orig, bloscpack_header.checksum_impl)
+    assert size - 31 * 8 - 32 == orig.tell()
+    orig.seek(0)
+    # into the last chunk only
+    assert 0 == reset_append_fp(orig, StringIO(b'abc'), 3)
+    unpack(CompressedFPSource(orig), PlainFPSink(dcmp))
+    assert new_str * 2 + b'abc' == dcmp.getvalue()
+
+
+def test_append_adaptive():
+    blosc_args = BloscArgs(cname='adaptive')
+    orig, new, new_size, dcmp = prep_array_for_append(blosc_args=blosc_args)
+    new_str = new.read()
+    new.seek(0)
+    reset_append_fp(orig, new, new_size, blosc_args=blosc_args)
+    unpack(CompressedFPSource(orig), PlainFPSink(dcmp))
+    assert new_str * 2 == dcmp.getvalue()
+
+
 def test_append_fp_no_offsets():
     bloscpack_args = BloscpackArgs(offsets=False)
     orig, new, new_size, dcmp = prep_array_for_append(bloscpack_args=bloscpack_args)
@@ -277,6 +316,15 @@ def test_append_fp_no_offsets():
         append_fp(orig, new, new_size)
 
 
+def test_append_fp_dedup_sparse():
+    for bloscpack_args in (BloscpackArgs(dedup=True),
+                           BloscpackArgs(sparse=True)):
+        orig, new, new_size, dcmp = prep_array_for_append(
+            bloscpack_args=bloscpack_args)
+        with pytest.raises(RuntimeError):
+            append_fp(orig, new, new_size)
+
+
 def test_append_fp_not_enough_space():
     bloscpack_args = BloscpackArgs(max_app_chunks=0)
     orig, new, new_size, dcmp = prep_array_for_append(bloscpack_args=bloscpack_args)
@@ -17,6 +17,9 @@ from bloscpack.args import (DEFAULT_BLOSC_ARGS,
                             DEFAULT_OFFSETS,
                             DEFAULT_CHECKSUM,
                             DEFAULT_MAX_APP_CHUNKS,
+                            DEFAULT_TRAILER,
+                            DEFAULT_DEDUP,
+                            DEFAULT_SPARSE,
                             calculate_nchunks,
                             _handle_max_apps,
                             _check_blosc_args,
@@ -142,3 +145,6 @@ class TestBloscpackArgs(TestCase):
         self.assertEqual(DEFAULT_OFFSETS, bloscpack_args.offsets)
         self.assertEqual(DEFAULT_CHECKSUM, bloscpack_args.checksum)
         self.assertEqual(DEFAULT_MAX_APP_CHUNKS, bloscpack_args.max_app_chunks)
+        self.assertEqual(DEFAULT_TRAILER, bloscpack_args.trailer)
+        self.assertEqual(DEFAULT_DEDUP, bloscpack_args.dedup)
+        self.assertEqual(DEFAULT_SPARSE, bloscpack_args.sparse)
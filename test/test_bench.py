@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+# vim :set ft=py:
+
+
+import csv
+import json
+import os.path as path
+
+
+import blosc
+import numpy as np
+import pytest
+
+
+from bloscpack.bench import (BENCH_COLUMNS,
+                             bench,
+                             create_synthetic,
+                             format_results,
+                             )
+from bloscpack.sysutil import (peak_rss,
+                               )
+from bloscpack.testutil import (create_tmp_files,
+                                )
+
+
+def test_create_synthetic():
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        create_synthetic(in_file, '5M')
+        assert 5 * 2 ** 20 == path.getsize(in_file)
+        a = np.fromfile(in_file)
+        assert 0 == a[0]
+        assert np.all(np.diff(a[:2 ** 21]) > 0)
+        create_synthetic(in_file, 100)
+        assert 100 == path.getsize(in_file)
+
+
+def test_bench():
+    nthreads = blosc.nthreads
+    results = bench(size='2M', cnames=('blosclz', 'lz4'),
+                    chunk_sizes=('256K', 2 ** 20), checksums=('None',),
+                    nthreads=(1, 2), workers=(1, 2), repeats=2)
+    # every combination, in order
+    assert 16 == len(results)
+    assert ['blosclz'] * 8 + ['lz4'] * 8 == [r['cname'] for r in results]
+    assert [2 ** 18] * 4 + [2 ** 20] * 4 == \
+        [r['chunk_size'] for r in results[:8]]
+    assert [1, 1, 2, 2] * 4 == [r['nthreads'] for r in results]
+    assert [1, 2] * 8 == [r['workers'] for r in results]
+    for result in results:
+        assert list(BENCH_COLUMNS) == list(result)
+        assert result['ratio'] > 10
+        assert result['pack'] > 0
+        assert result['unpack'] > 0
+    # the number of threads is restored
+    assert nthreads == blosc.nthreads
+    with pytest.raises(ValueError):
+        bench(size='1M', repeats=0)
+
+
+def test_bench_file():
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        with open(in_file, 'wb') as fp:
+            fp.write(np.random.RandomState(42).bytes(2 ** 20))
+        result, = bench(in_file, cnames=('lz4',), repeats=1)
+        # random data does not compress
+        assert result['ratio'] < 1
+        assert 'lz4' == result['cname']
+
+
+def test_format_results():
+    results = bench(size='1M', clevels=(1, 9), repeats=1)
+    table = format_results(results).splitlines()
+    assert 3 == len(table)
+    assert table[0].split() == list(BENCH_COLUMNS)
+    assert '1.0M' == table[1].split()[2]
+    assert table[1].split()[7].endswith('/s')
+    rows = list(csv.reader(format_results(results, 'csv').splitlines()))
+    assert list(BENCH_COLUMNS) == rows[0]
+    assert ['blosclz', '1', str(2 ** 20)] == rows[1][:3]
+    assert results == json.loads(format_results(results, 'json'))
+    with pytest.raises(ValueError):
+        format_results(results, 'xml')
+
+
+def test_peak_rss():
+    rss = peak_rss()
+    if rss is None:
+        pytest.skip('peak RSS not supported')
+    a = np.ones(2 ** 22)
+    assert peak_rss() >= rss
+    assert peak_rss() >= a.nbytes
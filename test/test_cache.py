@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+# vim :set ft=py:
+
+
+import threading
+
+
+import numpy as np
+import pytest
+
+
+from bloscpack.append import (append_fp,
+                              )
+from bloscpack.cache import (ChunkCache,
+                             HeaderCache,
+                             enable_header_cache,
+                             disable_header_cache,
+                             get_header_cache,
+                             invalidate_header_cache,
+                             file_identity,
+                             stat_identity,
+                             )
+from bloscpack.compat_util import StringIO
+from bloscpack.file_io import (pack_bytes_to_file,
+                               pack_bytes_to_bytes,
+                               unpack_bytes_from_file,
+                               _read_beginning,
+                               )
+from bloscpack.reader import (BloscpackReader,
+                              )
+from bloscpack.headers import (BloscpackHeader,
+                               )
+from bloscpack.testutil import (create_tmp_files,
+                                )
+
+
+def test_lru_eviction():
+    cache = ChunkCache(max_bytes=10)
+    cache.put('a', b'xxxx')
+    cache.put('b', b'yyyy')
+    assert b'xxxx' == cache.get('a')
+    # 'b' is now the least recently used
+    cache.put('c', b'zzzz')
+    assert 'b' not in cache
+    assert 'a' in cache and 'c' in cache
+    assert None is cache.get('b')
+    assert {'hits': 1,
+            'misses': 1,
+            'evictions': 1,
+            'nbytes': 8,
+            'max_bytes': 10,
+            'nchunks': 2,
+            } == cache.stats
+    # replacing an entry doesn't count twice
+    cache.put('a', b'xx')
+    assert 6 == cache.nbytes
+    # too large to be cached at all
+    cache.put('d', b'x' * 11)
+    assert 'd' not in cache
+    assert 2 == len(cache)
+    cache.clear()
+    assert 0 == len(cache)
+    assert 0 == cache.nbytes
+
+
+def test_max_bytes():
+    assert 2 ** 20 == ChunkCache('1M').max_bytes
+    with pytest.raises(ValueError):
+        ChunkCache(-1)
+
+
+def test_file_identity():
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        with open(in_file, 'wb') as fp:
+            fp.write(b'abc')
+        with open(in_file, 'rb') as fp1, open(in_file, 'rb') as fp2:
+            assert file_identity(fp1) == file_identity(fp2)
+        with open(in_file, 'ab') as fp:
+            fp.write(b'def')
+        with open(in_file, 'rb') as fp3:
+            assert file_identity(fp1) != file_identity(fp3)
+    sio = StringIO()
+    assert file_identity(sio) != file_identity(sio)
+
+
+def test_shared_between_readers():
+    data = np.arange(100000, dtype=np.int64).tobytes()
+    cache = ChunkCache()
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        pack_bytes_to_file(data, out_file, chunk_size=100000)
+        with BloscpackReader(out_file, cache=cache) as reader:
+            assert data[150000:250000] == reader.read(250000)[150000:]
+        assert 3 == cache.misses
+        assert 0 == cache.hits
+        with BloscpackReader(out_file, cache=cache) as reader:
+            reader.seek(150000)
+            assert data[150000:250000] == reader.read(100000)
+        assert 2 == cache.hits
+
+
+def test_shared_between_in_memory_readers():
+    cache = ChunkCache()
+    # readers created one after another, such that the ids of the buffers
+    # are likely to be reused
+    for n in range(20):
+        data = np.full(10000, n, dtype=np.int64).tobytes()
+        with BloscpackReader(StringIO(pack_bytes_to_bytes(
+                data, chunk_size=30000)), cache=cache) as reader:
+            assert data == reader.read()
+    assert 0 == cache.hits
+
+
+def test_thread_safety():
+    cache = ChunkCache(max_bytes=1000)
+
+    def work(n):
+        for i in range(1000):
+            key = (n, i % 30)
+            if cache.get(key) is None:
+                cache.put(key, b'x' * (i % 50))
+    threads = [threading.Thread(target=work, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert 8000 == cache.hits + cache.misses
+    assert cache.nbytes <= 1000
+    assert cache.nbytes == sum(len(v) for v in cache._entries.values())
+
+
+@pytest.fixture
+def header_cache():
+    yield enable_header_cache(max_entries=4)
+    disable_header_cache()
+
+
+def test_header_cache_hit(header_cache):
+    data = np.arange(100000, dtype=np.int64).tobytes()
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        pack_bytes_to_file(data, out_file, chunk_size=100000,
+                           metadata={'a': 1})
+        with open(out_file, 'rb') as fp:
+            bloscpack_header, metadata, metadata_header, offsets = \
+                _read_beginning(fp)
+            position = fp.tell()
+        assert 1 == header_cache.misses
+        with open(out_file, 'rb') as fp:
+            beginning = _read_beginning(fp)
+            # positioned at the first chunk, as if parsed
+            assert position == fp.tell()
+        assert 1 == header_cache.hits
+        assert bloscpack_header == beginning[0]
+        assert metadata == beginning[1]
+        assert metadata_header == beginning[2]
+        np.testing.assert_array_equal(offsets, beginning[3])
+        # the copies handed out are independent of the cached entry
+        beginning[0].nchunks = 0
+        beginning[1]['a'] = 2
+        with open(out_file, 'rb') as fp:
+            assert bloscpack_header == _read_beginning(fp)[0]
+        assert data == unpack_bytes_from_file(out_file)[0]
+        assert 3 == header_cache.hits
+
+
+def test_header_cache_not_used():
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        pack_bytes_to_file(b'abc', out_file)
+        # disabled by default
+        assert get_header_cache() is None
+        header_cache = enable_header_cache()
+        try:
+            # neither for in-memory file pointers ...
+            assert stat_identity(StringIO()) is None
+            # ... nor for files not positioned at their start
+            with open(out_file, 'rb') as fp:
+                fp.seek(1)
+                with pytest.raises(Exception):
+                    _read_beginning(fp)
+            assert 0 == header_cache.hits + header_cache.misses
+        finally:
+            disable_header_cache()
+
+
+def test_header_cache_invalidation(header_cache):
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        pack_bytes_to_file(b'abc' * 1000, out_file, chunk_size=1000)
+        with open(out_file, 'r+b') as fp:
+            nchunks = _read_beginning(fp)[0].nchunks
+            fp.seek(0)
+            append_fp(fp, StringIO(b'def' * 1000), 3000)
+            # no stale entry for the appended file
+            assert stat_identity(fp) not in header_cache
+        with open(out_file, 'rb') as fp:
+            assert nchunks + 3 == _read_beginning(fp)[0].nchunks
+        # rewriting the file invalidates too
+        pack_bytes_to_file(b'abc', out_file)
+        with open(out_file, 'rb') as fp:
+            assert 1 == _read_beginning(fp)[0].nchunks
+            identity = stat_identity(fp)
+        assert identity in header_cache
+        invalidate_header_cache(out_file)
+        assert identity not in header_cache
+        with open(out_file, 'rb') as fp:
+            _read_beginning(fp)
+        invalidate_header_cache()
+        assert 0 == len(header_cache)
+
+
+def test_header_cache_bounded():
+    cache = HeaderCache(max_entries=2)
+    beginning = (BloscpackHeader(), None, None, None), 32
+    cache.put('a', beginning)
+    cache.put('b', beginning)
+    cache.get('a')
+    cache.put('c', beginning)
+    assert 'a' in cache
+    assert 'b' not in cache
+    assert 'c' in cache
+    assert {'hits': 1, 'misses': 0, 'evictions': 1,
+            'nfiles': 2, 'max_entries': 2} == cache.stats
@@ -5,6 +5,10 @@
 from __future__ import print_function
 
 
+import mmap
+import os
+import os.path as path
+
 import blosc
 import pytest
 from unittest.mock import patch
@@ -19,6 +23,7 @@ from bloscpack.compat_util import StringIO
 from bloscpack.constants import (MAX_FORMAT_VERSION,
                                  BLOSCPACK_HEADER_LENGTH,
                                  BLOSC_HEADER_LENGTH,
+                                 ZERO_CHUNK_OFFSET,
                                  )
 from bloscpack.defaults import (DEFAULT_CHUNK_SIZE,
                                 )
@@ -26,8 +31,14 @@ from bloscpack.exceptions import (FormatVersionMismatch,
                                   ChecksumMismatch,
                                   )
 from bloscpack.file_io import (PlainFPSource,
+                               PlainFPBufferSource,
+                               PlainFPPrefetchSource,
+                               PlainMmapSource,
                                PlainFPSink,
+                               PlainFPBufferSink,
+                               PlainMmapSink,
                                CompressedFPSource,
+                               CompressedMmapSource,
                                CompressedFPSink,
                                pack_file_to_file,
                                unpack_file_from_file,
@@ -35,6 +46,10 @@ from bloscpack.file_io import (PlainFPSource,
                                unpack_bytes_from_file,
                                pack_bytes_to_bytes,
                                unpack_bytes_from_bytes,
+                               pack_stream_to_file,
+                               unpack_stream_from_file,
+                               peek_file,
+                               PlainStreamSource,
                                _read_bloscpack_header,
                                _read_offsets,
                                _read_beginning,
@@ -44,6 +59,8 @@ from bloscpack.file_io import (PlainFPSource,
 from bloscpack.headers import (decode_blosc_header,
                                )
 from bloscpack.pretty import reverse_pretty
+from bloscpack.reader import (BloscpackReader,
+                              )
 from bloscpack.abstract_io import (pack, unpack)
 from bloscpack.testutil import (create_array,
                                 create_array_fp,
@@ -67,6 +84,10 @@ def test_offsets():
             # We assume that the others are correct
             assert offsets[0] == first
             assert 736 == offsets[0]
+            # only the used entries, the fp is positioned at the first chunk
+            assert bloscpack_header.nchunks == len(offsets)
+            assert np.int64 == offsets.dtype
+            assert first == input_fp.tell()
             # try to read the second header
             input_fp.seek(offsets[1], 0)
             blosc_header_raw = input_fp.read(BLOSC_HEADER_LENGTH)
@@ -181,6 +202,8 @@ def test_file_corruption():
         # now attempt to unpack it
         with pytest.raises(ChecksumMismatch):
             unpack_file_from_file(out_file, dcmp_file)
+        with pytest.raises(ChecksumMismatch):
+            unpack_file_from_file(out_file, dcmp_file, workers=2)
 
 
 def pack_unpack(repeats, chunk_size=None, progress=False):
@@ -242,6 +265,512 @@ def test_pack_unpack_fp():
     pack_unpack_fp(1, chunk_size=reverse_pretty('8M'))
 
 
+def test_pack_unpack_workers():
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        create_array(1, in_file)
+        pack_file_to_file(in_file, out_file, chunk_size='1M',
+                          workers=4, max_inflight=3)
+        unpack_file_from_file(out_file, dcmp_file)
+        cmp_file(in_file, dcmp_file)
+        unpack_file_from_file(out_file, dcmp_file, workers=4, max_inflight=3)
+        cmp_file(in_file, dcmp_file)
+        # the file must be identical to the one packed sequentially
+        with open(out_file, 'rb') as fp:
+            parallel = fp.read()
+        pack_file_to_file(in_file, out_file, chunk_size='1M')
+        with open(out_file, 'rb') as fp:
+            assert fp.read() == parallel
+
+
+def test_pack_unpack_prefetch():
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        create_array(1, in_file)
+        pack_file_to_file(in_file, out_file, chunk_size='1M')
+        with open(out_file, 'rb') as fp:
+            expected = fp.read()
+        for workers in (1, 3):
+            pack_file_to_file(in_file, out_file, chunk_size='1M',
+                              prefetch=2, workers=workers)
+            with open(out_file, 'rb') as fp:
+                assert expected == fp.read()
+        # zero length input
+        open(in_file, 'wb').close()
+        pack_file_to_file(in_file, out_file, prefetch=2)
+        unpack_file_from_file(out_file, dcmp_file)
+        cmp_file(in_file, dcmp_file)
+
+
+def test_prefetch_source_recycles_buffers():
+    in_fp = StringIO(b'abcdefghij')
+    source = PlainFPPrefetchSource(in_fp, prefetch=1)
+    source.configure(4, 2, 3)
+    received = []
+    buffers = set()
+    for chunk in source:
+        received.append(chunk.tobytes())
+        buffers.add(id(chunk if chunk.base is None else chunk.base))
+        source.release(chunk)
+    assert [b'abcd', b'efgh', b'ij'] == received
+    # at most one being read ahead and one being consumed
+    assert len(buffers) <= 2
+
+
+def test_buffer_source():
+    in_fp = StringIO(b'abcdefghij')
+    source = PlainFPBufferSource(in_fp)
+    source.configure(4, 2, 3)
+    received = []
+    buffers = set()
+    for chunk in source:
+        received.append(chunk.tobytes())
+        buffers.add(id(chunk if chunk.base is None else chunk.base))
+        source.release(chunk)
+    assert [b'abcd', b'efgh', b'ij'] == received
+    assert 1 == len(buffers)
+
+
+def test_buffer_source_identical_output():
+    # same bytes as the plain source, including a trailing partial item
+    input_bytes = np.linspace(0, 1, 100000).tobytes() + b'abc'
+    received = []
+    for source_class in (PlainFPSource, PlainFPBufferSource):
+        out_fp = StringIO()
+        source = source_class(StringIO(input_bytes))
+        pack(source, CompressedFPSink(out_fp),
+             *calculate_nchunks(len(input_bytes), chunk_size=65536))
+        received.append(out_fp.getvalue())
+    assert received[0] == received[1]
+    output_bytes, _ = unpack_bytes_from_bytes(received[1])
+    assert input_bytes == output_bytes
+
+
+def test_prefetch_source_stops_early():
+    in_fp = StringIO(b'a' * 100)
+    source = PlainFPPrefetchSource(in_fp, prefetch=1)
+    source.configure(10, 10, 10)
+    for i, chunk in enumerate(source):
+        if i == 2:
+            break
+    with pytest.raises(ValueError):
+        PlainFPPrefetchSource(in_fp, prefetch=0)
+
+
+def test_unpack_sinks():
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        create_array(1, in_file)
+        pack_file_to_file(in_file, out_file, chunk_size='1M')
+        for workers, use_mmap in ((1, True), (3, True), (1, False),
+                                  (3, False)):
+            unpack_file_from_file(out_file, dcmp_file,
+                                  workers=workers, use_mmap=use_mmap)
+            cmp_file(in_file, dcmp_file)
+        # zero length input
+        open(in_file, 'wb').close()
+        pack_file_to_file(in_file, out_file)
+        unpack_file_from_file(out_file, dcmp_file, use_mmap=True)
+        cmp_file(in_file, dcmp_file)
+
+
+def test_buffer_sink_reuses_buffer():
+    in_fp, out_fp = StringIO(), StringIO()
+    create_array_fp(1, in_fp)
+    in_fp.seek(0)
+    pack(PlainFPSource(in_fp), CompressedFPSink(out_fp),
+         *calculate_nchunks(len(in_fp.getvalue()), chunk_size='1M'))
+    out_fp.seek(0)
+    dcmp_fp = StringIO()
+    sink = PlainFPBufferSink(dcmp_fp)
+    buffers = set()
+    for compressed, digest in CompressedFPSource(out_fp):
+        sink.put(compressed)
+        buffers.update(id(buffer_) for buffer_ in sink.buffers)
+    assert 1 == len(buffers)
+    assert in_fp.getvalue() == dcmp_fp.getvalue()
+    # in parallel, there are no more buffers than chunks in flight
+    out_fp.seek(0)
+    dcmp_fp = StringIO()
+    sink = PlainFPBufferSink(dcmp_fp)
+    unpack(CompressedFPSource(out_fp), sink, workers=3, max_inflight=4)
+    assert 1 <= len(sink.buffers) <= 5
+    assert in_fp.getvalue() == dcmp_fp.getvalue()
+
+
+def test_mmap_sink_rejects_oversized_chunk():
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        with open(dcmp_file, 'w+b') as fp:
+            sink = PlainMmapSink(fp)
+            sink.configure(8, 8, 1)
+            with pytest.raises(ValueError):
+                sink.put(blosc.compress(b'x' * 16, typesize=1))
+            sink.finalize()
+
+
+def test_pack_mmap_source():
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        create_array(1, in_file)
+        # make sure there is a trailing partial item
+        with open(in_file, 'ab') as fp:
+            fp.write(b'abc')
+        pack_file_to_file(in_file, out_file, chunk_size='1M')
+        with open(out_file, 'rb') as fp:
+            expected = fp.read()
+        for workers in (1, 3):
+            pack_file_to_file(in_file, out_file, chunk_size='1M',
+                              use_mmap=True, workers=workers)
+            with open(out_file, 'rb') as fp:
+                assert expected == fp.read()
+        unpack_file_from_file(out_file, dcmp_file)
+        cmp_file(in_file, dcmp_file)
+        # zero length input
+        open(in_file, 'wb').close()
+        pack_file_to_file(in_file, out_file, use_mmap=True)
+        unpack_file_from_file(out_file, dcmp_file)
+        cmp_file(in_file, dcmp_file)
+
+
+def test_mmap_source_releases_whole_pages():
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        with open(in_file, 'wb') as fp:
+            fp.write(b'x' * 10000)
+        with open(in_file, 'rb') as fp:
+            source = PlainMmapSource(fp)
+            source.configure(3000, 1000, 4)
+            chunks = list(source)
+            assert [3000, 3000, 3000, 1000] == [len(c) for c in chunks]
+            source.release(chunks[0])
+            assert 0 == source.released % mmap.PAGESIZE
+            assert source.released <= 3000
+            for chunk in chunks[1:]:
+                source.release(chunk)
+            assert 10000 - 10000 % mmap.PAGESIZE == source.released
+            del chunk, chunks
+            map_ = source.map_
+            source.close()
+            assert map_.closed
+            assert source.map_ is None
+            # closing twice is fine
+            source.close()
+        # as a context manager, and with chunks still in use
+        with open(in_file, 'rb') as fp:
+            with PlainMmapSource(fp) as source:
+                source.configure(3000, 1000, 4)
+                map_ = source.map_
+                chunks = list(source)
+            assert source.map_ is None
+            assert not map_.closed
+            assert b'x' * 3000 == chunks[0].tobytes()
+
+
+def test_compressed_mmap_source():
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        create_array(1, in_file)
+        for offsets, checksum in ((True, 'adler32'),
+                                  (False, 'adler32'),
+                                  (True, 'None')):
+            pack_file_to_file(in_file, out_file, chunk_size='1M',
+                              bloscpack_args=BloscpackArgs(
+                                  offsets=offsets, checksum=checksum))
+            with open(out_file, 'rb') as fp:
+                expected = [(bytes(c), d) for c, d in CompressedFPSource(fp)]
+            with open(out_file, 'rb') as fp:
+                with CompressedMmapSource(fp) as source:
+                    map_ = source.map_
+                    chunks = list(source)
+                    assert all(isinstance(c, memoryview) for c, _ in chunks)
+                    assert expected == [(bytes(c),
+                                         None if d is None else bytes(d))
+                                        for c, d in chunks]
+                    del chunks
+                assert map_.closed
+                assert source.map_ is None
+                # closing twice is fine
+                source.close()
+            for workers in (1, 3):
+                unpack_file_from_file(out_file, dcmp_file,
+                                      workers=workers, use_mmap=True)
+                cmp_file(in_file, dcmp_file)
+            # memoryview chunks into the default sink
+            with open(out_file, 'rb') as fp, open(dcmp_file, 'wb') as dcmp_fp, \
+                    CompressedMmapSource(fp) as source:
+                unpack(source, PlainFPBufferSink(dcmp_fp))
+            cmp_file(in_file, dcmp_file)
+
+
+def test_compressed_fp_source_lazy():
+    data = np.arange(100000, dtype=np.int64).tobytes()
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        pack_bytes_to_file(data, out_file, chunk_size=100000,
+                           metadata={'a': 1})
+        with open(out_file, 'rb') as fp:
+            bloscpack_header, metadata, metadata_header, offsets = \
+                _read_beginning(fp)
+            first_chunk = fp.tell()
+        with open(out_file, 'rb') as fp, \
+                patch('bloscpack.file_io._read_metadata_body') as body, \
+                patch('bloscpack.file_io._read_offsets') as read_offsets:
+            source = CompressedFPSource(fp)
+            # neither the metadata nor the offsets are read up front
+            assert not body.called
+            assert not read_offsets.called
+            assert bloscpack_header == source.bloscpack_header
+            assert metadata_header == source.metadata_header
+            assert first_chunk == source.first_chunk == fp.tell()
+        with open(out_file, 'rb') as fp:
+            source = CompressedFPSource(fp)
+            chunks = iter(source)
+            first, _ = next(chunks)
+            # reading them in between chunks doesn't disturb iterating
+            assert metadata == source.metadata
+            np.testing.assert_array_equal(offsets, source.offsets)
+            np.testing.assert_array_equal(offsets[:2], source.read_offsets(2))
+            second, _ = next(chunks)
+            assert data[:200000] == blosc.decompress(first) + \
+                blosc.decompress(second)
+        with open(out_file, 'rb') as fp:
+            source = CompressedFPSource(fp)
+            np.testing.assert_array_equal(offsets[:5], source.read_offsets(5))
+            np.testing.assert_array_equal(offsets, source.read_offsets(1000))
+            assert first_chunk == fp.tell()
+        pack_bytes_to_file(data, out_file,
+                           bloscpack_args=BloscpackArgs(offsets=False))
+        with open(out_file, 'rb') as fp:
+            source = CompressedFPSource(fp)
+            assert source.metadata is None
+            assert 0 == len(source.read_offsets(5))
+            assert 0 == len(source.offsets)
+
+
+def test_peek_file():
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        pack_bytes_to_file(b'abc' * 1000, out_file, chunk_size=1000,
+                           metadata={'a': 1})
+        with patch('bloscpack.file_io._read_offsets') as read_offsets, \
+                patch('bloscpack.file_io._read_compressed_chunk_fp') as read:
+            bloscpack_header, metadata, metadata_header = peek_file(out_file)
+            assert not read_offsets.called
+            assert not read.called
+        assert 3 == bloscpack_header.nchunks
+        assert {'a': 1} == metadata
+        assert b'JSON' == metadata_header.magic_format
+
+
+def test_plain_stream_source():
+    data = bytes(bytearray(range(256))) * 40
+    pieces = [data[i:i + 7] for i in range(0, len(data), 7)]
+    for input_, chunk_size in ((pieces, 1000),
+                               (StringIO(data), 1000),
+                               (StringIO(data), 1024),
+                               (StringIO(data), 20000),
+                               ):
+        source = PlainStreamSource(input_)
+        source.configure(chunk_size, -1, -1)
+        expected = [data[i:i + chunk_size]
+                    for i in range(0, len(data), chunk_size)]
+        assert expected == list(source)
+        assert len(expected) == source.nchunks
+        assert len(expected[-1]) == source.last_chunk
+    # a single empty chunk, as for empty inputs of known length
+    source = PlainStreamSource(iter([]))
+    source.configure(1000, -1, -1)
+    assert [b''] == list(source)
+    assert (1, 0) == (source.nchunks, source.last_chunk)
+
+
+class NotSeekable(object):
+
+    def __init__(self, fp):
+        self.fp = fp
+
+    def write(self, data):
+        return self.fp.write(data)
+
+    def tell(self):
+        return self.fp.tell()
+
+    def flush(self):
+        pass
+
+    def seekable(self):
+        return False
+
+
+def test_pack_stream_to_file():
+    data = np.arange(100000, dtype=np.int64).tobytes()
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        for workers in (1, 2):
+            pack_stream_to_file(
+                (data[i:i + 3000] for i in range(0, len(data), 3000)),
+                out_file, chunk_size=100000, metadata={'a': 1},
+                workers=workers)
+            with open(out_file, 'rb') as fp:
+                bloscpack_header, _, _, offsets = _read_beginning(fp)
+            assert 8 == bloscpack_header.nchunks == len(offsets)
+            assert 0 == bloscpack_header.max_app_chunks
+            assert 800000 - 7 * 100000 == bloscpack_header.last_chunk
+            # no space for offsets up front, they go into the trailer
+            assert bloscpack_header.offsets
+            assert bloscpack_header.trailer
+            assert (data, {'a': 1}) == unpack_bytes_from_file(out_file)
+            with BloscpackReader(out_file) as reader:
+                reader.seek(250000)
+                assert data[250000:260000] == reader.read(10000)
+        # without offsets, the counts are patched into the header
+        pack_stream_to_file(
+            (data[i:i + 3000] for i in range(0, len(data), 3000)),
+            out_file, chunk_size=100000,
+            bloscpack_args=BloscpackArgs(offsets=False))
+        with open(out_file, 'rb') as fp:
+            bloscpack_header = _read_bloscpack_header(fp)
+        assert 8 == bloscpack_header.nchunks
+        assert 800000 - 7 * 100000 == bloscpack_header.last_chunk
+        assert not bloscpack_header.offsets
+        assert not bloscpack_header.trailer
+        # and left as is, if the output isn't seekable
+        with open(out_file, 'wb') as fp:
+            pack(PlainStreamSource(StringIO(data)), CompressedFPSink(
+                NotSeekable(fp)), -1, 300000, -1,
+                bloscpack_args=BloscpackArgs(offsets=False))
+        with open(out_file, 'rb') as fp:
+            bloscpack_header = _read_bloscpack_header(fp)
+        assert -1 == bloscpack_header.nchunks
+        assert -1 == bloscpack_header.last_chunk
+        # such that the chunks are read until the end of the file
+        assert (data, None) == unpack_bytes_from_file(out_file)
+        with open(out_file, 'rb') as fp:
+            assert 3 == len(list(CompressedMmapSource(fp)))
+        with open(dcmp_file, 'wb') as fp:
+            unpack_stream_from_file(out_file, NotSeekable(fp))
+        with open(dcmp_file, 'rb') as fp:
+            assert data == fp.read()
+
+
+def test_trailer():
+    data = np.arange(100000, dtype=np.int64).tobytes()
+    bloscpack_args = BloscpackArgs(trailer=True)
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        pack_bytes_to_file(data, out_file, chunk_size=300000,
+                           metadata={'a': 1}, bloscpack_args=bloscpack_args)
+        with open(out_file, 'rb') as fp:
+            raw_bloscpack_header = _read_bloscpack_header(fp)
+            fp.seek(0)
+            bloscpack_header, _, _, offsets = _read_beginning(fp)
+        # the counts are only in the trailer
+        assert -1 == raw_bloscpack_header.nchunks
+        assert raw_bloscpack_header.trailer
+        assert 3 == bloscpack_header.nchunks
+        assert 200000 == bloscpack_header.last_chunk
+        assert 3 == len(offsets)
+        assert (data, {'a': 1}) == unpack_bytes_from_file(out_file)
+        with open(out_file, 'rb') as fp:
+            source = CompressedFPSource(fp)
+            np.testing.assert_array_equal(offsets, source.offsets)
+            fp.seek(0)
+            assert 3 == len(list(CompressedMmapSource(fp)))
+        # written in a single forward pass, with offsets even if the length
+        # of the input is unknown
+        with open(out_file, 'wb') as fp:
+            pack(PlainStreamSource(StringIO(data)), CompressedFPSink(
+                NotSeekable(fp)), -1, 300000, -1,
+                bloscpack_args=bloscpack_args)
+        with open(out_file, 'rb') as fp:
+            bloscpack_header, _, _, stream_offsets = _read_beginning(fp)
+        assert 3 == bloscpack_header.nchunks
+        # same chunks, but no metadata this time
+        assert 32 == stream_offsets[0]
+        np.testing.assert_array_equal(np.diff(offsets),
+                                      np.diff(stream_offsets))
+        assert (data, None) == unpack_bytes_from_file(out_file)
+
+
+def test_dedup():
+    block = np.arange(12500, dtype=np.int64).tobytes()
+    data = block * 5 + b'\x00' * 300000 + block * 3 + block[:50000]
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        with open(in_file, 'wb') as fp:
+            fp.write(data)
+        pack_file_to_file(in_file, out_file, chunk_size=100000)
+        full_size = path.getsize(out_file)
+        for trailer in (False, True):
+            for workers in (1, 2):
+                pack_file_to_file(in_file, out_file, chunk_size=100000,
+                                  bloscpack_args=BloscpackArgs(
+                                      offsets=False, dedup=True,
+                                      trailer=trailer),
+                                  workers=workers)
+                with open(out_file, 'rb') as fp:
+                    bloscpack_header, _, _, offsets = _read_beginning(fp)
+                # dedup implies offsets, and leaves no room for appending
+                assert bloscpack_header.dedup
+                assert 0 == bloscpack_header.max_app_chunks
+                assert 12 == len(offsets)
+                # one block, one chunk of zeros and the last chunk
+                assert 3 == len(set(offsets))
+                assert 5 * [offsets[0]] + 3 * [offsets[5]] + \
+                    3 * [offsets[0]] == list(offsets[:-1])
+                assert full_size > 3 * path.getsize(out_file)
+                assert (data, None) == unpack_bytes_from_file(out_file)
+                with open(out_file, 'rb') as fp:
+                    assert data == b''.join(
+                        blosc.decompress(bytes(compressed)) for compressed, _
+                        in CompressedMmapSource(fp))
+
+
+def test_sparse():
+    block = np.arange(12500, dtype=np.int64).tobytes()
+    # the last chunk of zeros is shorter, and the file ends in a hole
+    data = block + b'\x00' * 300000 + block * 2 + b'\x00' * 1000050
+    expected_offsets = [False] + 3 * [True] + 2 * [False] + 11 * [True]
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        with open(in_file, 'wb') as fp:
+            fp.write(data)
+        for trailer in (False, True):
+            for workers in (1, 2):
+                pack_file_to_file(in_file, out_file, chunk_size=100000,
+                                  bloscpack_args=BloscpackArgs(
+                                      offsets=False, sparse=True,
+                                      trailer=trailer),
+                                  workers=workers)
+                with open(out_file, 'rb') as fp:
+                    bloscpack_header, _, _, offsets = _read_beginning(fp)
+                # sparse implies offsets, and leaves no room for appending
+                assert bloscpack_header.sparse
+                assert 0 == bloscpack_header.max_app_chunks
+                assert expected_offsets == \
+                    list(offsets == ZERO_CHUNK_OFFSET)
+                assert (data, None) == unpack_bytes_from_file(out_file)
+                for mmap_ in (False, True):
+                    unpack_file_from_file(out_file, dcmp_file,
+                                          workers=workers, use_mmap=mmap_)
+                    assert len(data) == path.getsize(dcmp_file)
+                    with open(dcmp_file, 'rb') as fp:
+                        assert data == fp.read()
+                with open(dcmp_file, 'wb') as fp:
+                    unpack_stream_from_file(out_file, NotSeekable(fp),
+                                            workers=workers)
+                with open(dcmp_file, 'rb') as fp:
+                    assert data == fp.read()
+                with open(out_file, 'rb') as fp:
+                    assert expected_offsets == [
+                        compressed is None for compressed, _
+                        in CompressedMmapSource(fp)]
+
+
+def test_sparse_output_has_holes():
+    data = b'\x00' * 2 ** 24
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        with open(in_file, 'wb') as fp:
+            fp.write(data)
+        pack_file_to_file(in_file, out_file,
+                          bloscpack_args=BloscpackArgs(sparse=True))
+        # header and offsets only
+        assert 32 + 8 * 16 == path.getsize(out_file)
+        unpack_file_from_file(out_file, dcmp_file)
+        stat = os.stat(dcmp_file)
+        assert len(data) == stat.st_size
+        if hasattr(stat, 'st_blocks'):
+            assert stat.st_blocks * 512 < len(data) // 2
+
+
 def test_pack_unpack_bytes_to_from_file():
     array_ = np.linspace(0, 1e5)
     input_bytes = array_.tobytes()
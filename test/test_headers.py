@@ -32,7 +32,10 @@ from bloscpack.headers import (BloscpackHeader,
                                decode_metadata_options,
                                check_range,
                                decode_blosc_header,
+                               decode_blosc_sizes,
                                decode_blosc_flags,
+                               encode_trailer,
+                               decode_trailer,
                                )
 
 
@@ -57,16 +60,36 @@ def test_create_options():
             ('00000010', {'offsets': False, 'metadata': True}),
             ('00000001', {'offsets': True, 'metadata': False}),
             ('00000011', {'offsets': True, 'metadata': True}),
+            ('00000101', {'trailer': True}),
+            ('00001001', {'dedup': True}),
+            ('00010001', {'sparse': True}),
             ]:
         assert expected_options == create_options(**kwargs)
 
 
 def test_decode_options():
     for expected, input in [
-            ({'metadata': False, 'offsets': False}, '00000000'),
-            ({'metadata': False, 'offsets': True}, '00000001'),
-            ({'metadata': True, 'offsets': False}, '00000010'),
-            ({'metadata': True, 'offsets': True}, '00000011'),
+            ({'metadata': False, 'offsets': False, 'trailer': False,
+              'dedup': False, 'sparse': False},
+             '00000000'),
+            ({'metadata': False, 'offsets': True, 'trailer': False,
+              'dedup': False, 'sparse': False},
+             '00000001'),
+            ({'metadata': True, 'offsets': False, 'trailer': False,
+              'dedup': False, 'sparse': False},
+             '00000010'),
+            ({'metadata': True, 'offsets': True, 'trailer': False,
+              'dedup': False, 'sparse': False},
+             '00000011'),
+            ({'metadata': False, 'offsets': True, 'trailer': True,
+              'dedup': False, 'sparse': False},
+             '00000101'),
+            ({'metadata': False, 'offsets': True, 'trailer': False,
+              'dedup': True, 'sparse': False},
+             '00001001'),
+            ({'metadata': False, 'offsets': True, 'trailer': False,
+              'dedup': False, 'sparse': True},
+             '00010001'),
             ]:
         assert expected == decode_options(input)
 
@@ -78,8 +101,8 @@ def test_decode_options_exceptions():
             '000000000',
             '0000000a',
             'abc',
-            '00000100',
-            '00001100',
+            '00100000',
+            '00111100',
             '11111100',
             ]:
         with pytest.raises(ValueError):
@@ -148,6 +171,14 @@ def test_decode_blosc_header_basic():
     assert expected == header_slice
 
 
+def test_decode_blosc_sizes():
+    array_ = np.linspace(0, 100, int(2e4)).tobytes()
+    compressed = blosc.compress(array_, **BloscArgs())
+    expected = (len(array_), len(compressed))
+    assert expected == decode_blosc_sizes(compressed)
+    assert expected == decode_blosc_sizes(memoryview(compressed))
+
+
 def test_decode_blosc_header_deactivate_shuffle():
     array_ = np.ones(16000, dtype=np.uint8)
     blosc_args = BloscArgs()
@@ -305,6 +336,9 @@ def test_BloscpackHeader_encode():
             (5, b'\x01', {'offsets': True}),
             (5, b'\x02', {'metadata': True}),
             (5, b'\x03', {'offsets': True, 'metadata': True}),
+            (5, b'\x05', {'offsets': True, 'trailer': True}),
+            (5, b'\x09', {'offsets': True, 'dedup': True}),
+            (5, b'\x11', {'offsets': True, 'sparse': True}),
             # test with checksum
             (6, b'\x01', {'checksum': 'adler32'}),
             (6, b'\x08', {'checksum': 'sha512'}),
@@ -411,6 +445,64 @@ def test_BloscpackHeader_decode():
                BloscpackHeader.decode(mod_raw(offset, replacement))
 
 
+def test_BloscpackHeader_decode_exceptions():
+    raw = BloscpackHeader(nchunks=1, chunk_size=8, last_chunk=8).encode()
+
+    def mod_raw(offset, replacement):
+        return raw[0:offset] + replacement + \
+            raw[offset+len(replacement):]
+
+    for offset, replacement, error_type in [
+            # unknown options bits
+            (5, b'\x20', ValueError),
+            (5, b'\x80', ValueError),
+            # no such checksum
+            (6, b'\xff', IndexError),
+            # invalid sizes
+            (8, b'\xfe\xff\xff\xff', ValueError),
+            (12, b'\x09\x00\x00\x00', ValueError),
+            (16, b'\xfe\xff\xff\xff\xff\xff\xff\xff', ValueError),
+            (24, b'\x01\x00\x00\x00\x00\x00\x00\x80', ValueError),
+            ]:
+        with pytest.raises(error_type):
+            BloscpackHeader.decode(mod_raw(offset, replacement))
+    with pytest.raises(ValueError):
+        BloscpackHeader.decode(b'XXXX' + raw[4:])
+    with pytest.raises(ValueError):
+        BloscpackHeader.decode(raw[:-1])
+
+
+def test_encode_decode_trailer():
+    raw = encode_trailer(3, 100, 1234)
+    assert 32 == len(raw)
+    assert b'blpt\x01' == raw[:5]
+    assert (3, 100, 1234) == decode_trailer(raw)
+    assert (3, 100, 1234) == decode_trailer(raw, 1234 + 32)
+    for broken in (raw[:-1],
+                   b'XXXX' + raw[4:],
+                   raw[:4] + b'\x02' + raw[5:],
+                   encode_trailer(-1, 100, 1234),
+                   encode_trailer(3, 100, -1),
+                   ):
+        with pytest.raises(ValueError):
+            decode_trailer(broken)
+    # the offsets must precede the trailer
+    with pytest.raises(ValueError):
+        decode_trailer(raw, 1234 + 31)
+
+
+def test_headers_slots():
+    for header in (BloscpackHeader(nchunks=3),
+                   MetadataHeader(magic_format=b'JSON')):
+        assert not hasattr(header, '__dict__')
+        with pytest.raises(AttributeError):
+            header.no_such_attribute = 1
+        copy_ = header.copy()
+        assert copy_ == header
+        assert copy_ is not header
+        assert header == type(header).decode(header.encode())
+
+
 def test_BloscpackHeader_accessor_exceptions():
     if sys.version_info[0:2] < (2, 7):
         raise SkipTest
@@ -495,3 +587,15 @@ def test_MetadataHeader_decode():
             ]:
         assert copy_and_set_return(attribute, value) == \
             MetadataHeader.decode(copy_and_set_input(offset, replacement))
+
+
+def test_MetadataHeader_decode_exceptions():
+    raw = MetadataHeader().encode()
+    # meta_level too large
+    with pytest.raises(ValueError):
+        MetadataHeader.decode(raw[:11] + b'\x0a' + raw[12:])
+    # no such codec
+    with pytest.raises(IndexError):
+        MetadataHeader.decode(raw[:10] + b'\xff' + raw[11:])
+    with pytest.raises(ValueError):
+        MetadataHeader.decode(raw[:-1])
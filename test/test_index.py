@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+# vim :set ft=py:
+
+
+import os
+
+
+import numpy as np
+import numpy.testing as npt
+import pytest
+
+
+from bloscpack.abstract_io import (pack,
+                                   )
+from bloscpack.append import (append,
+                              )
+from bloscpack.args import (BloscpackArgs,
+                            )
+from bloscpack.exceptions import (IndexMismatch,
+                                  NoOffsetsFound,
+                                  )
+from bloscpack.compat_util import StringIO
+from bloscpack.file_io import (CompressedFPSink,
+                               PlainStreamSource,
+                               pack_file_to_file,
+                               unpack_file_from_file,
+                               _read_beginning,
+                               )
+from bloscpack.headers import (BloscpackHeader,
+                               )
+from bloscpack.index import (index_filename,
+                             reconstruct_offsets,
+                             write_index,
+                             read_index,
+                             add_offsets,
+                             )
+from bloscpack.reader import (BloscpackReader,
+                              )
+from bloscpack.testutil import (create_array,
+                                create_tmp_files,
+                                cmp_file,
+                                )
+
+
+def pack_with_and_without_offsets(in_file, out_file, **kwargs):
+    pack_file_to_file(in_file, out_file, chunk_size='1M', **kwargs)
+    with open(out_file, 'rb') as fp:
+        expected = _read_beginning(fp)[3]
+    pack_file_to_file(in_file, out_file, chunk_size='1M',
+                      bloscpack_args=BloscpackArgs(offsets=False), **kwargs)
+    return expected
+
+
+def test_reconstruct_offsets():
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        create_array(1, in_file)
+        for checksum in ('adler32', 'None', 'sha512'):
+            pack_file_to_file(in_file, out_file, chunk_size='1M',
+                              bloscpack_args=BloscpackArgs(checksum=checksum))
+            with open(out_file, 'rb') as fp:
+                bloscpack_header, _, _, offsets = _read_beginning(fp)
+                fp.seek(offsets[0])
+                npt.assert_array_equal(
+                    offsets, reconstruct_offsets(fp, bloscpack_header))
+
+
+def test_sidecar_index():
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        create_array(1, in_file)
+        with_offsets = pack_with_and_without_offsets(
+            in_file, out_file, metadata={'a': 1})
+        assert None is read_index(out_file)
+        with pytest.raises(NoOffsetsFound):
+            BloscpackReader(out_file)
+        offsets = write_index(out_file)
+        assert os.path.exists(index_filename(out_file))
+        npt.assert_array_equal(offsets, read_index(out_file))
+        # same chunks, but no offsets section in front of them
+        first = with_offsets[0] - offsets[0]
+        npt.assert_array_equal(with_offsets - first, offsets)
+        with open(in_file, 'rb') as fp:
+            expected = fp.read()
+        with BloscpackReader(out_file) as reader:
+            npt.assert_array_equal(offsets, reader.offsets)
+            reader.seek(1500000)
+            assert expected[1500000:1600000] == reader.read(100000)
+        # explicit index file name
+        write_index(out_file, index_file=os.path.join(tdir, 'other'))
+        npt.assert_array_equal(offsets, read_index(
+            out_file, index_file=os.path.join(tdir, 'other')))
+
+
+def test_stale_or_corrupt_index():
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        create_array(1, in_file)
+        pack_with_and_without_offsets(in_file, out_file)
+        write_index(out_file)
+        with open(out_file, 'ab') as fp:
+            fp.write(b'x')
+        with pytest.raises(IndexMismatch):
+            read_index(out_file)
+        with pytest.raises(IndexMismatch):
+            BloscpackReader(out_file)
+        with open(index_filename(out_file), 'wb') as fp:
+            fp.write(b'garbage')
+        with pytest.raises(IndexMismatch):
+            read_index(out_file)
+
+
+def test_add_offsets():
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        create_array(1, in_file)
+        metadata = {'dtype': 'float64', 'shape': [1024], 'others': []}
+        with_offsets = pack_with_and_without_offsets(
+            in_file, out_file, metadata=metadata)
+        offsets = add_offsets(out_file)
+        npt.assert_array_equal(with_offsets, offsets)
+        with open(out_file, 'rb') as fp:
+            bloscpack_header, read_metadata, _, read_offsets = \
+                _read_beginning(fp)
+        assert bloscpack_header.offsets
+        assert 10 * bloscpack_header.nchunks == \
+            bloscpack_header.max_app_chunks
+        assert metadata == read_metadata
+        npt.assert_array_equal(offsets, read_offsets)
+        assert metadata == unpack_file_from_file(out_file, dcmp_file)
+        cmp_file(in_file, dcmp_file)
+        # now it can be appended to
+        append(out_file, in_file)
+        unpack_file_from_file(out_file, dcmp_file)
+        with open(in_file, 'rb') as fp:
+            expected = fp.read() * 2
+        with open(dcmp_file, 'rb') as fp:
+            assert expected == fp.read()
+        # no-op for files with offsets
+        npt.assert_array_equal(add_offsets(out_file),
+                               BloscpackReader(out_file).offsets)
+
+
+def test_add_offsets_no_app_chunks():
+    data = np.arange(1000, dtype=np.int64)
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        with open(in_file, 'wb') as fp:
+            fp.write(data.tobytes())
+        pack_file_to_file(in_file, out_file, chunk_size=1000,
+                          bloscpack_args=BloscpackArgs(offsets=False,
+                                                       checksum='None'))
+        add_offsets(out_file, max_app_chunks=0)
+        with BloscpackReader(out_file) as reader:
+            assert 0 == reader.bloscpack_header.max_app_chunks
+            reader.seek(4000)
+            assert data.tobytes()[4000:5000] == reader.read(1000)
+
+
+def test_unknown_nchunks():
+    data = np.arange(100000, dtype=np.int64).tobytes()
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        # as if streamed to an output that was not seekable
+        with open(out_file, 'wb') as fp:
+            pack(PlainStreamSource(StringIO(data)), CompressedFPSink(fp),
+                 -1, 300000, -1,
+                 bloscpack_args=BloscpackArgs(offsets=False))
+            fp.seek(0)
+            fp.write(BloscpackHeader(checksum='adler32', typesize=8,
+                                     chunk_size=300000).encode())
+        with open(out_file, 'rb') as fp:
+            bloscpack_header, _, _, _ = _read_beginning(fp)
+            assert -1 == bloscpack_header.nchunks
+            offsets = reconstruct_offsets(fp, bloscpack_header)
+        assert 3 == len(offsets)
+        write_index(out_file)
+        with BloscpackReader(out_file) as reader:
+            assert 3 == reader.nchunks
+            assert 200000 == reader.last_chunk
+            assert data == reader.read()
+        os.remove(index_filename(out_file))
+        add_offsets(out_file)
+        with open(out_file, 'rb') as fp:
+            bloscpack_header, _, _, offsets = _read_beginning(fp)
+        assert 3 == bloscpack_header.nchunks == len(offsets)
+        assert 200000 == bloscpack_header.last_chunk
+        with BloscpackReader(out_file) as reader:
+            assert data == reader.read()
@@ -4,7 +4,8 @@
 from bloscpack.abstract_io import (pack,
                                    unpack,
                                    )
-from bloscpack.args import (calculate_nchunks,
+from bloscpack.args import (BloscpackArgs,
+                            calculate_nchunks,
                             )
 from bloscpack.compat_util import StringIO
 from bloscpack.defaults import (DEFAULT_CHUNK_SIZE,
@@ -27,7 +28,8 @@ from bloscpack.testutil import (create_array_fp,
 
 
 def pack_unpack_mem(repeats, chunk_size=DEFAULT_CHUNK_SIZE,
-                    progress=False, metadata=None):
+                    progress=False, metadata=None, workers=1,
+                    bloscpack_args=None):
     in_fp, out_fp, dcmp_fp = StringIO(), StringIO(), StringIO()
     if progress:
         print("Creating test array")
@@ -41,10 +43,11 @@ def pack_unpack_mem(repeats, chunk_size=DEFAULT_CHUNK_SIZE,
     # let us play merry go round
     source = PlainFPSource(in_fp)
     sink = CompressedMemorySink()
-    pack(source, sink, nchunks, chunk_size, last_chunk_size, metadata=metadata)
+    pack(source, sink, nchunks, chunk_size, last_chunk_size, metadata=metadata,
+         workers=workers, bloscpack_args=bloscpack_args)
     source = CompressedMemorySource(sink)
     sink = PlainMemorySink()
-    unpack(source, sink)
+    unpack(source, sink, workers=workers)
     assert metadata == source.metadata
     source = PlainMemorySource(sink.chunks)
     sink = CompressedFPSink(out_fp)
@@ -72,3 +75,34 @@ def test_pack_unpack_mem():
     pack_unpack_mem(1, chunk_size=reverse_pretty('2M'), metadata=metadata)
     pack_unpack_mem(1, chunk_size=reverse_pretty('4M'), metadata=metadata)
     pack_unpack_mem(1, chunk_size=reverse_pretty('8M'), metadata=metadata)
+
+
+def test_pack_unpack_mem_workers():
+    pack_unpack_mem(1, chunk_size=reverse_pretty('1M'), workers=4)
+    pack_unpack_mem(1, chunk_size=reverse_pretty('1M'), workers=2,
+                    metadata={"dtype": "float64", "shape": [1024]})
+
+
+def test_pack_unpack_mem_dedup():
+    chunks = [b'a' * 100, b'b' * 100, b'a' * 100, b'c' * 50]
+    source = PlainMemorySource(chunks)
+    sink = CompressedMemorySink()
+    pack(source, sink, 4, 100, 50, bloscpack_args=BloscpackArgs(dedup=True))
+    assert sink.chunks[0] is sink.chunks[2]
+    assert sink.checksums[0] is sink.checksums[2]
+    source = CompressedMemorySource(sink)
+    sink = PlainMemorySink()
+    unpack(source, sink)
+    assert chunks == sink.chunks
+
+
+def test_pack_unpack_mem_sparse():
+    chunks = [b'a' * 100, b'\x00' * 100, b'b' * 100, b'\x00' * 50]
+    source = PlainMemorySource(chunks)
+    sink = CompressedMemorySink()
+    pack(source, sink, 4, 100, 50, bloscpack_args=BloscpackArgs(sparse=True))
+    assert [False, True, False, True] == [c is None for c in sink.chunks]
+    source = CompressedMemorySource(sink)
+    sink = PlainMemorySink()
+    unpack(source, sink)
+    assert chunks == sink.chunks
@@ -2,6 +2,7 @@
 # vim :set ft=py:
 
 
+import blosc
 import numpy as np
 import numpy.testing as npt
 from unittest import mock
@@ -11,6 +12,7 @@ import pytest
 from bloscpack.abstract_io import (pack,
                                    )
 from bloscpack.args import (BloscArgs,
+                            BloscpackArgs,
                             calculate_nchunks,
                             )
 from bloscpack.compat_util import StringIO
@@ -31,6 +33,9 @@ from bloscpack.numpy_io import (pack_ndarray,
                                 unpack_ndarray_from_bytes,
                                 pack_ndarray_to_file,
                                 unpack_ndarray_from_file,
+                                open_ndarray_from_file,
+                                peek_ndarray_from_file,
+                                PlainNumpySink,
                                 _conv,
                                 )
 from bloscpack.testutil import (create_tmp_files,
@@ -258,3 +263,143 @@ def test_roundtrip_slice():
     a = np.arange(100).reshape((10, 10))
     s = a[3:5, 3:5]
     roundtrip_ndarray(s)
+
+
+def test_unpack_parallel():
+    a = np.arange(1e6).reshape((1000, 1000))
+    for order in ('C', 'F'):
+        b = np.asarray(a, order=order)
+        sio = StringIO()
+        sink = CompressedFPSink(sio)
+        pack_ndarray(b, sink, chunk_size=100000)
+        sio.seek(0)
+        source = CompressedFPSource(sio)
+        c = unpack_ndarray(source, workers=4, max_inflight=3)
+        npt.assert_array_equal(b, c)
+        assert np.isfortran(b) == np.isfortran(c)
+    # and from memory
+    sink = CompressedMemorySink()
+    pack_ndarray(a, sink, chunk_size=99992)
+    c = unpack_ndarray(CompressedMemorySource(sink), workers=3)
+    npt.assert_array_equal(a, c)
+
+
+def test_numpy_sink_rejects_oversized_chunk():
+    a = np.arange(100, dtype=np.int64)
+    sio = StringIO()
+    pack_ndarray(a, CompressedFPSink(sio), chunk_size=400)
+    sio.seek(0)
+    metadata = CompressedFPSource(sio).metadata
+    too_large = blosc.compress(np.arange(60, dtype=np.int64).tobytes(),
+                               typesize=8)
+    fits = blosc.compress(np.arange(50, dtype=np.int64).tobytes(),
+                          typesize=8)
+    sink = PlainNumpySink(metadata)
+    sink.configure(400, 400, 2)
+    # larger than the slot of the chunk
+    with pytest.raises(ValueError):
+        sink.decompress(0, too_large)
+    # beyond the end of the array
+    with pytest.raises(ValueError):
+        sink.decompress(2, fits)
+    assert 400 == sink.decompress(1, fits)
+    sink.put(fits)
+    sink.put(fits)
+    with pytest.raises(ValueError):
+        sink.put(fits)
+
+
+def test_sparse():
+    a = np.zeros((1000, 1000))
+    a[100] = 1.0
+    a[-1, -1] = 2.0
+    bloscpack_args = BloscpackArgs(sparse=True)
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        pack_ndarray_to_file(a, out_file, chunk_size=100000,
+                             bloscpack_args=bloscpack_args)
+        for workers in (1, 3):
+            npt.assert_array_equal(
+                a, unpack_ndarray_from_file(out_file, workers=workers))
+        with open_ndarray_from_file(out_file) as lazy:
+            npt.assert_array_equal(a[95:105], lazy[95:105])
+    sink = CompressedMemorySink()
+    pack_ndarray(a, sink, chunk_size=100000, bloscpack_args=bloscpack_args)
+    assert 80 - 2 == sum(c is None for c in sink.chunks)
+    npt.assert_array_equal(a, unpack_ndarray(CompressedMemorySource(sink)))
+
+
+def test_lazy_ndarray():
+    a = np.arange(3 * 1000 * 7, dtype=np.float32).reshape(3000, 7)
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        pack_ndarray_to_file(a, out_file, chunk_size=4096)
+        with open_ndarray_from_file(out_file) as lazy:
+            assert a.shape == lazy.shape
+            assert a.dtype == lazy.dtype
+            assert 3000 == len(lazy)
+            for key in (0, -1, 1234, np.int64(7),
+                        slice(None), slice(10, 20), slice(-5, None),
+                        slice(2999, 0, -3), slice(5, 5), slice(100, 10),
+                        (5, 3), (slice(10, 400, 7), slice(1, 4)),
+                        (Ellipsis, 2), ):
+                npt.assert_array_equal(a[key], lazy[key])
+            with pytest.raises(IndexError):
+                lazy[3000]
+            npt.assert_array_equal(a, np.asarray(lazy))
+            npt.assert_array_equal(a.astype(np.float64),
+                                   np.asarray(lazy, dtype=np.float64))
+
+
+def test_lazy_ndarray_reads_only_overlapping_chunks():
+    a = np.arange(100000, dtype=np.int64)
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        pack_ndarray_to_file(a, out_file, chunk_size=8000)
+        with open_ndarray_from_file(out_file) as lazy:
+            with mock.patch.object(lazy.reader, 'read_compressed_chunk',
+                                   wraps=lazy.reader.read_compressed_chunk) \
+                    as read_compressed_chunk:
+                npt.assert_array_equal(a[1500:2500], lazy[1500:2500])
+            assert [1, 2] == [c[0][0] for c in
+                                 read_compressed_chunk.call_args_list]
+
+
+def test_lazy_ndarray_fortran_and_structured():
+    a = np.asfortranarray(np.arange(60).reshape(6, 10))
+    b = np.zeros(50, dtype=[('a', 'i4'), ('b', 'f8', (2,))])
+    b['a'] = np.arange(50)
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        pack_ndarray_to_file(a, out_file, chunk_size=80)
+        with open_ndarray_from_file(out_file) as lazy:
+            npt.assert_array_equal(a[2:4], lazy[2:4])
+            npt.assert_array_equal(a, np.asarray(lazy))
+        pack_ndarray_to_file(b, out_file, chunk_size=200)
+        with open_ndarray_from_file(out_file) as lazy:
+            npt.assert_array_equal(b[13:29], lazy[13:29])
+        pack_ndarray_to_file(np.array(3.5), out_file)
+        with open_ndarray_from_file(out_file) as lazy:
+            assert 3.5 == lazy[()]
+
+
+def test_lazy_ndarray_not_numpy():
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        with open(out_file, 'wb') as fp:
+            pack(PlainFPSource(StringIO(b'abc')), CompressedFPSink(fp),
+                 *calculate_nchunks(3), metadata={'container': 'other'})
+        with pytest.raises(NotANumpyArray):
+            open_ndarray_from_file(out_file)
+
+
+def test_peek_ndarray_from_file():
+    a = np.arange(60, dtype=np.float32).reshape(3, 4, 5)
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        pack_ndarray_to_file(a, out_file, chunk_size=40)
+        with mock.patch('bloscpack.file_io._read_offsets') as read_offsets:
+            bloscpack_header, shape, dtype = peek_ndarray_from_file(out_file)
+            assert not read_offsets.called
+        assert (3, 4, 5) == shape
+        assert np.dtype(np.float32) == dtype
+        assert 6 == bloscpack_header.nchunks
+        with open(out_file, 'wb') as fp:
+            pack(PlainFPSource(StringIO(b'abc')), CompressedFPSink(fp),
+                 *calculate_nchunks(3))
+        with pytest.raises(NotANumpyArray):
+            peek_ndarray_from_file(out_file)
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+# vim :set ft=py:
+
+
+import threading
+
+import blosc
+import pytest
+
+from bloscpack.parallel import (check_workers,
+                                ordered_map,
+                                released_gil,
+                                )
+
+
+def test_check_workers():
+    assert 2 == check_workers(1, None)
+    assert 8 == check_workers(4, None)
+    assert 3 == check_workers(4, 3)
+    with pytest.raises(ValueError):
+        check_workers(0, None)
+    with pytest.raises(ValueError):
+        check_workers(2, 0)
+    with pytest.raises(TypeError):
+        check_workers(2.0, None)
+
+
+def test_ordered_map_preserves_order():
+    items = [(i,) for i in range(100)]
+    received = list(ordered_map(lambda i: i * i, iter(items), 4, 3))
+    expected = [((i,), i * i) for i in range(100)]
+    assert expected == received
+
+
+def test_ordered_map_bounds_inflight():
+    lock = threading.Lock()
+    state = {'consumed': 0, 'max_ahead': 0}
+
+    def produce():
+        for i in range(50):
+            with lock:
+                state['consumed'] += 1
+            yield (i,)
+
+    for (i,), _ in ordered_map(lambda i: i, produce(), 4, 5):
+        with lock:
+            ahead = state['consumed'] - i
+            state['max_ahead'] = max(state['max_ahead'], ahead)
+    # the item being yielded plus at most 'max_inflight' pending ones
+    assert state['max_ahead'] <= 6
+
+
+def test_ordered_map_reraises():
+    def func(i):
+        if i == 5:
+            raise ValueError('boom')
+        return i
+    with pytest.raises(ValueError):
+        list(ordered_map(func, ((i,) for i in range(10)), 2, 2))
+
+
+def test_released_gil_restores_state():
+    previous = blosc.set_releasegil(False)
+    try:
+        with released_gil():
+            assert blosc.set_releasegil(True)
+        assert not blosc.set_releasegil(False)
+    finally:
+        blosc.set_releasegil(previous)
+
+
+def test_released_gil_overlapping():
+    previous = blosc.set_releasegil(False)
+    try:
+        # the first to exit does not switch it off for the other one
+        first, second = released_gil(), released_gil()
+        first.__enter__()
+        second.__enter__()
+        first.__exit__(None, None, None)
+        assert blosc.set_releasegil(True)
+        second.__exit__(None, None, None)
+        assert not blosc.set_releasegil(False)
+    finally:
+        blosc.set_releasegil(previous)
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+# vim :set ft=py:
+
+
+import io
+import pickle
+import struct
+
+
+import numpy as np
+import pytest
+
+
+from bloscpack.args import (BloscpackArgs,
+                            )
+from bloscpack.exceptions import (ChecksumMismatch,
+                                  CorruptedChunk,
+                                  NoOffsetsFound,
+                                  )
+from bloscpack.file_io import (pack_bytes_to_file,
+                               pack_file_to_file,
+                               )
+from bloscpack.reader import (BloscpackReader,
+                              )
+from bloscpack.testutil import (create_tmp_files,
+                                )
+
+
+def test_read_seek_tell():
+    data = np.arange(100000, dtype=np.int64).tobytes()
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        pack_bytes_to_file(data, out_file, chunk_size=10000)
+        with BloscpackReader(out_file) as reader:
+            assert len(data) == reader.size
+            assert reader.readable()
+            assert reader.seekable()
+            assert data == reader.read()
+            assert len(data) == reader.tell()
+            assert b'' == reader.read(10)
+            # spanning several chunks
+            assert 1234 == reader.seek(1234)
+            assert data[1234:1234 + 25000] == reader.read(25000)
+            assert 1234 + 25000 == reader.tell()
+            assert data[26234:26240] == reader.read(6)
+            reader.seek(-10, io.SEEK_END)
+            assert data[-10:] == reader.read(100)
+            reader.seek(-20, io.SEEK_CUR)
+            assert data[-20:-15] == reader.read(5)
+            with pytest.raises(ValueError):
+                reader.seek(-1)
+            with pytest.raises(ValueError):
+                reader.seek(0, 3)
+            buffer_ = bytearray(30000)
+            reader.seek(5)
+            assert 30000 == reader.readinto(buffer_)
+            assert data[5:30005] == buffer_
+        assert reader.closed
+        with pytest.raises(ValueError):
+            reader.read(1)
+
+
+def test_read_sparse():
+    data = b'\x00' * 300000 + b'\x01' * 50000 + b'\x00' * 150000
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        pack_bytes_to_file(data, out_file, chunk_size=100000,
+                           bloscpack_args=BloscpackArgs(sparse=True))
+        with BloscpackReader(out_file) as reader:
+            assert (None, None) == reader.read_compressed_chunk(0)
+            assert data[:100000] == reader.read_chunk(0)
+            assert data[400000:] == reader.read_chunk(4)
+            reader.seek(290000)
+            assert data[290000:410000] == reader.read(120000)
+            reader.seek(0)
+            assert data == reader.read()
+
+
+def test_read_chunk():
+    data = np.arange(100000, dtype=np.int64).tobytes()
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        pack_bytes_to_file(data, out_file, chunk_size=300000)
+        with open(out_file, 'rb') as fp:
+            reader = BloscpackReader(fp)
+            assert 3 == reader.nchunks
+            assert data[300000:600000] == reader.read_chunk(1)
+            assert data[600000:] == reader.read_chunk(2)
+            with pytest.raises(IndexError):
+                reader.read_chunk(3)
+            reader.close()
+            # the reader does not close what it didn't open
+            assert not fp.closed
+
+
+def test_only_needed_chunk_decompressed():
+    data = np.arange(100000, dtype=np.int64).tobytes()
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        pack_bytes_to_file(data, out_file, chunk_size=10000)
+        with BloscpackReader(out_file) as reader:
+            read = []
+            original = reader.read_compressed_chunk
+
+            def tracking(i):
+                read.append(i)
+                return original(i)
+            reader.read_compressed_chunk = tracking
+            reader.seek(500000)
+            for _ in range(10):
+                reader.read(100)
+            assert [50] == read
+
+
+def test_pickle_and_numpy_load():
+    obj = {'a': list(range(10000)), 'b': 'x' * 100000}
+    array_ = np.linspace(0, 1, 100000)
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        pack_bytes_to_file(pickle.dumps(obj), out_file, chunk_size=4096)
+        with BloscpackReader(out_file) as reader:
+            assert obj == pickle.load(io.BufferedReader(reader))
+        with open(in_file, 'wb') as fp:
+            np.save(fp, array_)
+        pack_file_to_file(in_file, out_file, chunk_size=50000)
+        with io.BufferedReader(BloscpackReader(out_file)) as fp:
+            np.testing.assert_array_equal(array_, np.load(fp))
+
+
+def test_checksum_mismatch():
+    data = b'abcdefgh' * 1000
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        pack_bytes_to_file(data, out_file, chunk_size=4000)
+        with BloscpackReader(out_file) as reader:
+            offset = reader.offsets[1]
+        with open(out_file, 'r+b') as fp:
+            fp.seek(offset + 20)
+            byte_ = fp.read(1)
+            fp.seek(offset + 20)
+            fp.write(bytes([byte_[0] ^ 0xff]))
+        with BloscpackReader(out_file) as reader:
+            assert data[:4000] == reader.read_chunk(0)
+            with pytest.raises(ChecksumMismatch):
+                reader.read_chunk(1)
+
+
+def test_chunk_size_mismatch():
+    data = bytes(bytearray(range(250))) * 10
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        pack_bytes_to_file(data, out_file, chunk_size=1000)
+        # the header promises more, or less, than the last chunk holds
+        for last_chunk in (900, 400):
+            with open(out_file, 'r+b') as fp:
+                fp.seek(12)
+                fp.write(struct.pack('<i', last_chunk))
+            with BloscpackReader(out_file) as reader:
+                assert data[:2000] == reader.read(2000)
+                with pytest.raises(CorruptedChunk):
+                    reader.read_chunk(2)
+                reader.seek(2100)
+                with pytest.raises(CorruptedChunk):
+                    reader.read()
+
+
+def test_empty_and_no_offsets():
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        pack_bytes_to_file(b'', out_file)
+        with BloscpackReader(out_file) as reader:
+            assert b'' == reader.read()
+        pack_bytes_to_file(b'abc', out_file,
+                           bloscpack_args=BloscpackArgs(offsets=False))
+        with pytest.raises(NoOffsetsFound):
+            BloscpackReader(out_file)
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+# vim :set ft=py:
+
+
+import time
+
+
+import numpy as np
+import numpy.testing as npt
+import pytest
+
+
+from bloscpack.args import (BloscpackArgs,
+                            )
+from bloscpack.file_io import (pack_file_to_file,
+                               unpack_file_from_file,
+                               pack_bytes_to_bytes,
+                               unpack_bytes_from_bytes,
+                               )
+from bloscpack.numpy_io import (pack_ndarray_to_bytes,
+                                unpack_ndarray_from_bytes,
+                                )
+from bloscpack.stats import (Stats,
+                             clock,
+                             stats_or_stand_in,
+                             timed,
+                             )
+from bloscpack.testutil import (create_array,
+                                create_tmp_files,
+                                )
+
+
+def test_add():
+    stats = Stats()
+    start = clock()
+    time.sleep(0.01)
+    end = stats.add('sleep', start)
+    assert end >= start
+    stats.add('sleep', end)
+    stats.add('work', end)
+    assert ['sleep', 'work'] == list(stats.wall)
+    assert 0.01 <= stats.wall['sleep'] < 1
+    # sleeping costs no CPU
+    assert stats.cpu['sleep'] < stats.wall['sleep']
+
+
+def test_add_ratio():
+    stats = Stats()
+    assert 0 == stats.nratios
+    assert stats.ratio_min is None
+    assert 0.0 == stats.ratio_mean
+    for nbytes, cbytes in ((100, 50), (100, 10), (100, 25)):
+        stats.add_ratio(nbytes, cbytes)
+    assert 3 == stats.nratios
+    assert (2.0, 10.0) == (stats.ratio_min, stats.ratio_max)
+    assert 16.0 / 3 == pytest.approx(stats.ratio_mean)
+    assert 'chunk ratios: min: 2.00, mean: 5.33, max: 10.00' in \
+        stats.summary()
+
+
+def test_stand_in():
+    stats = Stats()
+    assert stats is stats_or_stand_in(stats)
+    stand_in = stats_or_stand_in(None)
+    start = clock()
+    assert stand_in.add('compress', start, 0) >= start
+    stand_in.add_ratio(100, 10)
+    assert 0 == len(stand_in.wall)
+    assert 0 == stand_in.nratios
+
+
+def test_timed():
+    stats = Stats()
+    assert [1, 2, 3] == list(timed([1, 2, 3], stats, 'read'))
+    assert ['read'] == list(stats.wall)
+
+
+def test_pack_unpack_bytes():
+    bytes_ = np.linspace(0, 100, 2 ** 18).tobytes()
+    pack_stats, unpack_stats = Stats(), Stats()
+    packed = pack_bytes_to_bytes(bytes_, chunk_size='512K',
+                                 stats=pack_stats)
+    assert (bytes_, None) == unpack_bytes_from_bytes(packed,
+                                                     stats=unpack_stats)
+    assert 'pack' == pack_stats.operation
+    assert 4 == pack_stats.nchunks
+    assert len(bytes_) == pack_stats.bytes_in == pack_stats.nbytes
+    # the chunks and their checksums, without header and offsets
+    assert len(packed) - 32 - 4 * 8 - 40 * 8 == pack_stats.bytes_out
+    assert ['read', 'compress', 'checksum', 'write'] == list(pack_stats.wall)
+    assert 4 == pack_stats.nratios
+    assert 1 < pack_stats.ratio_min <= pack_stats.ratio_mean <= \
+        pack_stats.ratio_max
+    assert pack_stats.ratio > 1
+    assert pack_stats.elapsed > 0
+    assert pack_stats.throughput > 0
+    assert 'unpack' == unpack_stats.operation
+    assert 4 == unpack_stats.nchunks
+    assert pack_stats.bytes_in == unpack_stats.bytes_out
+    assert pack_stats.bytes_out == unpack_stats.bytes_in
+    assert ['read', 'checksum', 'decompress', 'write'] == \
+        list(unpack_stats.wall)
+    for attr in ('ratio_min', 'ratio_mean', 'ratio_max'):
+        npt.assert_allclose(getattr(pack_stats, attr),
+                            getattr(unpack_stats, attr), rtol=1e-3)
+    summary = pack_stats.summary()
+    assert summary.startswith('pack: 4 chunks')
+    assert '\n    compress: ' in summary
+    assert 'pack, 4 chunks' in repr(pack_stats)
+
+
+def test_pack_unpack_file_parallel():
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        create_array(1, in_file)
+        for workers in (1, 2):
+            pack_stats, unpack_stats = Stats(), Stats()
+            pack_file_to_file(in_file, out_file, chunk_size='2M',
+                              workers=workers, stats=pack_stats)
+            unpack_file_from_file(out_file, dcmp_file, workers=workers,
+                                  stats=unpack_stats)
+            assert pack_stats.nchunks == unpack_stats.nchunks
+            assert pack_stats.bytes_in == unpack_stats.bytes_out
+            assert pack_stats.bytes_out == unpack_stats.bytes_in
+            assert pack_stats.nchunks == pack_stats.nratios
+            assert set(['compress', 'checksum']) <= set(pack_stats.wall)
+            assert set(['checksum', 'decompress']) <= \
+                set(unpack_stats.wall)
+
+
+def test_pack_unpack_omitted():
+    bytes_ = b'\x00' * 2 ** 20 + b'\x01' * 2 ** 20 + b'\x01' * 2 ** 20
+    pack_stats, unpack_stats = Stats(), Stats()
+    packed = pack_bytes_to_bytes(
+        bytes_, chunk_size='1M', stats=pack_stats,
+        bloscpack_args=BloscpackArgs(dedup=True, sparse=True))
+    unpack_bytes_from_bytes(packed, stats=unpack_stats)
+    # chunks which were not stored have no ratio
+    assert 3 == pack_stats.nchunks == unpack_stats.nchunks
+    assert 1 == pack_stats.nratios
+    assert 3 * 2 ** 20 == pack_stats.bytes_in
+    assert 3 * 2 ** 20 == unpack_stats.bytes_out
+
+
+def test_pack_unpack_ndarray():
+    a = np.arange(2 ** 18, dtype=np.int32)
+    pack_stats, unpack_stats = Stats(), Stats()
+    b = unpack_ndarray_from_bytes(
+        pack_ndarray_to_bytes(a, chunk_size='256K', stats=pack_stats),
+        stats=unpack_stats)
+    npt.assert_array_equal(a, b)
+    assert 4 == pack_stats.nchunks == unpack_stats.nchunks
+    assert a.nbytes == pack_stats.bytes_in == unpack_stats.bytes_out
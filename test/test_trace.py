@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+# vim :set ft=py:
+
+
+import json
+import os.path as path
+
+
+import numpy as np
+import pytest
+
+
+from bloscpack.file_io import (pack_file_to_file,
+                               unpack_file_from_file,
+                               pack_bytes_to_bytes,
+                               unpack_bytes_from_bytes,
+                               )
+from bloscpack.stats import (Stats,
+                             clock,
+                             )
+from bloscpack.testutil import (create_array,
+                                create_tmp_files,
+                                )
+from bloscpack.trace import (Tracer,
+                             enable_tracing,
+                             disable_tracing,
+                             get_tracer,
+                             )
+
+
+def read_events(filename):
+    with open(filename) as fp:
+        if filename.endswith('.jsonl'):
+            return [json.loads(line) for line in fp]
+        return json.load(fp)
+
+
+def chunk_events(events, name):
+    # events without a chunk, like the end of the input, are left out
+    return sorted(e['args']['chunk'] for e in events
+                  if e['name'] == name and e['ph'] == 'X' and 'args' in e)
+
+
+def test_tracer():
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        for filename, format_ in (('trace.json', 'chrome'),
+                                  ('trace.jsonl', 'jsonl'),
+                                  ('trace.log', 'chrome')):
+            tracer = Tracer(path.join(tdir, filename))
+            assert format_ == tracer.format_
+            start = tracer.origin
+            tracer.event('compress', start + 0.001, start + 0.003, 7)
+            tracer.event('pack', start, start + 0.004)
+            assert list(tracer.timed('ab', 'read')) == ['a', 'b']
+            tracer.close()
+            # dropped once closed
+            tracer.event('late', start, start)
+            events = read_events(path.join(tdir, filename))
+            assert 'thread_name' == events[0]['name']
+            assert 'M' == events[0]['ph']
+            compress = events[1]
+            assert 'X' == compress['ph']
+            assert 1000 == pytest.approx(compress['ts'])
+            assert 2000 == pytest.approx(compress['dur'])
+            assert {'chunk': 7} == compress['args']
+            assert 'args' not in events[2]
+            assert [0, 1] == chunk_events(events, 'read')
+            assert 5 == len(events) == tracer.nevents
+        with pytest.raises(ValueError):
+            Tracer(path.join(tdir, 'trace.json'), 'xml')
+
+
+def test_enable_disable_tracing():
+    assert get_tracer() is None
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        trace_file = path.join(tdir, 'trace.json')
+        tracer = enable_tracing(trace_file)
+        try:
+            assert tracer is get_tracer()
+            stats = Stats()
+            stats.add('compress', clock(), 3)
+        finally:
+            disable_tracing()
+        assert get_tracer() is None
+        # not traced once disabled
+        stats.add('compress', clock(), 4)
+        assert [3] == chunk_events(read_events(trace_file), 'compress')
+
+
+def test_trace_pack_unpack():
+    bytes_ = np.linspace(0, 100, 2 ** 18).tobytes()
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        trace_file = path.join(tdir, 'trace.jsonl')
+        enable_tracing(trace_file)
+        try:
+            unpack_bytes_from_bytes(pack_bytes_to_bytes(bytes_,
+                                                        chunk_size='512K'))
+        finally:
+            disable_tracing()
+        events = read_events(trace_file)
+    for stage in ('read', 'compress', 'checksum', 'decompress'):
+        assert [0, 1, 2, 3] == sorted(set(chunk_events(events, stage)))
+    operations = [e for e in events if e['name'] in ('pack', 'unpack')]
+    assert ['pack', 'unpack'] == [e['name'] for e in operations]
+    # the stages of the chunks are within the operation
+    pack = operations[0]
+    for e in events:
+        if e['name'] == 'compress':
+            assert pack['ts'] <= e['ts']
+            assert e['ts'] + e['dur'] <= pack['ts'] + pack['dur'] + 1
+
+
+def test_trace_pack_unpack_file_parallel():
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        create_array(1, in_file)
+        trace_file = path.join(tdir, 'trace.json')
+        enable_tracing(trace_file)
+        try:
+            pack_file_to_file(in_file, out_file, chunk_size='2M', workers=2,
+                              prefetch=2)
+            unpack_file_from_file(out_file, dcmp_file, workers=2)
+        finally:
+            disable_tracing()
+        events = read_events(trace_file)
+    nchunks = len(chunk_events(events, 'compress'))
+    assert nchunks > 1
+    chunks = list(range(nchunks))
+    for stage in ('prefetch', 'compress', 'checksum', 'decompress'):
+        assert chunks == sorted(set(chunk_events(events, stage)))
+    # one name per thread, the main thread, the reader and the workers
+    names = [e['args']['name'] for e in events if e['ph'] == 'M']
+    assert len(names) == len(set(e['tid'] for e in events))
+    assert 'MainThread' in names
+    assert len(names) >= 3
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+# vim :set ft=py:
+
+
+import blosc
+import numpy as np
+import numpy.testing as npt
+import pytest
+
+
+from bloscpack.abstract_io import (_compress_chunk_str,
+                                   )
+from bloscpack.args import (BloscArgs,
+                            )
+from bloscpack.file_io import (pack_file_to_file,
+                               unpack_bytes_from_file,
+                               pack_bytes_to_bytes,
+                               unpack_bytes_from_bytes,
+                               _read_compressed_chunk_fp,
+                               CompressedFPSource,
+                               )
+from bloscpack.headers import (decode_blosc_flags,
+                               decode_blosc_header,
+                               )
+from bloscpack.numpy_io import (pack_ndarray_to_bytes,
+                                unpack_ndarray_from_bytes,
+                                )
+from bloscpack.testutil import (create_tmp_files,
+                                )
+from bloscpack.tune import (AdaptiveCompressor,
+                            autotune,
+                            target_weight,
+                            _sample,
+                            )
+
+
+def test_target_weight():
+    assert 0.0 == target_weight('speed')
+    assert 0.5 == target_weight('balanced')
+    assert 1.0 == target_weight('size')
+    assert 0.25 == target_weight(0.25)
+    for broken in ('fast', -0.1, 1.5):
+        with pytest.raises(ValueError):
+            target_weight(broken)
+
+
+def test_sample():
+    # each byte holds the index of its chunk
+    data = (np.arange(950) // 100).astype(np.uint8)
+    # evenly spaced chunks, including the last one
+    samples = _sample(data, 100, 300)
+    assert [0, 4, 9] == [s[0] for s in samples]
+    assert [100, 100, 50] == [len(s) for s in samples]
+    # at least one chunk
+    assert 1 == len(_sample(data, 500, 100))
+    # no more chunks than there are
+    assert 10 == len(_sample(data, 100, 10000))
+
+
+def test_autotune():
+    a = np.linspace(0, 100, 2 ** 18)
+    blosc_args, chunk_size = autotune(a, cnames=('blosclz', 'lz4'),
+                                      clevels=(1, 9),
+                                      chunk_sizes=('64K', '128K', '1M'),
+                                      sample_size='256K')
+    assert 8 == blosc_args.typesize
+    assert blosc_args.cname in ('blosclz', 'lz4')
+    assert blosc_args.clevel in (1, 9)
+    assert chunk_size in (2 ** 16, 2 ** 17, 2 ** 20)
+    # chunks larger than the input are capped
+    assert (2 ** 21) == autotune(a, cnames=('lz4',), clevels=(1,),
+                                 chunk_sizes=('4M', '16M'))[1]
+    # highly compressible floats need the shuffle for a good ratio
+    blosc_args, chunk_size = autotune(a, target='size', chunk_size=2 ** 16,
+                                      chunk_sizes=(), cnames=('lz4',),
+                                      sample_size='256K')
+    assert blosc_args.shuffle
+    assert 2 ** 16 == chunk_size
+    # the typesize is only taken from arrays
+    assert 8 == autotune(a.tobytes(), chunk_sizes=(),
+                         cnames=('lz4',))[0].typesize
+    assert 2 == autotune(a.tobytes(), typesize=2, chunk_sizes=(),
+                         cnames=('lz4',))[0].typesize
+    assert 4 == autotune(a.astype(np.float32), chunk_sizes=(),
+                         cnames=('lz4',))[0].typesize
+    # nothing to tune
+    assert (BloscArgs(), 42) == autotune(b'', chunk_size=42)
+
+
+def test_autotune_file():
+    a = np.linspace(0, 100, 2 ** 18)
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        with open(in_file, 'wb') as fp:
+            fp.write(a.tobytes())
+        blosc_args, chunk_size = autotune(in_file, cnames=('zstd',),
+                                          clevels=(5,), shuffles=(False,),
+                                          chunk_sizes=('1M',))
+        assert BloscArgs(clevel=5, shuffle=False, cname='zstd') == \
+            blosc_args
+        assert 2 ** 20 == chunk_size
+        with open(in_file, 'wb') as fp:
+            pass
+        assert (BloscArgs(), 2 ** 20) == autotune(in_file)
+
+
+def test_auto_blosc_args():
+    a = np.linspace(0, 100, 2 ** 16)
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        with open(in_file, 'wb') as fp:
+            fp.write(a.tobytes())
+        pack_file_to_file(in_file, out_file, chunk_size='64K',
+                          blosc_args='auto')
+        assert (a.tobytes(), None) == unpack_bytes_from_file(out_file)
+        with open(out_file, 'rb') as fp:
+            source = CompressedFPSource(fp)
+            assert 2 ** 16 == source.chunk_size
+            _, blosc_header, _ = _read_compressed_chunk_fp(
+                fp, source.checksum_impl)
+        assert decode_blosc_flags(blosc_header['flags'])['codec'] in \
+            ('blosclz', 'lz4', 'lz4hc', 'zlib', 'zstd')
+    assert (a.tobytes(), None) == unpack_bytes_from_bytes(
+        pack_bytes_to_bytes(a.tobytes(), blosc_args='auto'))
+    b = a.astype(np.float32).reshape(256, 256)
+    npt.assert_array_equal(b, unpack_ndarray_from_bytes(
+        pack_ndarray_to_bytes(b, blosc_args='auto')))
+    with pytest.raises(ValueError):
+        pack_bytes_to_bytes(a.tobytes(), blosc_args='fast')
+
+
+def mixed_chunks():
+    rs = np.random.RandomState(42)
+    return [
+        # compresses well, a lot better with a stronger codec
+        np.cumsum(rs.randint(-3, 4, 2 ** 17)).astype(np.float64).tobytes(),
+        # incompressible
+        rs.bytes(2 ** 20),
+        # compresses so well that a stronger codec can't make a difference
+        np.zeros(2 ** 17).tobytes(),
+    ]
+
+
+def test_adaptive_compressor():
+    compress = AdaptiveCompressor(_compress_chunk_str)
+    blosc_args = BloscArgs(cname='adaptive')
+    codecs, sizes = [], []
+    for chunk in mixed_chunks():
+        compressed = compress(chunk, blosc_args)
+        assert chunk == blosc.decompress(compressed)
+        flags = decode_blosc_flags(decode_blosc_header(compressed)['flags'])
+        codecs.append('memcpy' if flags['pure_memcpy'] else flags['codec'])
+        sizes.append(len(compressed))
+    assert ['zstd', 'memcpy', 'lz4'] == codecs
+    assert 2 ** 20 + 16 == sizes[1]
+    assert {('zstd', 5): 1, (None, 0): 1, ('lz4', 5): 1} == compress.choices
+    assert 'zstd (5): 1' in compress.summary()
+    assert 'stored: 1' in compress.summary()
+    # without a stronger codec, or unless it saves half of the input
+    for compress in (AdaptiveCompressor(_compress_chunk_str,
+                                        codecs=(('lz4', 5),)),
+                     AdaptiveCompressor(_compress_chunk_str, min_gain=0.5)):
+        compress(mixed_chunks()[0], blosc_args)
+        assert {('lz4', 5): 1} == compress.choices
+
+
+def test_adaptive_compressor_escalates_within_band():
+    trials = []
+
+    def compress_func(chunk, blosc_args):
+        trials.append(blosc_args['cname'])
+        return _compress_chunk_str(chunk, blosc_args)
+    compress = AdaptiveCompressor(compress_func)
+    blosc_args = BloscArgs(cname='adaptive')
+    compressible, incompressible, zeros = mixed_chunks()
+    # the stronger codec is only tried where it can pay off
+    for chunk, expected in ((compressible, ['lz4', 'zstd']),
+                            (zeros, ['lz4']),
+                            # stored as a plain copy by the cheap codec
+                            (incompressible, ['lz4'])):
+        del trials[:]
+        assert chunk == blosc.decompress(compress(chunk, blosc_args))
+        assert expected == trials
+    # no band, no escalation
+    compress = AdaptiveCompressor(compress_func, escalate=(1.1, 1.1))
+    del trials[:]
+    compress(compressible, blosc_args)
+    assert ['lz4'] == trials
+
+
+def test_pack_adaptive():
+    chunks = mixed_chunks()
+    bytes_ = b''.join(chunks * 2)
+    blosc_args = BloscArgs(cname='adaptive')
+    packed = pack_bytes_to_bytes(bytes_, chunk_size=2 ** 20,
+                                 blosc_args=blosc_args)
+    assert (bytes_, None) == unpack_bytes_from_bytes(packed)
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        with open(in_file, 'wb') as fp:
+            fp.write(bytes_)
+        for workers in (1, 2):
+            pack_file_to_file(in_file, out_file, chunk_size=2 ** 20,
+                              blosc_args=blosc_args, workers=workers)
+            assert (bytes_, None) == unpack_bytes_from_file(out_file)
+    a = np.frombuffer(bytes_, dtype=np.float64)
+    npt.assert_array_equal(a, unpack_ndarray_from_bytes(
+        pack_ndarray_to_bytes(a, blosc_args=blosc_args)))
+    # smaller than with the cheap codec, but not bigger than with the strong
+    # one
+    cheap = pack_bytes_to_bytes(bytes_, chunk_size=2 ** 20,
+                                blosc_args=BloscArgs(cname='lz4', clevel=5))
+    strong = pack_bytes_to_bytes(bytes_, chunk_size=2 ** 20,
+                                 blosc_args=BloscArgs(cname='zstd', clevel=5))
+    assert len(strong) <= len(packed) < len(cheap)
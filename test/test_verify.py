@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+# vim :set ft=py:
+
+
+import os
+import struct
+
+
+import numpy as np
+import pytest
+
+
+from bloscpack.abstract_io import (pack,
+                                   )
+from bloscpack.args import (BloscpackArgs,
+                            )
+from bloscpack.compat_util import StringIO
+from bloscpack.exceptions import (ChecksumMismatch,
+                                  CorruptedChunk,
+                                  )
+from bloscpack.file_io import (pack_bytes_to_file,
+                               pack_file_to_file,
+                               CompressedFPSink,
+                               CompressedFPSource,
+                               PlainStreamSource,
+                               )
+from bloscpack.headers import (BloscpackHeader,
+                               )
+from bloscpack.stats import (Stats,
+                             )
+from bloscpack.testutil import (create_array,
+                                create_tmp_files,
+                                )
+from bloscpack.verify import (verify_file,
+                              )
+
+
+def chunk_offsets(filename):
+    with open(filename, 'rb') as fp:
+        return CompressedFPSource(fp).offsets.tolist()
+
+
+def flip_byte(filename, position):
+    with open(filename, 'r+b') as fp:
+        fp.seek(position)
+        byte_ = fp.read(1)
+        fp.seek(position)
+        fp.write(bytes(bytearray([ord(byte_) ^ 0xff])))
+
+
+def test_verify():
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        create_array(1, in_file)
+        pack_file_to_file(in_file, out_file, chunk_size='2M')
+        for decompress in (False, True):
+            for workers in (1, 3):
+                stats = Stats()
+                assert 8 == verify_file(out_file, decompress=decompress,
+                                        workers=workers, stats=stats)
+                assert 'verify' == stats.operation
+                assert 8 == stats.nchunks
+                assert 16000000 == stats.bytes_out
+                assert ('decompress' in stats.wall) == decompress
+        # nothing but the input is left behind
+        assert ['file', 'file.blp'] == sorted(os.listdir(tdir))
+
+
+@pytest.mark.parametrize('bloscpack_args', [
+    BloscpackArgs(),
+    BloscpackArgs(trailer=True),
+    BloscpackArgs(offsets=False),
+    BloscpackArgs(offsets=False, checksum='None'),
+    BloscpackArgs(checksum='sha512'),
+])
+def test_verify_layouts(bloscpack_args):
+    bytes_ = np.linspace(0, 100, 2 ** 17).tobytes()
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        pack_bytes_to_file(bytes_, out_file, chunk_size=300000,
+                           bloscpack_args=bloscpack_args)
+        assert 4 == verify_file(out_file, decompress=True)
+        assert 4 == verify_file(out_file, workers=2)
+
+
+def test_verify_dedup_sparse():
+    chunk_size = 2 ** 16
+    bytes_ = b'\x00' * chunk_size + b'\x01' * chunk_size * 3 + \
+        b'\x00' * 100
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        pack_bytes_to_file(bytes_, out_file, chunk_size=chunk_size,
+                           bloscpack_args=BloscpackArgs(dedup=True,
+                                                        sparse=True))
+        offsets = chunk_offsets(out_file)
+        assert -2 == offsets[0] == offsets[4]
+        assert offsets[1] == offsets[2] == offsets[3]
+        # the shared chunk is checked only once
+        stats = Stats()
+        for workers in (1, 2):
+            assert 1 == verify_file(out_file, decompress=True,
+                                    workers=workers, stats=stats)
+        # but a corrupted one is found
+        flip_byte(out_file, offsets[1] + 20)
+        with pytest.raises(ChecksumMismatch):
+            verify_file(out_file)
+
+
+def test_verify_unknown_nchunks():
+    data = np.arange(100000, dtype=np.int64).tobytes()
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        # as if streamed to an output that was not seekable
+        with open(out_file, 'wb') as fp:
+            pack(PlainStreamSource(StringIO(data)), CompressedFPSink(fp),
+                 -1, 300000, -1,
+                 bloscpack_args=BloscpackArgs(offsets=False))
+            fp.seek(0)
+            fp.write(BloscpackHeader(checksum='adler32', typesize=8,
+                                     chunk_size=300000).encode())
+        assert 3 == verify_file(out_file, decompress=True)
+
+
+def test_verify_corrupted():
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        create_array(1, in_file)
+        pack_file_to_file(in_file, out_file, chunk_size='2M')
+        offsets = chunk_offsets(out_file)
+        with open(out_file, 'rb') as fp:
+            original = fp.read()
+
+        def restore():
+            with open(out_file, 'wb') as fp:
+                fp.write(original)
+
+        # a corrupted chunk, found by any number of workers
+        flip_byte(out_file, offsets[5] + 100)
+        for workers in (1, 4):
+            with pytest.raises(ChecksumMismatch) as excinfo:
+                verify_file(out_file, workers=workers)
+            assert "chunk '5'" in str(excinfo.value)
+        restore()
+        # a corrupted size in the blosc header of the last chunk
+        with open(out_file, 'r+b') as fp:
+            fp.seek(offsets[7] + 4)
+            fp.write(struct.pack('<i', 2 ** 21))
+        with pytest.raises(ChecksumMismatch):
+            verify_file(out_file)
+        restore()
+        # truncated
+        with open(out_file, 'r+b') as fp:
+            fp.truncate(offsets[6] + 1000)
+        with pytest.raises(CorruptedChunk):
+            verify_file(out_file)
+        restore()
+        # an offset pointing outside of the file, right after the header
+        with open(out_file, 'r+b') as fp:
+            fp.seek(32 + 3 * 8)
+            fp.write(struct.pack('<q', len(original) + 10))
+        with pytest.raises(CorruptedChunk):
+            verify_file(out_file)
+
+
+def test_verify_corrupted_without_checksums():
+    bytes_ = np.linspace(0, 100, 2 ** 17).tobytes()
+    with create_tmp_files() as (tdir, in_file, out_file, dcmp_file):
+        pack_bytes_to_file(bytes_, out_file, chunk_size=300000,
+                           bloscpack_args=BloscpackArgs(checksum='None'))
+        offsets = chunk_offsets(out_file)
+        # the size of the first chunk is wrong
+        with open(out_file, 'r+b') as fp:
+            fp.seek(offsets[0] + 4)
+            fp.write(struct.pack('<i', 200000))
+        with pytest.raises(CorruptedChunk):
+            verify_file(out_file)